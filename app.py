@@ -7,6 +7,9 @@ from routes.auth import auth_bp
 from routes.customers import customers_bp
 from routes.billing import billing_bp
 from routes.usage import usage_bp
+from routes.tariffs import tariffs_bp
+from routes.jobs import jobs_bp
+from utils.jobs import resume_local_jobs
 
 def create_app(config_class=Config):
     app = Flask(__name__)
@@ -22,6 +25,12 @@ def create_app(config_class=Config):
     app.register_blueprint(customers_bp, url_prefix='/api/customers')
     app.register_blueprint(billing_bp, url_prefix='/api/bills')
     app.register_blueprint(usage_bp, url_prefix='/api/usage')
+    app.register_blueprint(tariffs_bp, url_prefix='/api/tariffs')
+    app.register_blueprint(jobs_bp, url_prefix='/api/jobs')
+    
+    # Pick up jobs left behind by a previous API process
+    if app.config['JOB_WORKER_MODE'] == 'local':
+        app.before_request(resume_local_jobs)
     
     # Health check endpoint
     @app.route('/health', methods=['GET'])
@@ -38,7 +47,9 @@ def create_app(config_class=Config):
                 'auth': '/api/auth',
                 'customers': '/api/customers',
                 'bills': '/api/bills',
-                'usage': '/api/usage'
+                'usage': '/api/usage',
+                'tariffs': '/api/tariffs',
+                'jobs': '/api/jobs'
             }
         }), 200
     
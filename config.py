@@ -17,7 +17,8 @@ class Config:
     # CORS
     CORS_ORIGINS = os.getenv('CORS_ORIGINS', 'http://localhost:3000').split(',')
     
-    # Pricing Configuration
+    # Pricing Configuration (default tariff when no versions are stored in the tariffs table)
+    TARIFF_CACHE_SECONDS = 60
     PRICING = {
         'tiers': [
             {'min': 0, 'max': 10, 'rate': 2.50},
@@ -37,10 +38,51 @@ class Config:
     
     # Anomaly Detection
     ANOMALY_THRESHOLD_SIGMA = 2.0  # Standard deviations
+    ANOMALY_STATS_WINDOW = int(os.getenv('ANOMALY_STATS_WINDOW', 0))  # Effective readings in running stats, 0 for all history
     
-    # Email Configuration (for future implementation)
+    # Bulk Ingest
+    UPSERT_CHUNK_SIZE = int(os.getenv('UPSERT_CHUNK_SIZE', 5000))  # Rows per multi-row statement
+    INGEST_BATCH_SIZE = int(os.getenv('INGEST_BATCH_SIZE', 10000))  # Records per streamed commit
+    INGEST_MAX_ERRORS = 1000  # Detailed errors returned by the streaming endpoint
+    USAGE_STORE_PATH = os.getenv('USAGE_STORE_PATH', '')  # Directory of memory-mapped per-customer usage arrays, empty to disable
+    
+    # Interval (AMI) Usage
+    INTERVAL_MINUTES = int(os.getenv('INTERVAL_MINUTES', 15))  # Meter interval when records don't give one
+    INTERVAL_PROFILE_DAYS = 30  # Trailing days behind the load profile in usage analytics
+    CONTINUOUS_FLOW_HOURS = (1, 5)  # Overnight window [start, end) in meter-local hours
+    CONTINUOUS_FLOW_MIN_CCF = 0.0  # Flow every interval in the window must exceed
+    CONTINUOUS_FLOW_MIN_NIGHTS = 3  # Consecutive nights of continuous flow before a meter is flagged
+    
+    # Forecast Cache
+    FORECAST_CACHE_SIZE = int(os.getenv('FORECAST_CACHE_SIZE', 4096))  # Entries kept per process (LRU)
+    FORECAST_CACHE_URL = os.getenv('FORECAST_CACHE_URL', '')  # redis://... to share entries across processes
+    FORECAST_CACHE_TTL = 24 * 60 * 60  # Seconds before a shared entry expires
+    FORECAST_WORKERS = int(os.getenv('FORECAST_WORKERS', 0))  # Processes for fleet forecasts, 0 for CPU count
+    ANALYTICS_WINDOW_DAYS = int(os.getenv('ANALYTICS_WINDOW_DAYS', 365))  # Trailing days behind usage analytics
+    HOLT_WINTERS = {  # Smoothing for the holt_winters forecast method
+        'alpha': 0.01,  # Level (kept slow so it doesn't absorb the yearly cycle)
+        'beta': 0.01,  # Trend
+        'gamma_weekly': 0.02,  # Day-of-week offsets
+        'gamma_yearly': 0.1,  # Month-of-year offsets
+        'damping': 0.98,  # Trend damping per day
+        'error_smoothing': 0.05  # One-step error variance
+    }
+    
+    # Background Jobs
+    JOB_WORKER_MODE = os.getenv('JOB_WORKER_MODE', 'local')  # local: threads in the API process, external: manage.py run-jobs
+    JOB_WORKERS = int(os.getenv('JOB_WORKERS', 2))  # Jobs running at once per process
+    JOB_CHUNK_CUSTOMERS = 2000  # Customers per committed step of a job
+    JOB_MAX_ERRORS = 1000  # Detailed errors kept in a job result
+    JOB_POLL_SECONDS = 2  # External worker queue polling interval
+    JOB_STALE_SECONDS = int(os.getenv('JOB_STALE_SECONDS', 1800))  # Heartbeat age after which a running job's worker is presumed dead
+    JOB_MAX_ATTEMPTS = 3  # Claims before a job whose worker keeps dying is failed
+    
+    # Email Configuration (bill notifications)
     MAIL_SERVER = os.getenv('MAIL_SERVER', 'smtp.gmail.com')
     MAIL_PORT = int(os.getenv('MAIL_PORT', 587))
     MAIL_USE_TLS = os.getenv('MAIL_USE_TLS', 'True') == 'True'
     MAIL_USERNAME = os.getenv('MAIL_USERNAME', '')
     MAIL_PASSWORD = os.getenv('MAIL_PASSWORD', '')
+    MAIL_DEFAULT_SENDER = os.getenv('MAIL_DEFAULT_SENDER', 'billing@hydrospark.com')
+    NOTIFICATION_BATCH_SIZE = int(os.getenv('NOTIFICATION_BATCH_SIZE', 500))  # Messages rendered per batch
+    NOTIFICATION_CONNECTIONS = int(os.getenv('NOTIFICATION_CONNECTIONS', 4))  # Persistent SMTP connections
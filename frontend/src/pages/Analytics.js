@@ -118,6 +118,28 @@ function Analytics({ user }) {
           </div>
         </div>
       )}
+
+      {analytics.interval_profile && (
+        <div className="card">
+          <div className="card-header">Interval Profile ({analytics.interval_profile.start_date} to {analytics.interval_profile.end_date})</div>
+          {analytics.interval_profile.continuous_flow.length > 0 && (
+            <div className="alert alert-warning">
+              Continuous overnight flow on {analytics.interval_profile.continuous_flow.slice(-1)[0].nights} nights
+              up to {analytics.interval_profile.continuous_flow.slice(-1)[0].last_night} - possible leak of about{' '}
+              {analytics.interval_profile.continuous_flow.slice(-1)[0].estimated_leak_ccf_per_day} CCF per day
+            </div>
+          )}
+          <div className="grid-2">
+            <div>
+              <p><strong>Peak Hour:</strong> {analytics.interval_profile.peak_hour ?? 'N/A'}:00</p>
+              <p><strong>Lowest Overnight Flow:</strong> {analytics.interval_profile.min_night_flow_ccf_per_hour ?? 'N/A'} CCF/hour</p>
+            </div>
+            <div>
+              <p><strong>Days of Interval Data:</strong> {analytics.interval_profile.days}</p>
+            </div>
+          </div>
+        </div>
+      )}
     </div>
   );
 }
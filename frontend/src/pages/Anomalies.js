@@ -1,10 +1,11 @@
 import React, { useState, useEffect } from 'react';
-import { usageAPI } from '../services/api';
+import { usageAPI, jobsAPI, waitForJob } from '../services/api';
 
 function Anomalies({ user }) {
   const [anomalies, setAnomalies] = useState([]);
   const [loading, setLoading] = useState(true);
   const [detecting, setDetecting] = useState(false);
+  const [job, setJob] = useState(null);
   const [message, setMessage] = useState(null);
 
   useEffect(() => {
@@ -27,12 +28,27 @@ function Anomalies({ user }) {
     setMessage(null);
     try {
       const response = await usageAPI.detectAnomalies();
-      setMessage({ type: 'success', text: response.data.message });
+      setJob(response.data.job);
+      const finished = await waitForJob(response.data.job.id, setJob);
+      if (finished.status === 'completed') {
+        setMessage({ type: 'success', text: `Detected ${finished.result.anomalies_created} new anomalies` });
+      } else {
+        setMessage({ type: 'error', text: finished.error || `Anomaly detection ${finished.status}` });
+      }
       loadAnomalies();
     } catch (error) {
       setMessage({ type: 'error', text: 'Failed to detect anomalies' });
     } finally {
       setDetecting(false);
+      setJob(null);
+    }
+  };
+
+  const handleCancelJob = async () => {
+    try {
+      await jobsAPI.cancel(job.id);
+    } catch (error) {
+      setMessage({ type: 'error', text: 'Failed to cancel anomaly detection' });
     }
   };
 
@@ -63,8 +79,22 @@ function Anomalies({ user }) {
         <div className={`alert alert-${message.type}`}>{message.text}</div>
       )}
 
+      {job && (
+        <div className="alert alert-info flex-between">
+          <span>
+            {job.status === 'queued' ? 'Anomaly detection queued...' : `Scanning usage: ${job.progress.done} of ${job.progress.total ?? '?'} customers`}
+            {job.progress.percent !== null && ` (${job.progress.percent}%)`}
+          </span>
+          {!job.cancel_requested && (
+            <button onClick={handleCancelJob} className="btn btn-secondary" style={{ padding: '0.25rem 0.75rem' }}>
+              Cancel
+            </button>
+          )}
+        </div>
+      )}
+
       <div className="alert alert-info">
-        <strong>Detection Method:</strong> Statistical analysis using 2 standard deviations above customer average usage.
+        <strong>Detection Method:</strong> Statistical analysis using 2 standard deviations above the customer's average usage for the same month and day of week.
       </div>
 
       <div className="card">
@@ -1,10 +1,11 @@
 import React, { useState, useEffect } from 'react';
-import { billsAPI } from '../services/api';
+import { billsAPI, jobsAPI, waitForJob } from '../services/api';
 
 function Bills({ user }) {
   const [bills, setBills] = useState([]);
   const [loading, setLoading] = useState(true);
   const [generating, setGenerating] = useState(false);
+  const [job, setJob] = useState(null);
   const [message, setMessage] = useState(null);
 
   useEffect(() => {
@@ -27,12 +28,27 @@ function Bills({ user }) {
     setMessage(null);
     try {
       const response = await billsAPI.generate();
-      setMessage({ type: 'success', text: response.data.message });
+      setJob(response.data.job);
+      const finished = await waitForJob(response.data.job.id, setJob);
+      if (finished.status === 'completed') {
+        setMessage({ type: 'success', text: `Generated ${finished.result.bills_generated} bills` });
+      } else {
+        setMessage({ type: 'error', text: finished.error || `Bill generation ${finished.status}` });
+      }
       loadBills();
     } catch (error) {
       setMessage({ type: 'error', text: error.response?.data?.error || 'Failed to generate bills' });
     } finally {
       setGenerating(false);
+      setJob(null);
+    }
+  };
+
+  const handleCancelJob = async () => {
+    try {
+      await jobsAPI.cancel(job.id);
+    } catch (error) {
+      setMessage({ type: 'error', text: 'Failed to cancel bill generation' });
     }
   };
 
@@ -75,6 +91,20 @@ function Bills({ user }) {
         <div className={`alert alert-${message.type}`}>{message.text}</div>
       )}
 
+      {job && (
+        <div className="alert alert-info flex-between">
+          <span>
+            {job.status === 'queued' ? 'Bill generation queued...' : `Generating bills: ${job.progress.done} of ${job.progress.total ?? '?'} customers`}
+            {job.progress.percent !== null && ` (${job.progress.percent}%)`}
+          </span>
+          {!job.cancel_requested && (
+            <button onClick={handleCancelJob} className="btn btn-secondary" style={{ padding: '0.25rem 0.75rem' }}>
+              Cancel
+            </button>
+          )}
+        </div>
+      )}
+
       <div className="card">
         <table className="table">
           <thead>
@@ -1,18 +1,40 @@
 import React, { useState, useEffect } from 'react';
 import { customersAPI } from '../services/api';
 
+const PAGE_SIZE = 50;
+const LIST_FIELDS = 'id,name,address,customer_type,cycle_number,stats';
+
 function Customers({ user }) {
   const [customers, setCustomers] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [total, setTotal] = useState(null);
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
+  const [search, setSearch] = useState('');
+  const [customerType, setCustomerType] = useState('');
+  const [cycleNumber, setCycleNumber] = useState('');
 
   useEffect(() => {
-    loadCustomers();
-  }, []);
+    // Wait for typing to pause before searching
+    const timer = setTimeout(() => loadCustomers(), 300);
+    return () => clearTimeout(timer);
+  }, [search, customerType, cycleNumber]);
+
+  const filterParams = () => ({
+    fields: LIST_FIELDS,
+    limit: PAGE_SIZE,
+    search: search || undefined,
+    customer_type: customerType || undefined,
+    cycle_number: cycleNumber || undefined,
+  });
 
   const loadCustomers = async () => {
+    setLoading(true);
     try {
-      const response = await customersAPI.getAll();
-      setCustomers(response.data);
+      const response = await customersAPI.getAll({ ...filterParams(), include_total: true });
+      setCustomers(response.data.customers);
+      setNextCursor(response.data.next_cursor);
+      setTotal(response.data.total);
     } catch (error) {
       console.error('Error loading customers:', error);
     } finally {
@@ -20,45 +42,89 @@ function Customers({ user }) {
     }
   };
 
-  if (loading) {
-    return <div className="loading"><div className="spinner"></div></div>;
-  }
+  const loadMore = async () => {
+    setLoadingMore(true);
+    try {
+      const response = await customersAPI.getAll({ ...filterParams(), cursor: nextCursor });
+      setCustomers([...customers, ...response.data.customers]);
+      setNextCursor(response.data.next_cursor);
+    } catch (error) {
+      console.error('Error loading customers:', error);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
 
   return (
     <div>
       <h1>Customers</h1>
-      
+
       <div className="card">
-        <table className="table">
-          <thead>
-            <tr>
-              <th>Name</th>
-              <th>Address</th>
-              <th>Type</th>
-              <th>Cycle</th>
-              <th>Avg Usage</th>
-              <th>Total Bills</th>
-              <th>Anomalies</th>
-            </tr>
-          </thead>
-          <tbody>
-            {customers.map((customer) => (
-              <tr key={customer.id}>
-                <td>{customer.name}</td>
-                <td>{customer.address}</td>
-                <td>{customer.customer_type}</td>
-                <td>{customer.cycle_number}</td>
-                <td>{customer.stats?.avg_daily_usage?.toFixed(2) || 0} CCF</td>
-                <td>{customer.stats?.total_bills || 0}</td>
-                <td>
-                  {customer.stats?.anomaly_count > 0 && (
-                    <span className="badge badge-warning">{customer.stats.anomaly_count}</span>
-                  )}
-                </td>
-              </tr>
-            ))}
-          </tbody>
-        </table>
+        <div className="flex flex-gap mb-2">
+          <input
+            type="text"
+            className="form-control"
+            placeholder="Search name, address or business"
+            value={search}
+            onChange={(e) => setSearch(e.target.value)}
+          />
+          <select className="form-control" value={customerType} onChange={(e) => setCustomerType(e.target.value)}>
+            <option value="">All types</option>
+            <option value="Residential">Residential</option>
+            <option value="Commercial">Commercial</option>
+          </select>
+          <input
+            type="number"
+            min="1"
+            className="form-control"
+            placeholder="Cycle"
+            value={cycleNumber}
+            onChange={(e) => setCycleNumber(e.target.value)}
+          />
+        </div>
+
+        {loading ? (
+          <div className="loading"><div className="spinner"></div></div>
+        ) : (
+          <>
+            <p className="mb-2">Showing {customers.length} of {total ?? customers.length} customers</p>
+            <table className="table">
+              <thead>
+                <tr>
+                  <th>Name</th>
+                  <th>Address</th>
+                  <th>Type</th>
+                  <th>Cycle</th>
+                  <th>Avg Usage</th>
+                  <th>Total Bills</th>
+                  <th>Anomalies</th>
+                </tr>
+              </thead>
+              <tbody>
+                {customers.map((customer) => (
+                  <tr key={customer.id}>
+                    <td>{customer.name}</td>
+                    <td>{customer.address}</td>
+                    <td>{customer.customer_type}</td>
+                    <td>{customer.cycle_number}</td>
+                    <td>{customer.stats?.avg_daily_usage?.toFixed(2) || 0} CCF</td>
+                    <td>{customer.stats?.total_bills || 0}</td>
+                    <td>
+                      {customer.stats?.anomaly_count > 0 && (
+                        <span className="badge badge-warning">{customer.stats.anomaly_count}</span>
+                      )}
+                    </td>
+                  </tr>
+                ))}
+              </tbody>
+            </table>
+            {nextCursor && (
+              <button onClick={loadMore} className="btn btn-secondary" disabled={loadingMore}>
+                {loadingMore ? 'Loading...' : 'Load More'}
+              </button>
+            )}
+          </>
+        )}
       </div>
     </div>
   );
@@ -13,13 +13,13 @@ function Dashboard({ user }) {
     try {
       const [billSummary, customers, anomalies] = await Promise.all([
         billsAPI.getSummary(),
-        customersAPI.getAll(),
+        customersAPI.getAll({ fields: 'id', limit: 1, include_total: true }),
         usageAPI.getAnomalies({ reviewed: false }),
       ]);
 
       setStats({
         bills: billSummary.data,
-        totalCustomers: customers.data.length,
+        totalCustomers: customers.data.total,
         pendingAnomalies: anomalies.data.length,
       });
     } catch (error) {
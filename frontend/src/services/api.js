@@ -46,7 +46,7 @@ export const authAPI = {
 
 // Customers API
 export const customersAPI = {
-  getAll: () => api.get('/customers'),
+  getAll: (params) => api.get('/customers', { params }),
   getById: (id) => api.get(`/customers/${id}`),
   getUsage: (id, params) => api.get(`/customers/${id}/usage`, { params }),
   getMonthlyUsage: (id) => api.get(`/customers/${id}/usage/monthly`),
@@ -74,6 +74,29 @@ export const usageAPI = {
     api.get(`/usage/forecast/${customerId}/bill`, { params: { month, year } }),
   getAnalytics: (customerId) => api.get(`/usage/analytics/${customerId}`),
   uploadData: (records) => api.post('/usage/upload', { records }),
+  getIntervals: (customerId, params) => api.get(`/usage/intervals/${customerId}`, { params }),
+  uploadIntervals: (records) => api.post('/usage/intervals', { records }),
+  getContinuousFlow: (params) => api.get('/usage/anomalies/continuous-flow', { params }),
+};
+
+// Jobs API
+export const jobsAPI = {
+  getAll: (params) => api.get('/jobs', { params }),
+  getById: (id) => api.get(`/jobs/${id}`),
+  cancel: (id) => api.post(`/jobs/${id}/cancel`),
+};
+
+// Poll a background job until it finishes, reporting each status update
+export const waitForJob = async (jobId, onUpdate, intervalMs = 1500) => {
+  for (;;) {
+    const response = await jobsAPI.getById(jobId);
+    const job = response.data;
+    if (onUpdate) onUpdate(job);
+    if (['completed', 'failed', 'cancelled'].includes(job.status)) {
+      return job;
+    }
+    await new Promise((resolve) => setTimeout(resolve, intervalMs));
+  }
 };
 
 export default api;
@@ -4,10 +4,14 @@ Database initialization script for HydroSpark system
 Loads sample data from Excel file
 """
 
+import time
 import pandas as pd
 from datetime import datetime
+from openpyxl import load_workbook
+from sqlalchemy import insert
 from app import create_app
 from models import db, User, Customer, Usage
+from utils.usage_ingest import upsert_usage
 
 def init_database():
     """Initialize database with schema"""
@@ -57,45 +61,131 @@ def create_default_users(app):
         db.session.commit()
         print(f"✅ Created {len(users_data)} company users")
 
+CHUNK_SIZE = 50000  # Spreadsheet rows processed per batch
+KEY_QUERY_CHUNK = 900  # Customer ids per existing-key lookup
+
+def iter_excel_chunks(excel_path, chunk_size=CHUNK_SIZE):
+    """Stream an xlsx sheet as DataFrames without loading the whole workbook"""
+    workbook = load_workbook(excel_path, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = [str(col).strip() for col in next(rows)]
+        
+        chunk = []
+        for row in rows:
+            # Read-only sheets can report formatted but empty trailing rows
+            if all(value is None for value in row):
+                continue
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                yield pd.DataFrame(chunk, columns=header)
+                chunk = []
+        if chunk:
+            yield pd.DataFrame(chunk, columns=header)
+    finally:
+        workbook.close()
+
+def _optional(value):
+    """Convert spreadsheet blanks to None"""
+    return value if pd.notna(value) else None
+
+def create_missing_customers(df, location_map):
+    """Create customers for Location IDs not yet in location_map and add them to it"""
+    new_rows = df[~df['Location ID'].isin(location_map)].drop_duplicates('Location ID')
+    if new_rows.empty:
+        return 0
+    
+    customers = [{
+        'name': row['Customer Name'],
+        'address': row['Mailing Address'],
+        'location_id': int(row['Location ID']),
+        'customer_type': row['Customer Type'],
+        'cycle_number': int(row['Cycle Number']),
+        'phone': _optional(row['Customer Phone Number']),
+        'business_name': _optional(row['Business Name']),
+        'facility_name': _optional(row['Facility Name']),
+        'created_at': datetime.utcnow()
+    } for row in new_rows.to_dict('records')]
+    db.session.execute(insert(Customer), customers)
+    
+    location_ids = [c['location_id'] for c in customers]
+    for start in range(0, len(location_ids), KEY_QUERY_CHUNK):
+        location_map.update(db.session.query(Customer.location_id, Customer.id).filter(
+            Customer.location_id.in_(location_ids[start:start + KEY_QUERY_CHUNK])
+        ).all())
+    
+    return len(customers)
+
+def existing_usage_keys(customer_ids, start_date, end_date):
+    """Load (customer_id, date) keys already stored for the given customers and range"""
+    frames = []
+    for start in range(0, len(customer_ids), KEY_QUERY_CHUNK):
+        keys = db.session.query(Usage.customer_id, Usage.date).filter(
+            Usage.customer_id.in_(customer_ids[start:start + KEY_QUERY_CHUNK]),
+            Usage.date >= start_date,
+            Usage.date <= end_date
+        ).all()
+        frames.append(pd.DataFrame(keys, columns=['customer_id', 'date']))
+    if not frames:
+        return pd.DataFrame(columns=['customer_id', 'date'])
+    return pd.concat(frames, ignore_index=True)
+
 def load_sample_data(app, excel_path):
-    """Load sample data from Excel file"""
+    """Stream sample data from Excel file in bulk chunks"""
     print(f"📊 Loading sample data from {excel_path}...")
     
     try:
-        # Read Excel file
-        df = pd.read_excel(excel_path)
-        print(f"   Found {len(df)} usage records")
-        
         with app.app_context():
-            # Group by customer to create customer records
-            customer_groups = df.groupby('Location ID').first()
+            # Location ID -> customer id, loaded once and extended as customers are created
+            location_map = dict(db.session.query(Customer.location_id, Customer.id).all())
             
+            rows_read = 0
             customers_created = 0
-            for location_id, row in customer_groups.iterrows():
-                # Check if customer exists
-                existing = Customer.query.filter_by(location_id=location_id).first()
-                if existing:
+            usage_created = 0
+            started = time.perf_counter()
+            
+            for df in iter_excel_chunks(excel_path):
+                # Rows without a Location ID can't be matched to a customer
+                df = df.dropna(subset=['Location ID'])
+                if df.empty:
                     continue
+                rows_read += len(df)
                 
-                customer = Customer(
-                    name=row['Customer Name'],
-                    address=row['Mailing Address'],
-                    location_id=location_id,
-                    customer_type=row['Customer Type'],
-                    cycle_number=row['Cycle Number'],
-                    phone=row['Customer Phone Number'],
-                    business_name=row['Business Name'] if pd.notna(row['Business Name']) else None,
-                    facility_name=row['Facility Name'] if pd.notna(row['Facility Name']) else None
+                customers_created += create_missing_customers(df, location_map)
+                
+                # Build keys and dates column-wise
+                usage = pd.DataFrame({
+                    'customer_id': df['Location ID'].map(location_map).astype('int64'),
+                    'date': pd.to_datetime(pd.DataFrame({
+                        'year': df['Year'],
+                        'month': df['Month'],
+                        'day': df['Day']
+                    })).dt.date,
+                    'usage_ccf': df['Daily Water Usage (CCF)'].astype(float)
+                }).drop_duplicates(['customer_id', 'date'])
+                
+                # Anti-join against keys already in the database
+                existing = existing_usage_keys(
+                    usage['customer_id'].unique().tolist(),
+                    usage['date'].min(),
+                    usage['date'].max()
                 )
-                db.session.add(customer)
-                customers_created += 1
+                usage = usage.merge(existing, on=['customer_id', 'date'], how='left', indicator=True)
+                usage = usage[usage['_merge'] == 'left_only'].drop(columns='_merge')
+                
+                usage_created += upsert_usage(usage.to_dict('records'), overwrite=False)
+                db.session.commit()
+                
+                elapsed = time.perf_counter() - started
+                print(f"   Loaded {usage_created} usage records from {rows_read} rows "
+                      f"({rows_read / elapsed:,.0f} rows/s)...")
             
-            db.session.commit()
             print(f"✅ Created {customers_created} customers")
+            print(f"✅ Created {usage_created} usage records")
             
             # Create customer user account
-            customer = Customer.query.first()
-            if customer:
+            customer = Customer.query.order_by(Customer.id).first()
+            if customer and not User.query.filter_by(email='noah@example.com').first():
                 customer_user = User(
                     email='noah@example.com',
                     role='customer',
@@ -105,46 +195,7 @@ def load_sample_data(app, excel_path):
                 db.session.add(customer_user)
                 db.session.commit()
                 print(f"✅ Created customer user account: noah@example.com")
-            
-            # Load usage data
-            usage_created = 0
-            for _, row in df.iterrows():
-                customer = Customer.query.filter_by(location_id=row['Location ID']).first()
-                if not customer:
-                    continue
-                
-                # Create date from Year, Month, Day columns
-                date = datetime(
-                    int(row['Year']),
-                    int(row['Month']),
-                    int(row['Day'])
-                ).date()
-                
-                # Check if usage record exists
-                existing = Usage.query.filter_by(
-                    customer_id=customer.id,
-                    date=date
-                ).first()
-                
-                if existing:
-                    continue
-                
-                usage = Usage(
-                    customer_id=customer.id,
-                    date=date,
-                    usage_ccf=row['Daily Water Usage (CCF)']
-                )
-                db.session.add(usage)
-                usage_created += 1
-                
-                # Commit in batches
-                if usage_created % 500 == 0:
-                    db.session.commit()
-                    print(f"   Loaded {usage_created} usage records...")
-            
-            db.session.commit()
-            print(f"✅ Created {usage_created} usage records")
-            
+    
     except FileNotFoundError:
         print(f"❌ Error: File not found at {excel_path}")
         print("   Skipping sample data load. You can add customers and usage manually.")
@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+Management commands for HydroSpark system
+Bulk data movement and maintenance jobs that run outside the API
+"""
+
+import argparse
+import time
+from datetime import datetime, timedelta
+from dateutil.relativedelta import relativedelta
+from app import create_app
+
+def import_usage(args):
+    """Import usage from Parquet or Arrow IPC files"""
+    from utils.columnar_io import import_usage_file
+    
+    for path in args.paths:
+        print(f"📥 Importing usage from {path}...")
+        started = time.perf_counter()
+        counts = import_usage_file(path, batch_size=args.batch_size, overwrite=not args.skip_existing)
+        elapsed = time.perf_counter() - started
+        print(f"✅ Imported {counts['imported']} of {counts['read']} rows "
+              f"({counts['skipped']} skipped) in {elapsed:.1f}s "
+              f"({counts['read'] / max(elapsed, 1e-9):,.0f} rows/s)")
+
+def export_data(args):
+    """Export usage, bills and anomalies to partitioned Parquet"""
+    from utils.columnar_io import export_table
+    
+    for name in args.tables:
+        print(f"📤 Exporting {name} to {args.out_dir}/{name}...")
+        started = time.perf_counter()
+        exported = export_table(name, args.out_dir)
+        print(f"✅ Exported {exported} {name} rows in {time.perf_counter() - started:.1f}s")
+
+def bill_run(args):
+    """Bill a period shard-by-cycle across a process pool, resuming unfinished shards"""
+    from utils.bill_run import get_or_create_run, execute_bill_run
+    
+    period_start = datetime(args.year, args.month, 1).date()
+    period_end = (datetime(args.year, args.month, 1) + relativedelta(months=1) - timedelta(days=1)).date()
+    
+    run = get_or_create_run(period_start, period_end)
+    pending = [s for s in run.shards if s.status != 'completed']
+    print(f"🧾 Bill run {run.id} for {period_start} to {period_end}: "
+          f"{len(pending)} of {len(run.shards)} cycle shards to process")
+    
+    def report(result):
+        icon = '✅' if result['status'] == 'completed' else '❌'
+        print(f"   {icon} Cycle {result['cycle_number']}: {result['bills_generated']} bills, "
+              f"{result['error_count']} skipped")
+    
+    started = time.perf_counter()
+    run = execute_bill_run(run.id, workers=args.workers, on_shard_done=report)
+    print(f"{'✅' if run.status == 'completed' else '❌'} Bill run {run.status} "
+          f"in {time.perf_counter() - started:.1f}s")
+
+def simulate_tariff(args):
+    """Re-price historical usage under a candidate tariff and print revenue deltas"""
+    import json
+    from utils.tariff import CompiledTariff, validate_definition
+    from utils.tariff_simulator import simulate_tariff as run_simulation
+    
+    with open(args.definition) as f:
+        definition = json.load(f)
+    candidate = CompiledTariff(validate_definition(definition), name=args.definition)
+    start_date = datetime.fromisoformat(args.start).date()
+    end_date = datetime.fromisoformat(args.end).date()
+    
+    print(f"🧮 Simulating {args.definition} over {start_date} to {end_date}...")
+    result = run_simulation(candidate, start_date, end_date)
+    
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+    
+    totals = result['totals']
+    print(f"✅ Re-priced {result['bills']} customer-months for {result['customers']} customers "
+          f"in {result['elapsed_seconds']}s")
+    print(f"   Baseline revenue:  ${totals['baseline_revenue']:,.2f}")
+    print(f"   Candidate revenue: ${totals['candidate_revenue']:,.2f}")
+    print(f"   Delta:             ${totals['delta']:,.2f} ({totals['delta_percent']}%)")
+    for group, key in [('by_customer_type', 'customer_type'), ('by_cycle', 'cycle_number'), ('by_tier', 'tier')]:
+        print(f"   {group.replace('_', ' ').title()}:")
+        for row in result[group]:
+            print(f"     {str(row[key]):<20} {row['bills']:>8} bills  delta ${row['delta']:,.2f}")
+
+def rebill(args):
+    """Re-price bills whose usage or tariff changed since they were generated"""
+    from utils.rebilling import run_rebill
+    
+    print("🔁 Re-billing changed periods...")
+    started = time.perf_counter()
+    run = run_rebill()
+    print(f"✅ Checked {run.bills_checked} stale bills, created {run.adjustments_created} adjustments "
+          f"in {time.perf_counter() - started:.1f}s")
+
+def reconcile_summary(args):
+    """Rebuild the billing summary counters from the bills table and report drift"""
+    from models import db
+    from utils.billing_summary import reconcile
+    
+    print("🧮 Reconciling billing summary...")
+    drift = reconcile()
+    db.session.commit()
+    
+    if not drift:
+        print("✅ Billing summary matches the bills table")
+        return
+    for row in drift:
+        print(f"   ⚠️  {row['status']}: stored {row['stored_count']} bills / ${row['stored_amount']:,.2f}, "
+              f"actual {row['actual_count']} bills / ${row['actual_amount']:,.2f}")
+    print(f"✅ Corrected drift in {len(drift)} status counters")
+
+def dispatch_notifications(args):
+    """Deliver queued bill notification emails over pooled SMTP connections"""
+    from utils.notifications import dispatch_notifications as dispatch
+    
+    print("📧 Dispatching queued bill notifications...")
+    result = dispatch(batch_size=args.batch_size, connections=args.connections, limit=args.limit,
+                      retry_failed=args.retry_failed)
+    print(f"✅ Sent {result['sent']} notifications ({result['failed']} failed) "
+          f"in {result['elapsed_seconds']}s ({result['messages_per_second']:,.1f} msgs/s)")
+
+def rebuild_usage_stats(args):
+    """Recompute running usage statistics from stored history"""
+    from models import db
+    from utils.usage_stats import rebuild_usage_stats as rebuild
+    
+    print("📊 Rebuilding running usage statistics...")
+    started = time.perf_counter()
+    rebuilt = rebuild()
+    db.session.commit()
+    print(f"✅ Rebuilt statistics for {rebuilt} customers in {time.perf_counter() - started:.1f}s")
+
+def refresh_baselines(args):
+    """Recompute seasonal usage baselines for customers with changed usage"""
+    from models import db
+    from utils.usage_baselines import refresh_baselines as refresh
+    
+    print(f"📅 Refreshing {'all' if args.full else 'changed'} seasonal baselines...")
+    started = time.perf_counter()
+    refreshed = refresh(full=args.full)
+    db.session.commit()
+    print(f"✅ Refreshed baselines for {refreshed} customers in {time.perf_counter() - started:.1f}s")
+
+def forecast_fleet(args):
+    """Forecast every customer for a month and store the results in the forecasts table"""
+    from utils.fleet_forecast import run_fleet_forecast
+    
+    print(f"📈 Forecasting all customers for {args.year}-{args.month:02d}...")
+    started = time.perf_counter()
+    written = run_fleet_forecast(args.year, args.month, workers=args.workers)
+    print(f"✅ Stored {written} forecasts in {time.perf_counter() - started:.1f}s")
+
+def rebuild_forecast_states(args):
+    """Replay stored usage into Holt-Winters forecast state"""
+    from models import db
+    from utils.holt_winters import rebuild_forecast_states as rebuild
+    
+    print(f"📈 Rebuilding {'all' if args.full else 'flagged'} Holt-Winters forecast states...")
+    started = time.perf_counter()
+    rebuilt = rebuild(full=args.full)
+    db.session.commit()
+    print(f"✅ Rebuilt forecast state for {rebuilt} customers in {time.perf_counter() - started:.1f}s")
+
+def rebuild_usage_rollups(args):
+    """Recreate the monthly and daily usage rollups from stored usage"""
+    from models import db
+    from utils.usage_rollups import rebuild_usage_rollups as rebuild
+    
+    print("🗓️  Rebuilding monthly and daily usage rollups...")
+    started = time.perf_counter()
+    rebuilt = rebuild()
+    db.session.commit()
+    print(f"✅ Rebuilt {rebuilt} customer-month rollups in {time.perf_counter() - started:.1f}s")
+
+def rebuild_usage_store(args):
+    """Rewrite the memory-mapped usage store from the usage table"""
+    from utils.usage_store import rebuild_usage_store as rebuild
+    
+    print("💾 Rebuilding memory-mapped usage store...")
+    started = time.perf_counter()
+    written = rebuild()
+    print(f"✅ Wrote usage arrays for {written} customers in {time.perf_counter() - started:.1f}s")
+
+def rebuild_customer_search(args):
+    """Create the customer directory full-text index and re-index every customer"""
+    from models import db
+    from utils.customer_directory import create_search_index
+    
+    print("🔎 Rebuilding customer search index...")
+    started = time.perf_counter()
+    indexed = create_search_index(db.session.connection())
+    db.session.commit()
+    if not indexed:
+        print("⚠️  No full-text index for this database, search falls back to LIKE scans")
+        return
+    print(f"✅ Rebuilt customer search index in {time.perf_counter() - started:.1f}s")
+
+def run_jobs(args):
+    """Run queued background jobs from this process (JOB_WORKER_MODE=external)"""
+    from utils.jobs import work_queue
+    
+    def report(job):
+        icon = '✅' if job.status == 'completed' else '❌'
+        print(f"   {icon} Job {job.id} ({job.job_type}) {job.status} in {job.to_dict()['elapsed_seconds']}s")
+    
+    print("⚙️  Waiting for queued jobs..." if not args.once else "⚙️  Running queued jobs...")
+    processed = work_queue(poll_seconds=args.poll, once=args.once, on_job_done=report)
+    print(f"✅ Ran {processed} jobs")
+
+def main():
+    """Parse arguments and run the selected command"""
+    parser = argparse.ArgumentParser(description='HydroSpark management commands')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    
+    import_parser = subparsers.add_parser('import-usage', help='Import usage from Parquet/Arrow files')
+    import_parser.add_argument('paths', nargs='+', help='.parquet, .arrow or .feather files')
+    import_parser.add_argument('--batch-size', type=int, default=None, help='Rows per batch and commit')
+    import_parser.add_argument('--skip-existing', action='store_true', help='Keep existing readings instead of overwriting')
+    import_parser.set_defaults(func=import_usage)
+    
+    export_parser = subparsers.add_parser('export', help='Export tables to Parquet partitioned by year/month')
+    export_parser.add_argument('out_dir', help='Output directory')
+    export_parser.add_argument('--tables', nargs='+', default=['usage', 'bills', 'anomalies'],
+                               choices=['usage', 'bills', 'anomalies'])
+    export_parser.set_defaults(func=export_data)
+    
+    run_parser = subparsers.add_parser('bill-run', help='Generate bills for a month sharded by billing cycle')
+    run_parser.add_argument('--year', type=int, required=True)
+    run_parser.add_argument('--month', type=int, required=True)
+    run_parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: CPU count)')
+    run_parser.set_defaults(func=bill_run)
+    
+    simulate_parser = subparsers.add_parser('simulate-tariff', help='Re-price history under a candidate tariff')
+    simulate_parser.add_argument('definition', help='JSON file with tiers, seasonal_multipliers and fees')
+    simulate_parser.add_argument('--start', required=True, help='First date (YYYY-MM-DD)')
+    simulate_parser.add_argument('--end', required=True, help='Last date (YYYY-MM-DD)')
+    simulate_parser.add_argument('--json', action='store_true', help='Print the full result as JSON')
+    simulate_parser.set_defaults(func=simulate_tariff)
+    
+    rebill_parser = subparsers.add_parser('rebill', help='Re-price bills affected by usage or tariff corrections')
+    rebill_parser.set_defaults(func=rebill)
+    
+    reconcile_parser = subparsers.add_parser('reconcile-summary', help='Rebuild billing summary counters and report drift')
+    reconcile_parser.set_defaults(func=reconcile_summary)
+    
+    dispatch_parser = subparsers.add_parser('dispatch-notifications', help='Email queued bill notifications')
+    dispatch_parser.add_argument('--batch-size', type=int, default=None, help='Messages per batch and commit')
+    dispatch_parser.add_argument('--connections', type=int, default=None, help='Parallel SMTP connections')
+    dispatch_parser.add_argument('--limit', type=int, default=None, help='Stop after this many messages')
+    dispatch_parser.add_argument('--retry-failed', action='store_true', help='Requeue failed messages first')
+    dispatch_parser.set_defaults(func=dispatch_notifications)
+    
+    stats_parser = subparsers.add_parser('rebuild-usage-stats', help='Recompute running anomaly statistics from history')
+    stats_parser.set_defaults(func=rebuild_usage_stats)
+    
+    baselines_parser = subparsers.add_parser('refresh-baselines', help='Recompute month x weekday usage baselines')
+    baselines_parser.add_argument('--full', action='store_true', help='Rebuild every customer instead of changed ones')
+    baselines_parser.set_defaults(func=refresh_baselines)
+    
+    forecast_parser = subparsers.add_parser('forecast-fleet', help='Forecast all customers for a month')
+    forecast_parser.add_argument('--year', type=int, required=True)
+    forecast_parser.add_argument('--month', type=int, required=True)
+    forecast_parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: FORECAST_WORKERS or CPU count)')
+    forecast_parser.set_defaults(func=forecast_fleet)
+    
+    state_parser = subparsers.add_parser('rebuild-forecast-states', help='Replay usage into Holt-Winters forecast state')
+    state_parser.add_argument('--full', action='store_true', help='Rebuild every customer instead of those with corrected history')
+    state_parser.set_defaults(func=rebuild_forecast_states)
+    
+    rollups_parser = subparsers.add_parser('rebuild-usage-rollups', help='Recreate monthly and daily usage rollups from history')
+    rollups_parser.set_defaults(func=rebuild_usage_rollups)
+    
+    store_parser = subparsers.add_parser('rebuild-usage-store', help='Rewrite the memory-mapped usage store (USAGE_STORE_PATH)')
+    store_parser.set_defaults(func=rebuild_usage_store)
+    
+    search_parser = subparsers.add_parser('rebuild-customer-search', help='Create and fill the customer full-text index')
+    search_parser.set_defaults(func=rebuild_customer_search)
+    
+    jobs_parser = subparsers.add_parser('run-jobs', help='Work the background job queue')
+    jobs_parser.add_argument('--once', action='store_true', help='Exit when the queue is empty')
+    jobs_parser.add_argument('--poll', type=float, default=None, help='Seconds between queue polls')
+    jobs_parser.set_defaults(func=run_jobs)
+    
+    args = parser.parse_args()
+    
+    app = create_app()
+    with app.app_context():
+        args.func(args)
+
+if __name__ == '__main__':
+    main()
@@ -50,7 +50,7 @@ class Customer(db.Model):
     bills = db.relationship('Bill', backref='customer', lazy=True, cascade='all, delete-orphan')
     anomalies = db.relationship('Anomaly', backref='customer', lazy=True, cascade='all, delete-orphan')
     
-    def to_dict(self, include_stats=False):
+    def to_dict(self, include_stats=False, stats=None):
         data = {
             'id': self.id,
             'name': self.name,
@@ -65,21 +65,11 @@ class Customer(db.Model):
         }
         
         if include_stats:
-            # Add usage statistics
-            total_usage = db.session.query(db.func.sum(Usage.usage_ccf)).filter(
-                Usage.customer_id == self.id
-            ).scalar() or 0
-            
-            avg_daily_usage = db.session.query(db.func.avg(Usage.usage_ccf)).filter(
-                Usage.customer_id == self.id
-            ).scalar() or 0
-            
-            data['stats'] = {
-                'total_usage': float(total_usage),
-                'avg_daily_usage': float(avg_daily_usage),
-                'total_bills': len(self.bills),
-                'anomaly_count': len([a for a in self.anomalies if not a.reviewed])
-            }
+            # Add usage statistics (pass stats from load_customer_stats when serialising many customers)
+            if stats is None:
+                from utils.customer_stats import load_customer_stats
+                stats = load_customer_stats([self.id])[self.id]
+            data['stats'] = stats
         
         return data
 
@@ -92,9 +82,11 @@ class Usage(db.Model):
     date = db.Column(db.Date, nullable=False)
     usage_ccf = db.Column(db.Float, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
     
     __table_args__ = (
         db.UniqueConstraint('customer_id', 'date', name='unique_customer_date'),
+        db.Index('idx_usage_date', 'date'),
     )
     
     def to_dict(self):
@@ -107,6 +99,201 @@ class Usage(db.Model):
         }
 
 
+class UsageStats(db.Model):
+    __tablename__ = 'usage_stats'
+    
+    customer_id = db.Column(db.Integer, db.ForeignKey('customers.id'), primary_key=True)
+    readings = db.Column(db.Integer, nullable=False, default=0)
+    weight = db.Column(db.Float, nullable=False, default=0)  # Decayed reading count
+    mean = db.Column(db.Float, nullable=False, default=0)
+    m2 = db.Column(db.Float, nullable=False, default=0)  # Weighted sum of squared deviations
+    last_date = db.Column(db.Date, nullable=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'customer_id': self.customer_id,
+            'readings': self.readings,
+            'mean': round(self.mean, 4),
+            'std_deviation': round((max(self.m2, 0) / self.weight) ** 0.5, 4) if self.weight else 0,
+            'last_date': self.last_date.isoformat() if self.last_date else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+
+def _rollup_dict(readings, total, sum_squares, min_usage, max_usage):
+    mean = total / readings if readings else 0
+    return {
+        'total_usage': round(total, 2),
+        'avg_usage': round(mean, 2),
+        'min_usage': round(min_usage, 2) if min_usage is not None else None,
+        'max_usage': round(max_usage, 2) if max_usage is not None else None,
+        'std_deviation': round(max(sum_squares / readings - mean * mean, 0) ** 0.5, 4) if readings else 0
+    }
+
+
+class UsageMonthly(db.Model):
+    __tablename__ = 'usage_monthly'
+    
+    customer_id = db.Column(db.Integer, db.ForeignKey('customers.id'), primary_key=True)
+    year = db.Column(db.Integer, primary_key=True)
+    month = db.Column(db.Integer, primary_key=True)  # 1-12
+    readings = db.Column(db.Integer, nullable=False, default=0)
+    total = db.Column(db.Float, nullable=False, default=0)
+    sum_squares = db.Column(db.Float, nullable=False, default=0)
+    min_usage = db.Column(db.Float, nullable=True)
+    max_usage = db.Column(db.Float, nullable=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'month': f'{self.year:04d}-{self.month:02d}',
+            'days': self.readings,
+            **_rollup_dict(self.readings, self.total, self.sum_squares, self.min_usage, self.max_usage)
+        }
+
+
+class UsageDaily(db.Model):
+    __tablename__ = 'usage_daily'
+    
+    date = db.Column(db.Date, primary_key=True)
+    readings = db.Column(db.Integer, nullable=False, default=0)  # Customers with a reading that day
+    total = db.Column(db.Float, nullable=False, default=0)
+    sum_squares = db.Column(db.Float, nullable=False, default=0)
+    min_usage = db.Column(db.Float, nullable=True)
+    max_usage = db.Column(db.Float, nullable=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'date': self.date.isoformat() if self.date else None,
+            'customers': self.readings,
+            **_rollup_dict(self.readings, self.total, self.sum_squares, self.min_usage, self.max_usage)
+        }
+
+
+class UsageInterval(db.Model):
+    __tablename__ = 'usage_intervals'
+    
+    customer_id = db.Column(db.Integer, db.ForeignKey('customers.id'), primary_key=True)
+    date = db.Column(db.Date, primary_key=True)
+    interval_minutes = db.Column(db.Integer, nullable=False, default=15)
+    readings = db.Column(db.LargeBinary, nullable=False)  # Little-endian float64 per interval from midnight, NaN where missing
+    usage_ccf = db.Column(db.Float, nullable=False)  # Sum of the intervals, mirrored into usage
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    __table_args__ = (
+        db.Index('idx_usage_interval_date', 'date'),
+    )
+    
+    def to_dict(self):
+        from utils.usage_intervals import unpack_intervals
+        
+        return {
+            'customer_id': self.customer_id,
+            'date': self.date.isoformat() if self.date else None,
+            'interval_minutes': self.interval_minutes,
+            'intervals': [None if value != value else value for value in unpack_intervals(self.readings).tolist()],
+            'usage_ccf': self.usage_ccf,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+
+class UsageBaseline(db.Model):
+    __tablename__ = 'usage_baselines'
+    
+    customer_id = db.Column(db.Integer, db.ForeignKey('customers.id'), primary_key=True)
+    month = db.Column(db.Integer, primary_key=True)  # 1-12
+    day_of_week = db.Column(db.Integer, primary_key=True)  # 0 = Monday
+    readings = db.Column(db.Integer, nullable=False)
+    mean = db.Column(db.Float, nullable=False)
+    m2 = db.Column(db.Float, nullable=False)  # Sum of squared deviations from mean
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'customer_id': self.customer_id,
+            'month': self.month,
+            'day_of_week': self.day_of_week,
+            'readings': self.readings,
+            'mean': round(self.mean, 4),
+            'std_deviation': round((self.m2 / self.readings) ** 0.5, 4) if self.readings else 0,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+
+class DetectionWatermark(db.Model):
+    __tablename__ = 'detection_watermarks'
+    
+    method = db.Column(db.String(20), primary_key=True)  # Key in DETECTION_METHODS
+    scored_through = db.Column(db.DateTime, nullable=False)  # Usage written before this has been scored
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class ForecastState(db.Model):
+    __tablename__ = 'forecast_states'
+    
+    customer_id = db.Column(db.Integer, db.ForeignKey('customers.id'), primary_key=True)
+    readings = db.Column(db.Integer, nullable=False, default=0)
+    level = db.Column(db.Float, nullable=False, default=0)
+    trend = db.Column(db.Float, nullable=False, default=0)  # CCF per day
+    weekly = db.Column(db.JSON, nullable=False)  # 7 seasonal offsets, Monday first
+    yearly = db.Column(db.JSON, nullable=False)  # 12 seasonal offsets, January first
+    error_var = db.Column(db.Float, nullable=False, default=0)  # Smoothed one-step squared error
+    last_date = db.Column(db.Date, nullable=True)
+    needs_rebuild = db.Column(db.Boolean, default=False, index=True)  # A past reading was added or corrected
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'customer_id': self.customer_id,
+            'readings': self.readings,
+            'level': round(self.level, 4),
+            'trend': round(self.trend, 6),
+            'weekly': [round(v, 4) for v in self.weekly],
+            'yearly': [round(v, 4) for v in self.yearly],
+            'last_date': self.last_date.isoformat() if self.last_date else None,
+            'needs_rebuild': self.needs_rebuild,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+
+class Forecast(db.Model):
+    __tablename__ = 'forecasts'
+    
+    customer_id = db.Column(db.Integer, db.ForeignKey('customers.id'), primary_key=True)
+    weekday_mean = db.Column(db.JSON, nullable=False)  # 7 values, Monday first, from the last 90 readings
+    weekday_std = db.Column(db.JSON, nullable=False)
+    trend_factor = db.Column(db.Float, nullable=False)
+    recent_avg = db.Column(db.Float, nullable=False)  # Last 30 readings
+    previous_avg = db.Column(db.Float, nullable=False)  # 30 readings before those
+    data_points = db.Column(db.Integer, nullable=False)
+    last_usage_date = db.Column(db.Date, nullable=False)
+    target_year = db.Column(db.Integer, nullable=False)
+    target_month = db.Column(db.Integer, nullable=False)
+    predicted_usage = db.Column(db.Float, nullable=False)  # Target month total in CCF
+    predicted_amount = db.Column(db.Float, nullable=False)
+    tariff_version = db.Column(db.Integer, nullable=True)
+    generated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        db.Index('idx_forecast_target', 'target_year', 'target_month'),
+    )
+    
+    def to_dict(self):
+        return {
+            'customer_id': self.customer_id,
+            'target_year': self.target_year,
+            'target_month': self.target_month,
+            'predicted_usage': self.predicted_usage,
+            'predicted_amount': self.predicted_amount,
+            'trend_factor': self.trend_factor,
+            'last_usage_date': self.last_usage_date.isoformat() if self.last_usage_date else None,
+            'tariff_version': self.tariff_version,
+            'generated_at': self.generated_at.isoformat() if self.generated_at else None
+        }
+
+
 class Bill(db.Model):
     __tablename__ = 'bills'
     
@@ -120,10 +307,19 @@ class Bill(db.Model):
     fees = db.Column(db.Float, nullable=False)
     total_amount = db.Column(db.Float, nullable=False)
     status = db.Column(db.String(50), default='pending')  # pending, sent, paid
+    tariff_version = db.Column(db.Integer, nullable=True)  # Tariff id, None for Config.PRICING
     generated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    repriced_at = db.Column(db.DateTime, nullable=True)  # Last re-bill adjustment
     sent_at = db.Column(db.DateTime, nullable=True)
     paid_at = db.Column(db.DateTime, nullable=True)
     
+    adjustments = db.relationship('BillAdjustment', backref='bill', lazy=True, cascade='all, delete-orphan',
+                                  order_by='BillAdjustment.id')
+    
+    __table_args__ = (
+        db.UniqueConstraint('customer_id', 'billing_period_start', 'billing_period_end', name='unique_customer_period'),
+    )
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -137,12 +333,174 @@ class Bill(db.Model):
             'fees': self.fees,
             'total_amount': self.total_amount,
             'status': self.status,
+            'tariff_version': self.tariff_version,
             'generated_at': self.generated_at.isoformat() if self.generated_at else None,
+            'repriced_at': self.repriced_at.isoformat() if self.repriced_at else None,
             'sent_at': self.sent_at.isoformat() if self.sent_at else None,
             'paid_at': self.paid_at.isoformat() if self.paid_at else None
         }
 
 
+class BillingSummary(db.Model):
+    __tablename__ = 'billing_summary'
+    
+    status = db.Column(db.String(50), primary_key=True)
+    bill_count = db.Column(db.Integer, nullable=False, default=0)
+    amount_cents = db.Column(db.BigInteger, nullable=False, default=0)  # Exact sum of total_amount
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class BillNotification(db.Model):
+    __tablename__ = 'bill_notifications'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    bill_id = db.Column(db.Integer, db.ForeignKey('bills.id'), nullable=False)
+    recipient = db.Column(db.String(120), nullable=False)
+    status = db.Column(db.String(20), default='queued', index=True)  # queued, sent, failed
+    error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime, nullable=True)
+    
+    bill = db.relationship('Bill', backref=db.backref('notifications', lazy=True, cascade='all, delete-orphan'))
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'bill_id': self.bill_id,
+            'recipient': self.recipient,
+            'status': self.status,
+            'error': self.error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'sent_at': self.sent_at.isoformat() if self.sent_at else None
+        }
+
+
+class BillAdjustment(db.Model):
+    __tablename__ = 'bill_adjustments'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    bill_id = db.Column(db.Integer, db.ForeignKey('bills.id'), nullable=False, index=True)
+    reason = db.Column(db.String(50), nullable=False)  # usage_correction, tariff_change
+    previous_usage = db.Column(db.Float, nullable=False)
+    new_usage = db.Column(db.Float, nullable=False)
+    previous_amount = db.Column(db.Float, nullable=False)
+    new_amount = db.Column(db.Float, nullable=False)
+    amount_delta = db.Column(db.Float, nullable=False)
+    previous_tariff_version = db.Column(db.Integer, nullable=True)
+    tariff_version = db.Column(db.Integer, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'bill_id': self.bill_id,
+            'reason': self.reason,
+            'previous_usage': self.previous_usage,
+            'new_usage': self.new_usage,
+            'previous_amount': self.previous_amount,
+            'new_amount': self.new_amount,
+            'amount_delta': self.amount_delta,
+            'previous_tariff_version': self.previous_tariff_version,
+            'tariff_version': self.tariff_version,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+
+class RebillRun(db.Model):
+    __tablename__ = 'rebill_runs'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    started_at = db.Column(db.DateTime, default=datetime.utcnow)
+    completed_at = db.Column(db.DateTime, nullable=True)
+    bills_checked = db.Column(db.Integer, default=0)
+    adjustments_created = db.Column(db.Integer, default=0)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'completed_at': self.completed_at.isoformat() if self.completed_at else None,
+            'bills_checked': self.bills_checked,
+            'adjustments_created': self.adjustments_created
+        }
+
+
+class Tariff(db.Model):
+    __tablename__ = 'tariffs'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(200), nullable=False)
+    effective_date = db.Column(db.Date, nullable=False)
+    definition = db.Column(db.JSON, nullable=False)  # Same shape as Config.PRICING
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'effective_date': self.effective_date.isoformat() if self.effective_date else None,
+            'definition': self.definition,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+
+class BillRun(db.Model):
+    __tablename__ = 'bill_runs'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    billing_period_start = db.Column(db.Date, nullable=False)
+    billing_period_end = db.Column(db.Date, nullable=False)
+    status = db.Column(db.String(50), default='running')  # running, completed, failed
+    started_at = db.Column(db.DateTime, default=datetime.utcnow)
+    completed_at = db.Column(db.DateTime, nullable=True)
+    
+    shards = db.relationship('BillRunShard', backref='run', lazy=True, cascade='all, delete-orphan')
+    
+    __table_args__ = (
+        db.UniqueConstraint('billing_period_start', 'billing_period_end', name='unique_run_period'),
+    )
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'billing_period_start': self.billing_period_start.isoformat() if self.billing_period_start else None,
+            'billing_period_end': self.billing_period_end.isoformat() if self.billing_period_end else None,
+            'status': self.status,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'completed_at': self.completed_at.isoformat() if self.completed_at else None,
+            'shards': [s.to_dict() for s in self.shards]
+        }
+
+
+class BillRunShard(db.Model):
+    __tablename__ = 'bill_run_shards'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    run_id = db.Column(db.Integer, db.ForeignKey('bill_runs.id'), nullable=False)
+    cycle_number = db.Column(db.Integer, nullable=False)
+    status = db.Column(db.String(50), default='pending')  # pending, completed, failed
+    bills_generated = db.Column(db.Integer, default=0)
+    error_count = db.Column(db.Integer, default=0)
+    error = db.Column(db.Text, nullable=True)
+    completed_at = db.Column(db.DateTime, nullable=True)
+    
+    __table_args__ = (
+        db.UniqueConstraint('run_id', 'cycle_number', name='unique_run_cycle'),
+    )
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'run_id': self.run_id,
+            'cycle_number': self.cycle_number,
+            'status': self.status,
+            'bills_generated': self.bills_generated,
+            'error_count': self.error_count,
+            'error': self.error,
+            'completed_at': self.completed_at.isoformat() if self.completed_at else None
+        }
+
+
 class Anomaly(db.Model):
     __tablename__ = 'anomalies'
     
@@ -157,6 +515,10 @@ class Anomaly(db.Model):
     reviewed = db.Column(db.Boolean, default=False)
     notes = db.Column(db.Text, nullable=True)
     
+    __table_args__ = (
+        db.Index('idx_anomaly_customer_date', 'customer_id', 'date'),
+    )
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -171,3 +533,47 @@ class Anomaly(db.Model):
             'reviewed': self.reviewed,
             'notes': self.notes
         }
+
+
+class Job(db.Model):
+    __tablename__ = 'jobs'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    job_type = db.Column(db.String(50), nullable=False)  # generate_bills, detect_anomalies
+    status = db.Column(db.String(20), default='queued', index=True)  # queued, running, completed, failed, cancelled
+    params = db.Column(db.JSON, nullable=True)
+    result = db.Column(db.JSON, nullable=True)  # Partial results while running
+    progress_done = db.Column(db.Integer, default=0)
+    progress_total = db.Column(db.Integer, nullable=True)
+    error = db.Column(db.Text, nullable=True)
+    cancel_requested = db.Column(db.Boolean, default=False)
+    worker = db.Column(db.String(120), nullable=True)  # host:pid:token of the process running the job
+    attempts = db.Column(db.Integer, default=0)  # Times the job has been claimed
+    heartbeat_at = db.Column(db.DateTime, nullable=True)  # Last claim or progress commit
+    created_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    completed_at = db.Column(db.DateTime, nullable=True)
+    
+    def to_dict(self):
+        finished = self.completed_at or datetime.utcnow()
+        return {
+            'id': self.id,
+            'job_type': self.job_type,
+            'status': self.status,
+            'params': self.params,
+            'result': self.result,
+            'progress': {
+                'done': self.progress_done,
+                'total': self.progress_total,
+                'percent': round(self.progress_done / self.progress_total * 100, 1) if self.progress_total else None
+            },
+            'error': self.error,
+            'cancel_requested': self.cancel_requested,
+            'attempts': self.attempts,
+            'created_by': self.created_by,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'completed_at': self.completed_at.isoformat() if self.completed_at else None,
+            'elapsed_seconds': round((finished - self.started_at).total_seconds(), 3) if self.started_at else None
+        }
@@ -2,9 +2,13 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from models import db, User, Customer, Bill, Usage
 from utils.billing_calculator import calculate_total_bill, generate_bill_summary
-from datetime import datetime, timedelta
+from utils.jobs import enqueue_job
+from utils.rebilling import run_rebill
+from utils.billing_summary import get_summary, ensure_summary, transition_bills, to_cents
+from utils.bill_status import ALLOWED_TRANSITIONS, bill_conditions, update_bill_status
+from utils.notifications import queue_bill_notifications
+from datetime import MAXYEAR, MINYEAR, date, datetime, timedelta
 from dateutil.relativedelta import relativedelta
-from sqlalchemy import func
 
 billing_bp = Blueprint('billing', __name__)
 
@@ -70,7 +74,7 @@ def get_bill(bill_id):
 @billing_bp.route('/generate', methods=['POST'])
 @jwt_required()
 def generate_bills():
-    """Generate bills for all customers or specific period (billing role only)"""
+    """Start bill generation for all customers or specific period (billing role only)"""
     user_id = get_jwt_identity()
     user = User.query.get(user_id)
     
@@ -95,91 +99,79 @@ def generate_bills():
     period_start = datetime(year, month, 1).date()
     period_end = (datetime(year, month, 1) + relativedelta(months=1) - timedelta(days=1)).date()
     
-    # Get customer_id if specified
+    # Get customer_id or billing cycle if specified
     customer_id = data.get('customer_id')
+    cycle_number = data.get('cycle_number')
     
     if customer_id:
-        customers = [Customer.query.get(customer_id)]
-        if not customers[0]:
+        if not Customer.query.get(customer_id):
             return jsonify({'error': 'Customer not found'}), 404
+        customer_ids = [customer_id]
     else:
-        customers = Customer.query.all()
+        customer_ids = None
     
-    generated_bills = []
-    errors = []
+    try:
+        # Runs on the job workers; poll /api/jobs/<id> for progress
+        job = enqueue_job('generate_bills', {
+            'period_start': period_start.isoformat(),
+            'period_end': period_end.isoformat(),
+            'customer_ids': customer_ids,
+            'cycle_number': cycle_number
+        }, user_id=user.id)
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
     
-    for customer in customers:
-        try:
-            # Check if bill already exists for this period
-            existing_bill = Bill.query.filter_by(
-                customer_id=customer.id,
-                billing_period_start=period_start,
-                billing_period_end=period_end
-            ).first()
-            
-            if existing_bill:
-                errors.append({
-                    'customer_id': customer.id,
-                    'error': 'Bill already exists for this period'
-                })
-                continue
-            
-            # Get usage for the period
-            usage_records = Usage.query.filter(
-                Usage.customer_id == customer.id,
-                Usage.date >= period_start,
-                Usage.date <= period_end
-            ).all()
-            
-            if not usage_records:
-                errors.append({
-                    'customer_id': customer.id,
-                    'error': 'No usage data for this period'
-                })
-                continue
-            
-            total_usage = sum(u.usage_ccf for u in usage_records)
-            
-            # Calculate bill
-            bill_calc = calculate_total_bill(total_usage, month)
-            
-            # Create bill record
-            bill = Bill(
-                customer_id=customer.id,
-                billing_period_start=period_start,
-                billing_period_end=period_end,
-                total_usage=bill_calc['total_usage'],
-                base_charge=bill_calc['breakdown']['usage_charge'],
-                usage_charge=bill_calc['usage_charge'],
-                fees=bill_calc['total_fees'],
-                total_amount=bill_calc['total_amount'],
-                status='pending'
-            )
-            
-            db.session.add(bill)
-            generated_bills.append(bill)
-            
-        except Exception as e:
-            errors.append({
-                'customer_id': customer.id,
-                'error': str(e)
-            })
+    return jsonify({
+        'message': f'Bill generation started for {period_start} to {period_end}',
+        'job': job.to_dict()
+    }), 202
+
+@billing_bp.route('/<int:bill_id>/adjustments', methods=['GET'])
+@jwt_required()
+def get_bill_adjustments(bill_id):
+    """Get re-billing adjustments for a bill"""
+    user_id = get_jwt_identity()
+    user = User.query.get(user_id)
+    
+    if not user:
+        return jsonify({'error': 'User not found'}), 404
+    
+    bill = Bill.query.get(bill_id)
+    if not bill:
+        return jsonify({'error': 'Bill not found'}), 404
+    
+    # Check access
+    if user.role == 'customer' and user.customer_id != bill.customer_id:
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    return jsonify([a.to_dict() for a in bill.adjustments]), 200
+
+@billing_bp.route('/rebill', methods=['POST'])
+@jwt_required()
+def rebill_changed():
+    """Re-price bills whose usage or tariff changed since they were generated (billing role only)"""
+    user_id = get_jwt_identity()
+    user = User.query.get(user_id)
+    
+    if not user or user.role not in ['billing', 'operations']:
+        return jsonify({'error': 'Unauthorized'}), 403
     
     try:
-        db.session.commit()
-        return jsonify({
-            'message': f'Generated {len(generated_bills)} bills',
-            'bills': [b.to_dict() for b in generated_bills],
-            'errors': errors
-        }), 201
+        run = run_rebill()
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
+    
+    return jsonify({
+        'message': f'Checked {run.bills_checked} bills, created {run.adjustments_created} adjustments',
+        'run': run.to_dict()
+    }), 200
 
 @billing_bp.route('/<int:bill_id>/send', methods=['POST'])
 @jwt_required()
 def send_bill(bill_id):
-    """Mark bill as sent (in production, would send email)"""
+    """Mark bill as sent and queue its email notification"""
     user_id = get_jwt_identity()
     user = User.query.get(user_id)
     
@@ -190,15 +182,16 @@ def send_bill(bill_id):
     if not bill:
         return jsonify({'error': 'Bill not found'}), 404
     
+    ensure_summary()
+    transition_bills(bill.status, 'sent', 1, to_cents(bill.total_amount))
     bill.status = 'sent'
     bill.sent_at = datetime.utcnow()
     
     try:
+        # Delivered by the notification dispatcher (manage.py dispatch-notifications)
+        queue_bill_notifications([Bill.id == bill.id])
         db.session.commit()
         
-        # In production, would send email here
-        # send_email(bill.customer.email, bill_summary, bill.to_dict())
-        
         return jsonify({
             'message': 'Bill sent successfully',
             'bill': bill.to_dict()
@@ -225,6 +218,8 @@ def mark_paid(bill_id):
     if user.role not in ['billing', 'operations'] and user.customer_id != bill.customer_id:
         return jsonify({'error': 'Unauthorized'}), 403
     
+    ensure_summary()
+    transition_bills(bill.status, 'paid', 1, to_cents(bill.total_amount))
     bill.status = 'paid'
     bill.paid_at = datetime.utcnow()
     
@@ -238,6 +233,93 @@ def mark_paid(bill_id):
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+def _batch_conditions(data):
+    """
+    Bill filters from a batch request body: bill_ids, or year and month with an optional cycle_number
+    
+    Raises:
+        ValueError: With a message for the client when no selector is given or a value is invalid
+    """
+    if data.get('bill_ids'):
+        try:
+            if not isinstance(data['bill_ids'], list):
+                raise TypeError
+            bill_ids = [int(i) for i in data['bill_ids']]
+        except (TypeError, ValueError):
+            raise ValueError('bill_ids must be a list of integers')
+        return bill_conditions(bill_ids=bill_ids)
+    
+    if 'year' in data or 'month' in data:
+        try:
+            year, month = int(data.get('year')), int(data.get('month'))
+            cycle_number = int(data['cycle_number']) if data.get('cycle_number') is not None else None
+        except (TypeError, ValueError):
+            raise ValueError('year, month and cycle_number must be integers')
+        if not MINYEAR <= year <= MAXYEAR or not 1 <= month <= 12:
+            raise ValueError(f'year must be {MINYEAR}-{MAXYEAR} and month 1-12')
+        period_start = date(year, month, 1)
+        return bill_conditions(period_start=period_start, period_end=period_start + relativedelta(day=31),
+                               cycle_number=cycle_number)
+    
+    raise ValueError('Provide bill_ids, or year and month')
+
+@billing_bp.route('/send-batch', methods=['POST'])
+@jwt_required()
+def send_bills_batch():
+    """Mark many pending bills as sent in one update and queue their notifications"""
+    user_id = get_jwt_identity()
+    user = User.query.get(user_id)
+    
+    if not user or user.role not in ['billing', 'operations']:
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    try:
+        conditions = _batch_conditions(request.get_json() or {})
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    try:
+        # Queued first, while the bills about to be sent are the pending ones
+        queued = queue_bill_notifications(conditions + [Bill.status.in_(ALLOWED_TRANSITIONS['sent'])])
+        updated, _ = update_bill_status(conditions, 'sent')
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+    
+    return jsonify({
+        'message': f'Sent {updated} bills',
+        'updated': updated,
+        'notifications_queued': queued
+    }), 200
+
+@billing_bp.route('/pay-batch', methods=['POST'])
+@jwt_required()
+def mark_paid_batch():
+    """Mark many pending or sent bills as paid in one update"""
+    user_id = get_jwt_identity()
+    user = User.query.get(user_id)
+    
+    if not user or user.role not in ['billing', 'operations']:
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    try:
+        conditions = _batch_conditions(request.get_json() or {})
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    try:
+        updated, _ = update_bill_status(conditions, 'paid')
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+    
+    return jsonify({
+        'message': f'Marked {updated} bills as paid',
+        'updated': updated
+    }), 200
+
 @billing_bp.route('/summary', methods=['GET'])
 @jwt_required()
 def get_billing_summary():
@@ -248,26 +330,19 @@ def get_billing_summary():
     if not user or user.role not in ['billing', 'operations', 'support']:
         return jsonify({'error': 'Unauthorized'}), 403
     
-    # Get summary statistics
-    total_bills = Bill.query.count()
-    pending_bills = Bill.query.filter_by(status='pending').count()
-    sent_bills = Bill.query.filter_by(status='sent').count()
-    paid_bills = Bill.query.filter_by(status='paid').count()
-    
-    total_revenue = db.session.query(func.sum(Bill.total_amount)).filter_by(status='paid').scalar() or 0
-    pending_revenue = db.session.query(func.sum(Bill.total_amount)).filter_by(status='pending').scalar() or 0
-    outstanding_revenue = db.session.query(func.sum(Bill.total_amount)).filter_by(status='sent').scalar() or 0
+    # Counters are maintained as bills change state, so this is a constant-time read
+    summary = get_summary()
     
     return jsonify({
         'counts': {
-            'total': total_bills,
-            'pending': pending_bills,
-            'sent': sent_bills,
-            'paid': paid_bills
+            'total': sum(s['count'] for s in summary.values()),
+            'pending': summary['pending']['count'],
+            'sent': summary['sent']['count'],
+            'paid': summary['paid']['count']
         },
         'revenue': {
-            'total_collected': round(total_revenue, 2),
-            'pending': round(pending_revenue, 2),
-            'outstanding': round(outstanding_revenue, 2)
+            'total_collected': round(summary['paid']['amount'], 2),
+            'pending': round(summary['pending']['amount'], 2),
+            'outstanding': round(summary['sent']['amount'], 2)
         }
     }), 200
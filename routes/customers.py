@@ -1,8 +1,8 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from models import db, User, Customer, Usage
+from models import db, User, Customer, Usage, UsageMonthly
+from utils.customer_directory import DIRECTORY_FIELDS, search_customers
 from datetime import datetime, timedelta
-from sqlalchemy import func
 
 customers_bp = Blueprint('customers', __name__)
 
@@ -17,7 +17,7 @@ def check_access(user, customer_id=None):
 @customers_bp.route('', methods=['GET'])
 @jwt_required()
 def get_customers():
-    """Get all customers (company users only)"""
+    """Get a page of the customer directory (company users only)"""
     user_id = get_jwt_identity()
     user = User.query.get(user_id)
     
@@ -28,8 +28,23 @@ def get_customers():
     if user.role not in ['operations', 'billing', 'support']:
         return jsonify({'error': 'Unauthorized'}), 403
     
-    customers = Customer.query.all()
-    return jsonify([c.to_dict(include_stats=True) for c in customers]), 200
+    fields = request.args.get('fields')
+    if fields:
+        fields = [f.strip() for f in fields.split(',') if f.strip()]
+        invalid = [f for f in fields if f not in DIRECTORY_FIELDS]
+        if invalid:
+            return jsonify({'error': f"Unknown fields: {', '.join(invalid)}. Valid fields: {', '.join(DIRECTORY_FIELDS)}"}), 400
+    
+    page = search_customers(
+        fields=fields,
+        customer_type=request.args.get('customer_type'),
+        cycle_number=request.args.get('cycle_number', type=int),
+        search=request.args.get('search'),
+        cursor=request.args.get('cursor', type=int),
+        limit=max(1, min(request.args.get('limit', 50, type=int), 500)),
+        include_total=request.args.get('include_total', 'false').lower() == 'true'
+    )
+    return jsonify(page), 200
 
 @customers_bp.route('/<int:customer_id>', methods=['GET'])
 @jwt_required()
@@ -113,26 +128,12 @@ def get_monthly_usage(customer_id):
     if not check_access(user, customer_id):
         return jsonify({'error': 'Unauthorized'}), 403
     
-    # Get monthly usage aggregation
-    monthly_usage = db.session.query(
-        func.strftime('%Y-%m', Usage.date).label('month'),
-        func.sum(Usage.usage_ccf).label('total_usage'),
-        func.avg(Usage.usage_ccf).label('avg_usage'),
-        func.count(Usage.id).label('days')
-    ).filter(
-        Usage.customer_id == customer_id
-    ).group_by(
-        func.strftime('%Y-%m', Usage.date)
-    ).order_by(
-        func.strftime('%Y-%m', Usage.date).desc()
+    # Monthly usage from the maintained rollup
+    monthly_usage = UsageMonthly.query.filter_by(customer_id=customer_id).order_by(
+        UsageMonthly.year.desc(), UsageMonthly.month.desc()
     ).all()
     
-    return jsonify([{
-        'month': m.month,
-        'total_usage': round(m.total_usage, 2),
-        'avg_usage': round(m.avg_usage, 2),
-        'days': m.days
-    } for m in monthly_usage]), 200
+    return jsonify([m.to_dict() for m in monthly_usage]), 200
 
 @customers_bp.route('/<int:customer_id>', methods=['PUT'])
 @jwt_required()
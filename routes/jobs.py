@@ -0,0 +1,87 @@
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from models import db, User, Job
+from utils.jobs import cancel_job
+
+jobs_bp = Blueprint('jobs', __name__)
+
+def can_view(user, job):
+    """Company users see all jobs, anyone else only their own"""
+    return user.role in ['operations', 'billing', 'support'] or job.created_by == user.id
+
+@jobs_bp.route('', methods=['GET'])
+@jwt_required()
+def get_jobs():
+    """Get recent background jobs (company users only)"""
+    user_id = get_jwt_identity()
+    user = User.query.get(user_id)
+    
+    if not user or user.role not in ['operations', 'billing', 'support']:
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    query = Job.query
+    
+    # Apply filters
+    status = request.args.get('status')
+    job_type = request.args.get('job_type')
+    limit = min(request.args.get('limit', 50, type=int), 500)
+    
+    if status:
+        query = query.filter_by(status=status)
+    if job_type:
+        query = query.filter_by(job_type=job_type)
+    
+    jobs = query.order_by(Job.id.desc()).limit(limit).all()
+    
+    return jsonify([j.to_dict() for j in jobs]), 200
+
+@jobs_bp.route('/<int:job_id>', methods=['GET'])
+@jwt_required()
+def get_job(job_id):
+    """Get job status, progress, partial results and timing"""
+    user_id = get_jwt_identity()
+    user = User.query.get(user_id)
+    
+    if not user:
+        return jsonify({'error': 'User not found'}), 404
+    
+    job = Job.query.get(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    if not can_view(user, job):
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    return jsonify(job.to_dict()), 200
+
+@jobs_bp.route('/<int:job_id>/cancel', methods=['POST'])
+@jwt_required()
+def cancel(job_id):
+    """Cancel a queued job or stop a running one at its next checkpoint"""
+    user_id = get_jwt_identity()
+    user = User.query.get(user_id)
+    
+    if not user:
+        return jsonify({'error': 'User not found'}), 404
+    
+    job = Job.query.get(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    if user.role not in ['billing', 'operations'] and job.created_by != user.id:
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    try:
+        cancelled = cancel_job(job_id)
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+    
+    if not cancelled:
+        return jsonify({'error': f'Job already {job.status}'}), 409
+    
+    db.session.refresh(job)
+    return jsonify({
+        'message': 'Job cancelled' if job.status == 'cancelled' else 'Cancellation requested',
+        'job': job.to_dict()
+    }), 200
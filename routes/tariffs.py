@@ -0,0 +1,99 @@
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from models import db, User, Tariff
+from utils.tariff import CompiledTariff, get_tariff, validate_definition, invalidate_tariff_cache
+from utils.tariff_simulator import simulate_tariff
+from datetime import datetime
+
+tariffs_bp = Blueprint('tariffs', __name__)
+
+@tariffs_bp.route('', methods=['GET'])
+@jwt_required()
+def get_tariffs():
+    """Get all tariff versions (company users only)"""
+    user_id = get_jwt_identity()
+    user = User.query.get(user_id)
+    
+    if not user or user.role not in ['operations', 'billing', 'support']:
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    tariffs = Tariff.query.order_by(Tariff.effective_date.desc(), Tariff.id.desc()).all()
+    return jsonify([t.to_dict() for t in tariffs]), 200
+
+@tariffs_bp.route('/current', methods=['GET'])
+@jwt_required()
+def get_current_tariff():
+    """Get the tariff in effect on a date (defaults to today)"""
+    as_of = request.args.get('date')
+    
+    try:
+        as_of = datetime.fromisoformat(as_of).date() if as_of else None
+    except ValueError:
+        return jsonify({'error': 'Invalid date'}), 400
+    
+    return jsonify(get_tariff(as_of).to_dict()), 200
+
+@tariffs_bp.route('', methods=['POST'])
+@jwt_required()
+def create_tariff():
+    """Create a new tariff version (billing and operations only)"""
+    user_id = get_jwt_identity()
+    user = User.query.get(user_id)
+    
+    if not user or user.role not in ['billing', 'operations']:
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    data = request.get_json() or {}
+    
+    # Validate required fields
+    for field in ['name', 'effective_date', 'definition']:
+        if field not in data:
+            return jsonify({'error': f'Missing required field: {field}'}), 400
+    
+    try:
+        effective_date = datetime.fromisoformat(data['effective_date']).date()
+        definition = validate_definition(data['definition'])
+        CompiledTariff(definition)
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({'error': f'Invalid tariff: {e}'}), 400
+    
+    tariff = Tariff(
+        name=data['name'],
+        effective_date=effective_date,
+        definition=definition
+    )
+    
+    try:
+        db.session.add(tariff)
+        db.session.commit()
+        invalidate_tariff_cache()
+        return jsonify(tariff.to_dict()), 201
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@tariffs_bp.route('/simulate', methods=['POST'])
+@jwt_required()
+def simulate():
+    """Re-price historical usage under a candidate tariff without writing bills"""
+    user_id = get_jwt_identity()
+    user = User.query.get(user_id)
+    
+    if not user or user.role not in ['billing', 'operations']:
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    data = request.get_json() or {}
+    
+    # Validate required fields
+    for field in ['definition', 'start_date', 'end_date']:
+        if field not in data:
+            return jsonify({'error': f'Missing required field: {field}'}), 400
+    
+    try:
+        start_date = datetime.fromisoformat(data['start_date']).date()
+        end_date = datetime.fromisoformat(data['end_date']).date()
+        candidate = CompiledTariff(validate_definition(data['definition']), name=data.get('name', 'Candidate'))
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({'error': f'Invalid simulation request: {e}'}), 400
+    
+    return jsonify(simulate_tariff(candidate, start_date, end_date)), 200
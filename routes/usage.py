@@ -1,12 +1,34 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from models import db, User, Customer, Usage, Anomaly
-from utils.anomaly_detector import detect_anomalies, analyze_usage_pattern, get_anomaly_summary
-from utils.forecasting import forecast_usage, forecast_monthly_bill, get_usage_insights
-from datetime import datetime, timedelta
+from models import db, User, Customer, Usage, UsageDaily, UsageInterval, Anomaly
+from utils.anomaly_detector import analyze_usage_pattern, get_anomaly_summary
+from utils.usage_baselines import DETECTION_METHODS
+from utils.jobs import enqueue_job
+from utils.forecast_cache import get_forecast_cache
+from utils.tariff import get_tariff
+from utils.forecasting import (
+    FORECAST_METHODS, PATTERN_READINGS, forecast_usage, forecast_monthly_bill, forecast_from_profile,
+    price_forecast, get_usage_insights
+)
+from utils.holt_winters import load_forecast_state
+from utils.usage_series import load_usage_series
+from utils.fleet_forecast import load_fresh_forecast, forecast_profile, system_demand
+from utils.usage_ingest import (
+    load_customer_ids, prepare_usage_records, upsert_usage,
+    iter_ndjson_records, iter_csv_records, iter_batches
+)
+from utils.usage_intervals import prepare_interval_records, upsert_intervals, find_continuous_flow, interval_profile
+from calendar import monthrange
+from datetime import MAXYEAR, MINYEAR, datetime, timedelta
+from sqlalchemy import func
 
 usage_bp = Blueprint('usage', __name__)
 
+STREAM_FORMATS = {
+    'ndjson': ['application/x-ndjson', 'application/ndjson', 'application/jsonl'],
+    'csv': ['text/csv', 'application/csv']
+}
+
 def check_access(user, customer_id=None):
     """Check if user has access to usage data"""
     if user.role in ['operations', 'billing', 'support']:
@@ -51,7 +73,7 @@ def get_anomalies():
 @usage_bp.route('/anomalies/detect', methods=['POST'])
 @jwt_required()
 def detect_new_anomalies():
-    """Detect anomalies for all customers or specific customer"""
+    """Start anomaly detection for all customers or specific customer (seasonal baselines or global mean)"""
     user_id = get_jwt_identity()
     user = User.query.get(user_id)
     
@@ -60,61 +82,74 @@ def detect_new_anomalies():
     
     data = request.get_json() or {}
     customer_id = data.get('customer_id')
+    method = data.get('method', 'seasonal')
+    
+    if method not in DETECTION_METHODS:
+        return jsonify({'error': f"method must be one of {', '.join(DETECTION_METHODS)}"}), 400
     
+    customer_ids = None
     if customer_id:
-        customers = [Customer.query.get(customer_id)]
-        if not customers[0]:
+        if not Customer.query.get(customer_id):
             return jsonify({'error': 'Customer not found'}), 404
-    else:
-        customers = Customer.query.all()
+        customer_ids = [customer_id]
     
-    detected_anomalies = []
-    
-    for customer in customers:
-        # Get usage data
-        usage_records = Usage.query.filter_by(customer_id=customer.id).order_by(Usage.date).all()
-        
-        if len(usage_records) < 30:
-            continue
-        
-        # Prepare data for anomaly detection
-        usage_data = [{
-            'date': u.date,
-            'usage_ccf': u.usage_ccf
-        } for u in usage_records]
-        
-        # Detect anomalies
-        anomalies = detect_anomalies(usage_data)
-        
-        # Save new anomalies
-        for anomaly_data in anomalies:
-            # Check if already exists
-            existing = Anomaly.query.filter_by(
-                customer_id=customer.id,
-                date=anomaly_data['date']
-            ).first()
-            
-            if not existing:
-                anomaly = Anomaly(
-                    customer_id=customer.id,
-                    date=anomaly_data['date'],
-                    usage_ccf=anomaly_data['usage_ccf'],
-                    average_usage=anomaly_data['average_usage'],
-                    std_deviation=anomaly_data['std_deviation'],
-                    sigma_value=anomaly_data['sigma_value']
-                )
-                db.session.add(anomaly)
-                detected_anomalies.append(anomaly)
+    # Seasonal runs score readings written since the last run unless given dates or full
+    params = {'method': method, 'customer_ids': customer_ids}
+    if method == 'seasonal':
+        try:
+            for key in ['start_date', 'end_date']:
+                if data.get(key):
+                    params[key] = datetime.fromisoformat(data[key]).date().isoformat()
+        except (TypeError, ValueError):
+            return jsonify({'error': 'start_date and end_date must be YYYY-MM-DD'}), 400
+        params['full'] = bool(data.get('full', False))
     
     try:
-        db.session.commit()
-        return jsonify({
-            'message': f'Detected {len(detected_anomalies)} new anomalies',
-            'anomalies': [a.to_dict() for a in detected_anomalies]
-        }), 201
+        # Runs on the job workers; poll /api/jobs/<id> for progress
+        job = enqueue_job('detect_anomalies', params, user_id=user.id)
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
+    
+    return jsonify({
+        'message': 'Anomaly detection started',
+        'job': job.to_dict()
+    }), 202
+
+@usage_bp.route('/anomalies/continuous-flow', methods=['GET'])
+@jwt_required()
+def get_continuous_flow():
+    """Get meters with continuous overnight flow in interval data, last 30 days of data by default"""
+    user_id = get_jwt_identity()
+    user = User.query.get(user_id)
+    
+    if not user:
+        return jsonify({'error': 'User not found'}), 404
+    
+    # Build customer filter based on role
+    customer_id = request.args.get('customer_id', type=int)
+    if user.role in ['operations', 'billing', 'support']:
+        customer_ids = [customer_id] if customer_id else None
+    elif user.role == 'customer' and user.customer_id:
+        customer_ids = [user.customer_id]
+    else:
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    try:
+        end_date = request.args.get('end_date')
+        end_date = datetime.fromisoformat(end_date).date() if end_date else db.session.query(func.max(UsageInterval.date)).scalar()
+        start_date = request.args.get('start_date')
+        start_date = datetime.fromisoformat(start_date).date() if start_date else end_date and end_date - timedelta(days=29)
+    except ValueError:
+        return jsonify({'error': 'start_date and end_date must be YYYY-MM-DD'}), 400
+    
+    meters = find_continuous_flow(start_date, end_date, customer_ids) if end_date else []
+    
+    return jsonify({
+        'start_date': start_date.isoformat() if start_date else None,
+        'end_date': end_date.isoformat() if end_date else None,
+        'meters': meters
+    }), 200
 
 @usage_bp.route('/anomalies/<int:anomaly_id>/review', methods=['POST'])
 @jwt_required()
@@ -144,6 +179,123 @@ def review_anomaly(anomaly_id):
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+def latest_usage_date(customer_id):
+    """Most recent reading date for a customer (index lookup)"""
+    latest = db.session.query(func.max(Usage.date)).filter(Usage.customer_id == customer_id).scalar()
+    return latest.isoformat() if latest else None
+
+def compute_forecast(customer_id, forecast_days):
+    """Usage forecast from the stored fleet forecast when it is current, else from full history"""
+    stored = load_fresh_forecast(customer_id)
+    if stored:
+        return forecast_from_profile(forecast_profile(stored), forecast_days)
+    # The weekday method only reads the last 90 readings
+    series = load_usage_series(customer_id, last_readings=PATTERN_READINGS, with_total=True)
+    return forecast_usage(series, forecast_days=forecast_days)
+
+def next_month():
+    """(year, month) of next month"""
+    upcoming = datetime.now() + timedelta(days=32)
+    return upcoming.year, upcoming.month
+
+@usage_bp.route('/forecast/fleet', methods=['POST'])
+@jwt_required()
+def forecast_fleet():
+    """Start the fleet forecast job for a month (billing and operations only)"""
+    user_id = get_jwt_identity()
+    user = User.query.get(user_id)
+    
+    if not user or user.role not in ['billing', 'operations']:
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    data = request.get_json() or {}
+    try:
+        if 'year' in data or 'month' in data:
+            year, month = int(data.get('year')), int(data.get('month'))
+        else:
+            year, month = next_month()
+        workers = int(data['workers']) if data.get('workers') is not None else None
+    except (TypeError, ValueError):
+        return jsonify({'error': 'year, month and workers must be integers'}), 400
+    
+    if not MINYEAR <= year <= MAXYEAR or not 1 <= month <= 12:
+        return jsonify({'error': f'year must be {MINYEAR}-{MAXYEAR} and month 1-12'}), 400
+    if workers is not None and workers < 1:
+        return jsonify({'error': 'workers must be at least 1'}), 400
+    
+    try:
+        # Runs on the job workers; poll /api/jobs/<id> for progress
+        job = enqueue_job('forecast_fleet', {
+            'year': year,
+            'month': month,
+            'workers': workers
+        }, user_id=user.id)
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+    
+    return jsonify({
+        'message': f'Fleet forecast started for {year}-{month:02d}',
+        'job': job.to_dict()
+    }), 202
+
+@usage_bp.route('/forecast/demand', methods=['GET'])
+@jwt_required()
+def get_system_demand():
+    """Get forecast system demand for a month from stored fleet forecasts (company users only)"""
+    user_id = get_jwt_identity()
+    user = User.query.get(user_id)
+    
+    if not user or user.role not in ['operations', 'billing', 'support']:
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    month = request.args.get('month', type=int)
+    year = request.args.get('year', type=int)
+    if not month or not year:
+        year, month = next_month()
+    
+    return jsonify(system_demand(year, month)), 200
+
+@usage_bp.route('/system/daily', methods=['GET'])
+@jwt_required()
+def get_system_daily_usage():
+    """Get fleet-wide daily usage from the daily rollup, last 30 days of data by default (company users only)"""
+    user_id = get_jwt_identity()
+    user = User.query.get(user_id)
+    
+    if not user or user.role not in ['operations', 'billing', 'support']:
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    try:
+        end_date = request.args.get('end_date')
+        end_date = datetime.fromisoformat(end_date).date() if end_date else db.session.query(func.max(UsageDaily.date)).scalar()
+        start_date = request.args.get('start_date')
+        start_date = datetime.fromisoformat(start_date).date() if start_date else end_date and end_date - timedelta(days=29)
+    except ValueError:
+        return jsonify({'error': 'start_date and end_date must be YYYY-MM-DD'}), 400
+    
+    days = []
+    if end_date:
+        days = UsageDaily.query.filter(UsageDaily.date.between(start_date, end_date)).order_by(UsageDaily.date).all()
+    
+    return jsonify({
+        'start_date': start_date.isoformat() if start_date else None,
+        'end_date': end_date.isoformat() if end_date else None,
+        'days': [d.to_dict() for d in days]
+    }), 200
+
+@usage_bp.route('/forecast/cache', methods=['GET'])
+@jwt_required()
+def get_forecast_cache_stats():
+    """Get forecast cache hit/miss statistics for this process (operations only)"""
+    user_id = get_jwt_identity()
+    user = User.query.get(user_id)
+    
+    if not user or user.role not in ['operations']:
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    return jsonify(get_forecast_cache().stats()), 200
+
 @usage_bp.route('/forecast/<int:customer_id>', methods=['GET'])
 @jwt_required()
 def get_forecast(customer_id):
@@ -161,19 +313,25 @@ def get_forecast(customer_id):
     if not customer:
         return jsonify({'error': 'Customer not found'}), 404
     
-    # Get forecast days from query params
+    # Get forecast days and method from query params
     forecast_days = request.args.get('days', default=30, type=int)
+    method = request.args.get('method', 'weekday')
     
-    # Get usage data
-    usage_records = Usage.query.filter_by(customer_id=customer_id).order_by(Usage.date).all()
+    if method not in FORECAST_METHODS:
+        return jsonify({'error': f"method must be one of {', '.join(FORECAST_METHODS)}"}), 400
     
-    usage_data = [{
-        'date': u.date,
-        'usage_ccf': u.usage_ccf
-    } for u in usage_records]
+    if method == 'holt_winters':
+        # Produced from the stored smoothing state without reading history
+        compute = lambda: forecast_usage(load_forecast_state(customer_id), forecast_days, method=method)
+    else:
+        compute = lambda: compute_forecast(customer_id, forecast_days)
     
-    # Generate forecast
-    forecast_result = forecast_usage(usage_data, forecast_days=forecast_days)
+    # Cached until new usage arrives for this customer
+    forecast_result = get_forecast_cache().get_or_compute(
+        customer_id,
+        ('usage', latest_usage_date(customer_id), forecast_days, method),
+        compute
+    )
     
     return jsonify(forecast_result), 200
 
@@ -200,28 +358,31 @@ def get_forecasted_bill(customer_id):
     
     if not month or not year:
         # Default to next month
-        today = datetime.now()
-        next_month = today + timedelta(days=32)
-        month = next_month.month
-        year = next_month.year
+        year, month = next_month()
     
-    # Get usage data
-    usage_records = Usage.query.filter_by(customer_id=customer_id).order_by(Usage.date).all()
+    method = request.args.get('method', 'weekday')
+    if method not in FORECAST_METHODS:
+        return jsonify({'error': f"method must be one of {', '.join(FORECAST_METHODS)}"}), 400
     
-    usage_data = [{
-        'date': u.date,
-        'usage_ccf': u.usage_ccf
-    } for u in usage_records]
+    if method == 'holt_winters':
+        compute = lambda: forecast_monthly_bill(load_forecast_state(customer_id), month, year, method=method)
+    else:
+        compute = lambda: price_forecast(compute_forecast(customer_id, monthrange(year, month)[1]), month, year)
     
-    # Generate forecast
-    forecast_result = forecast_monthly_bill(usage_data, month, year)
+    # Cached until new usage arrives or the tariff for that month changes
+    tariff_version = get_tariff(datetime(year, month, 1).date()).version
+    forecast_result = get_forecast_cache().get_or_compute(
+        customer_id,
+        ('bill', latest_usage_date(customer_id), year, month, tariff_version, method),
+        compute
+    )
     
     return jsonify(forecast_result), 200
 
 @usage_bp.route('/analytics/<int:customer_id>', methods=['GET'])
 @jwt_required()
 def get_analytics(customer_id):
-    """Get usage analytics and insights"""
+    """Get usage analytics and insights over the trailing ANALYTICS_WINDOW_DAYS of usage"""
     user_id = get_jwt_identity()
     user = User.query.get(user_id)
     
@@ -235,19 +396,14 @@ def get_analytics(customer_id):
     if not customer:
         return jsonify({'error': 'Customer not found'}), 404
     
-    # Get usage data
-    usage_records = Usage.query.filter_by(customer_id=customer_id).order_by(Usage.date).all()
-    
-    usage_data = [{
-        'date': u.date,
-        'usage_ccf': u.usage_ccf
-    } for u in usage_records]
+    # Get usage data for the trailing analytics window
+    series = load_usage_series(customer_id, days=current_app.config['ANALYTICS_WINDOW_DAYS'])
     
     # Get pattern analysis
-    pattern_analysis = analyze_usage_pattern(usage_data)
+    pattern_analysis = analyze_usage_pattern(series)
     
     # Get usage insights
-    insights = get_usage_insights(usage_data)
+    insights = get_usage_insights(series)
     
     # Get anomaly summary
     anomalies = Anomaly.query.filter_by(customer_id=customer_id).all()
@@ -266,9 +422,78 @@ def get_analytics(customer_id):
         'customer': customer.to_dict(),
         'pattern_analysis': pattern_analysis,
         'insights': insights,
-        'anomaly_summary': anomaly_summary
+        'anomaly_summary': anomaly_summary,
+        'interval_profile': interval_profile(customer_id)  # None for meters without interval data
     }), 200
 
+@usage_bp.route('/intervals/<int:customer_id>', methods=['GET'])
+@jwt_required()
+def get_interval_usage(customer_id):
+    """Get a customer's interval reads, last 7 days of data by default"""
+    user_id = get_jwt_identity()
+    user = User.query.get(user_id)
+    
+    if not user:
+        return jsonify({'error': 'User not found'}), 404
+    
+    if not check_access(user, customer_id):
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    try:
+        end_date = request.args.get('end_date')
+        end_date = datetime.fromisoformat(end_date).date() if end_date else db.session.query(
+            func.max(UsageInterval.date)
+        ).filter(UsageInterval.customer_id == customer_id).scalar()
+        start_date = request.args.get('start_date')
+        start_date = datetime.fromisoformat(start_date).date() if start_date else end_date and end_date - timedelta(days=6)
+    except ValueError:
+        return jsonify({'error': 'start_date and end_date must be YYYY-MM-DD'}), 400
+    
+    days = []
+    if end_date:
+        days = UsageInterval.query.filter(
+            UsageInterval.customer_id == customer_id,
+            UsageInterval.date.between(start_date, end_date)
+        ).order_by(UsageInterval.date).all()
+    
+    return jsonify({
+        'customer_id': customer_id,
+        'start_date': start_date.isoformat() if start_date else None,
+        'end_date': end_date.isoformat() if end_date else None,
+        'days': [d.to_dict() for d in days]
+    }), 200
+
+@usage_bp.route('/intervals', methods=['POST'])
+@jwt_required()
+def upload_interval_data():
+    """Upload interval (AMI) reads and roll them up into daily usage (operations only)"""
+    user_id = get_jwt_identity()
+    user = User.query.get(user_id)
+    
+    if not user or user.role != 'operations':
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    data = request.get_json()
+    
+    if not data or 'records' not in data:
+        return jsonify({'error': 'Invalid data format'}), 400
+    
+    customer_ids = load_customer_ids()
+    days, processed, errors = prepare_interval_records(data['records'], customer_ids)
+    
+    try:
+        written = upsert_intervals(days)
+        db.session.commit()
+        return jsonify({
+            'message': f'Processed {processed} interval records into {written} meter-days',
+            'processed': processed,
+            'days': written,
+            'errors': errors
+        }), 201
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
 @usage_bp.route('/upload', methods=['POST'])
 @jwt_required()
 def upload_usage_data():
@@ -284,49 +509,12 @@ def upload_usage_data():
     if not data or 'records' not in data:
         return jsonify({'error': 'Invalid data format'}), 400
     
-    added = 0
-    errors = []
-    
-    for record in data['records']:
-        try:
-            # Validate required fields
-            if not all(k in record for k in ['customer_id', 'date', 'usage_ccf']):
-                errors.append({'record': record, 'error': 'Missing required fields'})
-                continue
-            
-            # Check if customer exists
-            customer = Customer.query.get(record['customer_id'])
-            if not customer:
-                errors.append({'record': record, 'error': 'Customer not found'})
-                continue
-            
-            # Parse date
-            date = datetime.fromisoformat(record['date']).date()
-            
-            # Check if record already exists
-            existing = Usage.query.filter_by(
-                customer_id=record['customer_id'],
-                date=date
-            ).first()
-            
-            if existing:
-                # Update existing
-                existing.usage_ccf = record['usage_ccf']
-            else:
-                # Create new
-                usage = Usage(
-                    customer_id=record['customer_id'],
-                    date=date,
-                    usage_ccf=record['usage_ccf']
-                )
-                db.session.add(usage)
-            
-            added += 1
-            
-        except Exception as e:
-            errors.append({'record': record, 'error': str(e)})
+    # Validate against one preloaded id set, then write the batch set-based
+    customer_ids = load_customer_ids()
+    rows, added, errors = prepare_usage_records(data['records'], customer_ids)
     
     try:
+        upsert_usage(rows)
         db.session.commit()
         return jsonify({
             'message': f'Processed {added} usage records',
@@ -336,3 +524,69 @@ def upload_usage_data():
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
+
+@usage_bp.route('/ingest', methods=['POST'])
+@jwt_required()
+def ingest_usage_stream():
+    """Stream NDJSON or CSV usage records and commit in bounded batches (operations only)"""
+    user_id = get_jwt_identity()
+    user = User.query.get(user_id)
+    
+    if not user or user.role != 'operations':
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    if request.mimetype in STREAM_FORMATS['ndjson']:
+        parsed = iter_ndjson_records(request.stream)
+    elif request.mimetype in STREAM_FORMATS['csv']:
+        parsed = iter_csv_records(request.stream)
+    else:
+        return jsonify({'error': 'Content-Type must be NDJSON or CSV'}), 415
+    
+    batch_size = current_app.config['INGEST_BATCH_SIZE']
+    max_errors = current_app.config['INGEST_MAX_ERRORS']
+    customer_ids = load_customer_ids()
+    
+    batches = []
+    errors = []
+    error_count = 0
+    
+    for batch_number, batch in enumerate(iter_batches(parsed, batch_size), start=1):
+        records = []
+        batch_errors = []
+        for line_number, record, parse_error in batch:
+            if parse_error:
+                batch_errors.append({'line': line_number, 'error': parse_error})
+            else:
+                records.append(record)
+        
+        rows, processed, record_errors = prepare_usage_records(records, customer_ids)
+        batch_errors.extend(record_errors)
+        
+        try:
+            upsert_usage(rows)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            return jsonify({
+                'error': f'Batch {batch_number} failed: {str(e)}',
+                'batches': batches
+            }), 500
+        
+        batches.append({
+            'batch': batch_number,
+            'received': len(batch),
+            'processed': processed,
+            'errors': len(batch_errors)
+        })
+        error_count += len(batch_errors)
+        errors.extend(batch_errors[:max_errors - len(errors)])
+    
+    processed = sum(b['processed'] for b in batches)
+    
+    return jsonify({
+        'message': f'Processed {processed} usage records in {len(batches)} batches',
+        'processed': processed,
+        'batches': batches,
+        'error_count': error_count,
+        'errors': errors
+    }), 201
@@ -0,0 +1,85 @@
+from datetime import date, timedelta
+import pytest
+from sqlalchemy import func
+from app import create_app
+from config import Config
+from models import db, User, Customer, Bill
+from utils.billing_summary import to_cents
+
+PERIOD = (date(2024, 1, 1), date(2024, 1, 31))  # Billing period used by bill helpers
+
+@pytest.fixture
+def app(tmp_path):
+    class TestConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{tmp_path / "test.db"}'
+        TESTING = True
+        JOB_WORKER_MODE = 'external'  # Tests run jobs explicitly
+        USAGE_STORE_PATH = ''
+    
+    app = create_app(TestConfig)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+@pytest.fixture
+def customers(app):
+    """Three residential customers, returned as ids"""
+    rows = [
+        Customer(name=f'Customer {i}', address=f'{i} Main St', location_id=1000 + i,
+                 customer_type='Residential', cycle_number=1)
+        for i in range(3)
+    ]
+    db.session.add_all(rows)
+    db.session.commit()
+    return [c.id for c in rows]
+
+@pytest.fixture
+def login(client):
+    """Headers with a bearer token for a new user of the given role"""
+    def headers(role='billing'):
+        email = f'{role}@example.com'
+        if not User.query.filter_by(email=email).first():
+            user = User(email=email, role=role)
+            user.set_password('password')
+            db.session.add(user)
+            db.session.commit()
+        response = client.post('/api/auth/login', json={'email': email, 'password': 'password'})
+        return {'Authorization': f"Bearer {response.get_json()['access_token']}"}
+    return headers
+
+def daily_rows(customer_ids, start, days, usage=1.0):
+    """Usage rows for every customer and day"""
+    return [
+        {'customer_id': customer_id, 'date': start + timedelta(days=offset), 'usage_ccf': usage}
+        for customer_id in customer_ids for offset in range(days)
+    ]
+
+def actual_summary():
+    """Billing summary computed from the bills table"""
+    summary = {status: {'count': 0, 'amount': 0.0} for status in ['pending', 'sent', 'paid']}
+    for status, count, amount in db.session.query(
+        Bill.status, func.count(Bill.id), func.sum(Bill.total_amount)
+    ).group_by(Bill.status):
+        summary[status] = {'count': count, 'amount': to_cents(amount) / 100}
+    return summary
+
+def add_bills(customer_ids, amount=21.0):
+    """One pending bill per customer for PERIOD"""
+    db.session.add_all([Bill(
+        customer_id=customer_id, billing_period_start=PERIOD[0], billing_period_end=PERIOD[1],
+        total_usage=1.0, base_charge=1.0, usage_charge=1.0, fees=20.0, total_amount=amount, status='pending'
+    ) for customer_id in customer_ids])
+    db.session.commit()
+
+def add_customer_users(customer_ids):
+    """A customer login for each customer, customer<id>@example.com"""
+    for customer_id in customer_ids:
+        user = User(email=f'customer{customer_id}@example.com', role='customer', customer_id=customer_id)
+        user.set_password('password')
+        db.session.add(user)
+    db.session.commit()
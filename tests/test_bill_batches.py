@@ -0,0 +1,48 @@
+import pytest
+from models import Bill, BillNotification
+from utils.billing_summary import get_summary
+from conftest import PERIOD, actual_summary, add_bills, add_customer_users
+
+def test_send_and_pay_batches_move_counters_and_queue_notifications(client, customers, login):
+    add_bills(customers)
+    add_customer_users(customers[:2])
+    headers = login('billing')
+    
+    body = {'year': PERIOD[0].year, 'month': PERIOD[0].month}
+    response = client.post('/api/bills/send-batch', json=body, headers=headers)
+    assert response.status_code == 200
+    assert response.get_json()['updated'] == 3
+    assert response.get_json()['notifications_queued'] == 2
+    assert sorted(n.recipient for n in BillNotification.query) == [
+        f'customer{customer_id}@example.com' for customer_id in sorted(customers[:2])
+    ]
+    
+    # Already sent bills are not notified again
+    assert client.post('/api/bills/send-batch', json=body, headers=headers).get_json() == {
+        'message': 'Sent 0 bills', 'updated': 0, 'notifications_queued': 0
+    }
+    
+    first = Bill.query.order_by(Bill.id).first().id
+    response = client.post('/api/bills/pay-batch', json={'bill_ids': [first]}, headers=headers)
+    assert response.get_json()['updated'] == 1
+    
+    summary = get_summary()
+    assert summary == actual_summary()
+    assert [summary[s]['count'] for s in ['pending', 'sent', 'paid']] == [0, 2, 1]
+
+@pytest.mark.parametrize('body', [
+    {},
+    {'bill_ids': ['one']},
+    {'bill_ids': 7},
+    {'year': 'this', 'month': 1},
+    {'year': 2024, 'month': 13},
+    {'year': 2024},
+    {'year': 2024, 'month': 1, 'cycle_number': 'odd'}
+])
+@pytest.mark.parametrize('endpoint', ['send-batch', 'pay-batch'])
+def test_batches_reject_bad_selectors(client, customers, login, endpoint, body):
+    add_bills(customers)
+    response = client.post(f'/api/bills/{endpoint}', json=body, headers=login('billing'))
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+    assert Bill.query.filter(Bill.status != 'pending').count() == 0
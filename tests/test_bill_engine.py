@@ -0,0 +1,61 @@
+from datetime import date
+import numpy as np
+import pytest
+from models import db, Bill
+from utils import bill_engine
+from utils.bill_engine import generate_period_bills
+from utils.billing_summary import get_summary
+from utils.billing_calculator import calculate_total_bill, calculate_total_bills
+from utils.tariff import get_tariff
+from utils.usage_ingest import upsert_usage
+
+# Zero, tier boundaries and either side of them, and values that round at half a cent
+USAGE = [0.0, 0.001, 0.005, 3.333, 9.999, 10.0, 10.001, 12.345, 19.995, 20.0, 20.004, 37.5, 123.456, 1000.0]
+
+def test_vectorised_bills_match_calculate_total_bill(app):
+    tariff = get_tariff()
+    for month in range(1, 13):
+        bills = calculate_total_bills(USAGE, month, tariff)
+        for i, usage in enumerate(USAGE):
+            expected = calculate_total_bill(usage, month, tariff)
+            assert bills['total_usage'][i] == expected['total_usage']
+            assert bills['usage_charge'][i] == expected['usage_charge']
+            assert bills['total_fees'] == expected['total_fees']
+            assert bills['total_amount'][i] == expected['total_amount']
+
+def test_generated_bills_match_calculate_total_bill(customers):
+    period = (date(2024, 7, 1), date(2024, 7, 31))
+    rng = np.random.default_rng(7)
+    rows = [
+        {'customer_id': customer_id, 'date': date(2024, 7, day), 'usage_ccf': round(float(usage), 3)}
+        for customer_id in customers
+        for day, usage in zip(range(1, 32), rng.gamma(2.0, 0.4, 31))
+    ]
+    upsert_usage(rows)
+    db.session.commit()
+    
+    generated, errors = generate_period_bills(*period)
+    db.session.commit()
+    assert len(generated) == len(customers) and not errors
+    for bill in Bill.query.filter(Bill.id.in_([row.id for row in generated])):
+        usage = sum(row['usage_ccf'] for row in rows if row['customer_id'] == bill.customer_id)
+        expected = calculate_total_bill(usage, 7, get_tariff(period[0]))
+        assert (bill.total_usage, bill.usage_charge, bill.fees, bill.total_amount) == (
+            expected['total_usage'], expected['usage_charge'], expected['total_fees'], expected['total_amount']
+        )
+
+@pytest.mark.parametrize('returning', [True, False])
+def test_generated_bills_are_counted_with_and_without_returning(customers, monkeypatch, returning):
+    # Without RETURNING (MySQL) the new bills are found by customer and period
+    monkeypatch.setattr(bill_engine, 'supports_returning', lambda: returning)
+    period = (date(2024, 7, 1), date(2024, 7, 31))
+    upsert_usage([{'customer_id': customer_id, 'date': period[0], 'usage_ccf': 12.5} for customer_id in customers])
+    db.session.commit()
+    
+    generated, _ = generate_period_bills(period[0], period[1], customers[:2])
+    db.session.commit()
+    assert [row.customer_id for row in generated] == customers[:2]
+    
+    pending = get_summary()['pending']
+    assert pending['count'] == 2
+    assert pending['amount'] == 2 * calculate_total_bill(12.5, 7)['total_amount']
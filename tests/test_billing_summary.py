@@ -0,0 +1,57 @@
+from models import db, Bill, BillingSummary
+from utils.bill_engine import generate_period_bills
+from utils.bill_status import bill_conditions, update_bill_status
+from utils.billing_summary import get_summary
+from utils.usage_ingest import upsert_usage
+from conftest import PERIOD, actual_summary, add_bills, daily_rows
+
+def test_send_before_first_summary_read_counts_existing_bills(client, customers, login):
+    add_bills(customers)
+    assert BillingSummary.query.count() == 0
+    headers = login('billing')
+    
+    bill_id = Bill.query.order_by(Bill.id).first().id
+    assert client.post(f'/api/bills/{bill_id}/send', headers=headers).status_code == 200
+    
+    body = client.get('/api/bills/summary', headers=headers).get_json()
+    assert body['counts'] == {'total': 3, 'pending': 2, 'sent': 1, 'paid': 0}
+    assert body['revenue']['pending'] == 42.0
+    assert body['revenue']['outstanding'] == 21.0
+
+def test_pay_before_first_summary_read_counts_existing_bills(client, customers, login):
+    add_bills(customers)
+    headers = login('billing')
+    
+    bill_id = Bill.query.order_by(Bill.id).first().id
+    assert client.post(f'/api/bills/{bill_id}/pay', headers=headers).status_code == 200
+    assert get_summary() == actual_summary()
+
+def test_counters_follow_generate_send_and_pay(client, customers, login):
+    upsert_usage(daily_rows(customers, PERIOD[0], 31))
+    db.session.commit()
+    add_bills([])
+    
+    generated, errors = generate_period_bills(*PERIOD)
+    db.session.commit()
+    assert len(generated) == 3 and not errors
+    assert get_summary() == actual_summary()
+    
+    update_bill_status(bill_conditions(bill_ids=[generated[0].id, generated[1].id]), 'sent')
+    db.session.commit()
+    assert get_summary() == actual_summary()
+    
+    headers = login('billing')
+    assert client.post(f'/api/bills/{generated[0].id}/pay', headers=headers).status_code == 200
+    summary = get_summary()
+    assert summary == actual_summary()
+    assert [summary[s]['count'] for s in ['pending', 'sent', 'paid']] == [1, 1, 1]
+
+def test_generate_before_first_summary_read_counts_existing_bills(customers):
+    add_bills(customers[:1])
+    upsert_usage(daily_rows(customers, PERIOD[0], 31))
+    db.session.commit()
+    
+    generated, _ = generate_period_bills(*PERIOD)
+    db.session.commit()
+    assert len(generated) == 2
+    assert get_summary() == actual_summary()
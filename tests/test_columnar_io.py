@@ -0,0 +1,20 @@
+from datetime import date
+import pyarrow as pa
+import pyarrow.parquet as pq
+from models import Usage
+from utils.columnar_io import import_usage_file
+
+def test_repeated_days_in_a_batch_keep_the_last_reading(customers, tmp_path):
+    path = str(tmp_path / 'usage.parquet')
+    pq.write_table(pa.table({
+        'customer_id': [customers[0], customers[0], customers[1], customers[0]],
+        'date': [date(2024, 1, 1), date(2024, 1, 2), date(2024, 1, 1), date(2024, 1, 1)],
+        'usage_ccf': [1.0, 2.0, 3.0, 4.0]
+    }), path)
+    
+    assert import_usage_file(path) == {'read': 4, 'imported': 3, 'skipped': 1}
+    assert {(u.customer_id, u.date.day): u.usage_ccf for u in Usage.query} == {
+        (customers[0], 1): 4.0,
+        (customers[0], 2): 2.0,
+        (customers[1], 1): 3.0
+    }
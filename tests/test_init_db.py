@@ -0,0 +1,36 @@
+from openpyxl import Workbook
+from models import Customer, Usage
+from init_db import existing_usage_keys, iter_excel_chunks, load_sample_data
+
+HEADER = ['Customer Name', 'Mailing Address', 'Location ID', 'Customer Type', 'Cycle Number',
+          'Customer Phone Number', 'Business Name', 'Facility Name', 'Year', 'Month', 'Day',
+          'Daily Water Usage (CCF)']
+
+def write_workbook(path, rows):
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.append(HEADER)
+    for row in rows:
+        sheet.append(row)
+    # Formatted but empty trailing rows, as left behind by spreadsheet editors
+    for row in range(sheet.max_row + 1, sheet.max_row + 4):
+        sheet.cell(row=row, column=3).number_format = '0'
+    workbook.save(path)
+
+def test_blank_rows_and_missing_location_ids_are_skipped(app, tmp_path):
+    path = tmp_path / 'sample.xlsx'
+    write_workbook(path, [
+        ['Ada', '1 Main St', 501, 'Residential', 1, None, None, None, 2024, 1, day, 1.5]
+        for day in (1, 2)
+    ] + [[None] * 11 + ['Totals']])
+
+    assert sum(len(df) for df in iter_excel_chunks(path)) == 3
+
+    load_sample_data(app, str(path))
+    assert [c.location_id for c in Customer.query] == [501]
+    assert Usage.query.count() == 2
+
+def test_existing_usage_keys_without_customers(app):
+    keys = existing_usage_keys([], None, None)
+    assert keys.empty
+    assert list(keys.columns) == ['customer_id', 'date']
@@ -0,0 +1,95 @@
+from datetime import datetime, timedelta
+import pytest
+from models import db, Job
+from utils import jobs
+from utils.jobs import job_handler, enqueue_job, run_job, cancel_job, recover_jobs, resume_local_jobs, WORKER_ID
+
+@job_handler('test_chunks')
+def chunks_job(context):
+    total = context.params['chunks']
+    for done in range(1, total + 1):
+        context.progress(done, total, {'chunks_done': done})
+        if context.params.get('cancel_at') == done:
+            cancel_job(context.job_id)
+    return {'chunks_done': total}
+
+@job_handler('test_fails')
+def failing_job(context):
+    raise RuntimeError('boom')
+
+def running_job(worker, heartbeat_at=None, attempts=1, cancel_requested=False):
+    job = Job(job_type='test_chunks', params={'chunks': 1}, status='running', worker=worker,
+              attempts=attempts, heartbeat_at=heartbeat_at or datetime.utcnow(), cancel_requested=cancel_requested)
+    db.session.add(job)
+    db.session.commit()
+    return job.id
+
+def test_claim_run_complete(app):
+    job = enqueue_job('test_chunks', {'chunks': 3})
+    assert job.status == 'queued'
+    
+    finished = run_job(job.id)
+    assert finished.status == 'completed'
+    assert finished.result == {'chunks_done': 3}
+    assert (finished.progress_done, finished.progress_total) == (3, 3)
+    assert finished.worker == WORKER_ID and finished.attempts == 1
+    
+    # A job is only claimed once
+    assert run_job(job.id) is None
+
+def test_cancel_queued_and_running(app):
+    queued = enqueue_job('test_chunks', {'chunks': 3})
+    assert cancel_job(queued.id)
+    assert run_job(queued.id) is None
+    assert Job.query.get(queued.id).status == 'cancelled'
+    
+    running = enqueue_job('test_chunks', {'chunks': 5, 'cancel_at': 2})
+    finished = run_job(running.id)
+    assert finished.status == 'cancelled'
+    assert finished.progress_done == 3  # Stopped at the checkpoint after the request
+    assert not cancel_job(running.id)
+
+def test_handler_error_fails_job(app):
+    job = enqueue_job('test_fails')
+    finished = run_job(job.id)
+    assert finished.status == 'failed' and finished.error == 'boom'
+
+def test_unknown_job_type_is_rejected(app):
+    with pytest.raises(ValueError):
+        enqueue_job('no_such_job')
+
+def test_recover_requeues_jobs_of_dead_workers(app):
+    # Same pid as this process but an earlier token: the process that owned it restarted
+    restarted = running_job(WORKER_ID.rsplit(':', 1)[0] + ':00000000')
+    stale = running_job('other-host:1:abc', heartbeat_at=datetime.utcnow() - timedelta(hours=2))
+    alive = running_job('other-host:1:abc')
+    mine = running_job(WORKER_ID)
+    exhausted = running_job('other-host:2:abc', heartbeat_at=datetime.utcnow() - timedelta(hours=2),
+                            attempts=app.config['JOB_MAX_ATTEMPTS'])
+    cancelling = running_job('other-host:3:abc', heartbeat_at=datetime.utcnow() - timedelta(hours=2),
+                             cancel_requested=True)
+    
+    assert recover_jobs() == 4
+    status = {job.id: job.status for job in Job.query}
+    assert status[restarted] == 'queued' and status[stale] == 'queued'
+    assert status[alive] == 'running' and status[mine] == 'running'
+    assert status[exhausted] == 'failed' and status[cancelling] == 'cancelled'
+    
+    finished = run_job(restarted)
+    assert finished.status == 'completed' and finished.attempts == 2
+
+def test_first_request_resumes_queued_jobs_in_local_mode(app, monkeypatch):
+    submitted = []
+    
+    class Executor:
+        def submit(self, func, *args):
+            submitted.append(args[1])
+    
+    monkeypatch.setattr(jobs, '_local_executor', lambda: Executor())
+    queued = enqueue_job('test_chunks', {'chunks': 1}).id
+    orphaned = running_job('other-host:1:abc', heartbeat_at=datetime.utcnow() - timedelta(hours=2))
+    
+    with app.test_request_context():
+        resume_local_jobs()
+        resume_local_jobs()
+    assert submitted == [queued, orphaned]
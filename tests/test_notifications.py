@@ -0,0 +1,77 @@
+import smtplib
+from models import db, Bill, BillNotification
+from utils.bill_status import bill_conditions
+from utils.notifications import dispatch_notifications, queue_bill_notifications
+from conftest import add_bills, add_customer_users
+
+class FakeSMTP:
+    """Local SMTP stand-in recording what each connection delivered"""
+    
+    def __init__(self, server):
+        self.server = server
+        self.server.connections += 1
+    
+    def send_message(self, message):
+        recipient = message['To']
+        if recipient in self.server.drop_once:
+            self.server.drop_once.remove(recipient)
+            raise smtplib.SMTPServerDisconnected('Connection unexpectedly closed')
+        if recipient in self.server.reject:
+            raise smtplib.SMTPRecipientsRefused({recipient: (550, b'No such user')})
+        self.server.delivered.append(recipient)
+    
+    def quit(self):
+        pass
+
+class FakeServer:
+    def __init__(self, reject=(), drop_once=()):
+        self.reject = set(reject)
+        self.drop_once = set(drop_once)
+        self.delivered = []
+        self.connections = 0
+    
+    def connect(self):
+        return FakeSMTP(self)
+
+def queue(customers):
+    add_bills(customers)
+    add_customer_users(customers)
+    queued = queue_bill_notifications(bill_conditions(bill_ids=[b.id for b in Bill.query]))
+    db.session.commit()
+    return queued
+
+def test_dispatch_marks_sent_and_failed(customers):
+    assert queue(customers) == 3
+    rejected, dropped = f'customer{customers[0]}@example.com', f'customer{customers[1]}@example.com'
+    server = FakeServer(reject=[rejected], drop_once=[dropped])
+    
+    result = dispatch_notifications(batch_size=2, connections=1, connect=server.connect)
+    assert (result['sent'], result['failed']) == (2, 1)
+    
+    # The dropped connection is reopened and the message resent on it
+    assert server.connections == 2
+    assert sorted(server.delivered) == sorted(f'customer{c}@example.com' for c in customers[1:])
+    
+    statuses = {n.recipient: (n.status, n.sent_at is not None) for n in BillNotification.query}
+    assert statuses[rejected] == ('failed', False)
+    assert statuses[dropped] == ('sent', True)
+    assert BillNotification.query.filter_by(recipient=rejected).one().error
+
+def test_failed_notifications_are_retried_only_when_requeued(customers):
+    queue(customers)
+    server = FakeServer(reject=[f'customer{customers[0]}@example.com'])
+    dispatch_notifications(connect=server.connect)
+    
+    assert dispatch_notifications(connect=server.connect)['sent'] == 0
+    
+    server.reject.clear()
+    result = dispatch_notifications(connect=server.connect, retry_failed=True)
+    assert (result['sent'], result['failed']) == (1, 0)
+    assert BillNotification.query.filter_by(status='sent').count() == 3
+    assert BillNotification.query.filter(BillNotification.error.isnot(None)).count() == 0
+
+def test_limit_leaves_the_rest_queued(customers):
+    queue(customers)
+    result = dispatch_notifications(batch_size=2, connect=FakeServer().connect, limit=2)
+    assert result['sent'] == 2
+    assert BillNotification.query.filter_by(status='queued').count() == 1
@@ -0,0 +1,39 @@
+import copy
+import pytest
+from config import Config
+from utils.tariff import CompiledTariff, validate_definition
+
+def definition(**changes):
+    result = copy.deepcopy(Config.PRICING)
+    result['season_months'] = {'summer': [6, 7, 8], 'winter': [12, 1, 2], 'spring_fall': [3, 4, 5, 9, 10, 11]}
+    result.update(changes)
+    return result
+
+def test_default_pricing_is_valid():
+    CompiledTariff(validate_definition(copy.deepcopy(Config.PRICING)))
+    CompiledTariff(validate_definition(definition()))
+
+@pytest.mark.parametrize('changes', [
+    {'season_months': {'summer': [6, 7, 8, 13], 'winter': [12, 1, 2], 'spring_fall': [3, 4, 5, 9, 10, 11]}},
+    {'season_months': {'summer': [0, 6, 7, 8], 'winter': [12, 1, 2], 'spring_fall': [3, 4, 5, 9, 10, 11]}},
+    {'season_months': {'summer': [6, 7, 8], 'winter': [12, 1, 2], 'spring_fall': [3, 4, 5, 9, 10]}},
+    {'season_months': {'summer': [6, 7, 8, 9], 'winter': [12, 1, 2], 'spring_fall': [3, 4, 5, 9, 10, 11]}},
+    {'season_months': {'summer': ['6', 7, 8], 'winter': [12, 1, 2], 'spring_fall': [3, 4, 5, 9, 10, 11]}},
+    {'seasonal_multipliers': {'summer': -1.2, 'winter': 0.9, 'spring_fall': 1.0}},
+    {'fees': {'base_service': -15.0, 'infrastructure': 5.0}},
+    {'fees': {'base_service': '15', 'infrastructure': 5.0}},
+    {'tiers': [{'min': 0, 'max': 10, 'rate': -2.5}, {'min': 10, 'max': None, 'rate': 3.0}]},
+    {'tiers': [{'min': 0, 'max': 10, 'rate': 'cheap'}, {'min': 10, 'max': None, 'rate': 3.0}]}
+])
+def test_invalid_definitions_raise_value_error(changes):
+    with pytest.raises(ValueError):
+        validate_definition(definition(**changes))
+
+def test_bad_month_is_rejected_by_the_api(client, login):
+    response = client.post('/api/tariffs', headers=login('billing'), json={
+        'name': 'Bad months',
+        'effective_date': '2030-01-01',
+        'definition': definition(season_months={'summer': [6, 7, 8, 13], 'winter': [12, 1, 2],
+                                                'spring_fall': [3, 4, 5, 9, 10, 11]})
+    })
+    assert response.status_code == 400
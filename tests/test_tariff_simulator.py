@@ -0,0 +1,30 @@
+from datetime import date
+import numpy as np
+from models import db, Bill
+from utils.bill_engine import generate_period_bills
+from utils.billing_calculator import calculate_total_bill
+from utils.tariff import get_tariff
+from utils.tariff_simulator import price_bills, simulate_tariff
+from utils.usage_ingest import upsert_usage
+
+def test_price_bills_matches_calculate_total_bill():
+    tariff = get_tariff()
+    usage = np.arange(1, 5000) / 250
+    for month in (1, 4, 7):
+        expected = [calculate_total_bill(u, month, tariff)['total_amount'] for u in usage.tolist()]
+        assert price_bills(tariff, usage, np.full(len(usage), month)).tolist() == expected
+
+def test_baseline_revenue_matches_billed_amounts(customers):
+    period = (date(2024, 7, 1), date(2024, 7, 31))
+    upsert_usage([
+        {'customer_id': customer_id, 'date': date(2024, 7, day), 'usage_ccf': 0.105 + 0.01 * customer_id}
+        for customer_id in customers for day in range(1, 32)
+    ])
+    db.session.commit()
+    generate_period_bills(*period)
+    db.session.commit()
+    
+    result = simulate_tariff(get_tariff(), *period)
+    billed = round(sum(bill.total_amount for bill in Bill.query), 2)
+    assert result['totals']['baseline_revenue'] == billed
+    assert result['totals']['delta'] == 0
@@ -0,0 +1,59 @@
+from datetime import date, datetime, timedelta
+from models import db, Anomaly, DetectionWatermark, Usage
+from utils.usage_baselines import detect_seasonal_anomalies
+from utils.usage_ingest import upsert_usage
+from conftest import daily_rows
+
+START = date(2024, 3, 1)
+
+def ingest(rows):
+    upsert_usage(rows)
+    db.session.commit()
+
+def spike(customer_id, day, usage=50.0):
+    return [{'customer_id': customer_id, 'date': day, 'usage_ccf': usage}]
+
+def age_usage():
+    """Backdate every reading so it falls behind the watermark overlap"""
+    Usage.query.update({Usage.updated_at: datetime.utcnow() - timedelta(days=1)}, synchronize_session=False)
+    DetectionWatermark.query.update({DetectionWatermark.scored_through: datetime.utcnow() - timedelta(hours=12)},
+                                    synchronize_session=False)
+    db.session.commit()
+
+def run(**kwargs):
+    totals = []
+    created, _ = detect_seasonal_anomalies(progress=lambda done, total, created: totals.append(total), **kwargs)
+    db.session.commit()
+    return created, totals[-1] if totals else 0
+
+def test_first_run_scores_all_history_and_sets_watermark(customers):
+    ingest(daily_rows(customers, START, 60) + spike(customers[0], START + timedelta(days=10)))
+    
+    created, scanned = run()
+    assert (created, scanned) == (1, len(customers))
+    assert db.session.get(DetectionWatermark, 'seasonal') is not None
+
+def test_later_runs_score_only_new_readings(customers):
+    ingest(daily_rows(customers, START, 60) + spike(customers[0], START + timedelta(days=10)))
+    run()
+    Anomaly.query.delete()
+    age_usage()
+    
+    # Only customer 1 has new usage; customer 0's old spike isn't rescored
+    ingest(spike(customers[1], START + timedelta(days=20)))
+    created, scanned = run()
+    assert (created, scanned) == (1, 1)
+    assert [a.customer_id for a in Anomaly.query] == [customers[1]]
+    
+    created, scanned = run()
+    assert scanned == 1  # Still inside the overlap, already stored
+    assert created == 0
+
+def test_full_and_dated_runs_ignore_watermark(customers):
+    ingest(daily_rows(customers, START, 60) + spike(customers[0], START + timedelta(days=10)))
+    run()
+    Anomaly.query.delete()
+    age_usage()
+    
+    assert run(start_date=START, end_date=START + timedelta(days=5)) == (0, len(customers))
+    assert run(full=True) == (1, len(customers))
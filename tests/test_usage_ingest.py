@@ -0,0 +1,43 @@
+from datetime import date, datetime
+from models import db, Usage
+from utils.usage_ingest import bulk_upsert
+
+DAY = date(2024, 1, 1)
+FIRST = datetime(2024, 1, 2)
+LATER = datetime(2024, 2, 1)
+
+def write(customers, usage, updated_at, overwrite=True):
+    bulk_upsert(
+        Usage.__table__,
+        [{'customer_id': customer_id, 'date': DAY, 'usage_ccf': usage, 'created_at': updated_at,
+          'updated_at': updated_at} for customer_id in customers],
+        index_elements=['customer_id', 'date'],
+        update_columns=['usage_ccf'] if overwrite else None,
+        touch_columns=['updated_at']
+    )
+    db.session.commit()
+
+def stored(customer_id):
+    return db.session.execute(
+        db.select(Usage.usage_ccf, Usage.updated_at).filter_by(customer_id=customer_id, date=DAY)
+    ).one()
+
+def test_insert_then_update_moves_updated_at(customers):
+    write(customers, 1.0, FIRST)
+    assert Usage.query.count() == len(customers)
+    
+    write(customers[:1], 2.5, LATER)
+    assert tuple(stored(customers[0])) == (2.5, LATER)
+    assert tuple(stored(customers[1])) == (1.0, FIRST)
+
+def test_unchanged_reading_keeps_updated_at(customers):
+    write(customers, 1.0, FIRST)
+    write(customers, 1.0, LATER)
+    assert tuple(stored(customers[0])) == (1.0, FIRST)
+
+def test_without_update_columns_existing_rows_are_kept(customers):
+    write(customers[:1], 1.0, FIRST)
+    write(customers, 3.0, LATER, overwrite=False)
+    assert tuple(stored(customers[0])) == (1.0, FIRST)
+    assert tuple(stored(customers[1])) == (3.0, LATER)
+    assert Usage.query.count() == len(customers)
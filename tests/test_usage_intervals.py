@@ -0,0 +1,66 @@
+from datetime import date, timedelta
+from models import db, Usage
+from utils.usage_intervals import prepare_interval_records, upsert_intervals, find_continuous_flow, interval_profile
+
+START = date(2024, 3, 1)
+
+def upload(records, customer_ids):
+    days, _, errors = prepare_interval_records(records, set(customer_ids))
+    assert not errors
+    upsert_intervals(days)
+    db.session.commit()
+
+def day_records(customer_id, days, intervals, minutes=15):
+    return [{
+        'customer_id': customer_id,
+        'date': (START + timedelta(days=offset)).isoformat(),
+        'intervals': intervals(offset),
+        'interval_minutes': minutes
+    } for offset in range(days)]
+
+def test_overnight_flow_run_is_flagged_and_rolled_up(customers):
+    # Nights 2-6 never drop to zero
+    upload(day_records(customers[0], 10, lambda offset: [0.01 if 2 <= offset <= 6 else 0.0] * 96), customers)
+    
+    runs = find_continuous_flow(START, START + timedelta(days=9))
+    assert runs == [{
+        'customer_id': customers[0],
+        'first_night': '2024-03-03',
+        'last_night': '2024-03-07',
+        'nights': 5,
+        'min_flow_ccf_per_hour': 0.04,
+        'estimated_leak_ccf_per_day': 0.96
+    }]
+    assert Usage.query.filter_by(customer_id=customers[0], date=START + timedelta(days=2)).one().usage_ccf == 0.96
+
+def test_partial_deliveries_merge_into_one_day(customers):
+    first_half = [{'customer_id': customers[0], 'timestamp': f'2024-03-01T{m // 60:02d}:{m % 60:02d}', 'usage_ccf': 0.1}
+                  for m in range(0, 720, 15)]
+    second_half = [{'customer_id': customers[0], 'timestamp': f'2024-03-01T{m // 60:02d}:{m % 60:02d}', 'usage_ccf': 0.2}
+                   for m in range(720, 1440, 15)]
+    upload(first_half, customers)
+    upload(second_half, customers)
+    assert Usage.query.filter_by(customer_id=customers[0], date=START).one().usage_ccf == 14.4
+
+def test_intervals_coarser_than_the_overnight_window_are_skipped(client, customers, login):
+    upload(day_records(customers[0], 4, lambda offset: [1.0] * 4, minutes=360), customers)
+    
+    assert find_continuous_flow(START, START + timedelta(days=3)) == []
+    profile = interval_profile(customers[0])
+    assert profile['min_night_flow_ccf_per_hour'] is None
+    assert profile['peak_hour'] is None
+    
+    headers = login('operations')
+    assert client.get(f'/api/usage/analytics/{customers[0]}', headers=headers).status_code == 200
+    assert client.get('/api/usage/anomalies/continuous-flow', headers=headers).status_code == 200
+
+def test_intervals_that_do_not_divide_an_hour_have_no_hourly_profile(client, customers, login):
+    upload(day_records(customers[0], 4, lambda offset: [0.5] * 32, minutes=45), customers)
+    
+    profile = interval_profile(customers[0])
+    assert profile['peak_hour'] is None
+    assert profile['min_night_flow_ccf_per_hour'] == round(0.5 * 60 / 45, 4)
+    assert [run['nights'] for run in find_continuous_flow(START, START + timedelta(days=3))] == [4]
+    
+    headers = login('operations')
+    assert client.get(f'/api/usage/analytics/{customers[0]}', headers=headers).status_code == 200
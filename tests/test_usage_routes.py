@@ -0,0 +1,21 @@
+import pytest
+from models import Job
+
+@pytest.mark.parametrize('body', [
+    {'year': 'next', 'month': 3},
+    {'year': 2025, 'month': 13},
+    {'year': 2025, 'month': 0},
+    {'year': 2025},
+    {'year': 2025, 'month': 3, 'workers': 'many'},
+    {'year': 2025, 'month': 3, 'workers': 0}
+])
+def test_fleet_forecast_rejects_bad_parameters(client, login, body):
+    response = client.post('/api/usage/forecast/fleet', json=body, headers=login('operations'))
+    assert response.status_code == 400
+    assert Job.query.count() == 0
+
+def test_fleet_forecast_coerces_parameters(client, login):
+    response = client.post('/api/usage/forecast/fleet', json={'year': '2025', 'month': '3', 'workers': '2'},
+                           headers=login('operations'))
+    assert response.status_code == 202
+    assert Job.query.one().params == {'year': 2025, 'month': 3, 'workers': 2}
@@ -0,0 +1,63 @@
+from datetime import date, timedelta
+import numpy as np
+import pytest
+from models import db, UsageStats
+from utils.usage_ingest import upsert_usage
+from utils.usage_stats import RunningStats
+
+START = date(2024, 1, 1)
+
+def values(n=500, seed=3):
+    return np.random.default_rng(seed).gamma(2.0, 0.5, n) + 100.0  # Offset mean stresses cancellation
+
+def test_add_matches_numpy():
+    data = values()
+    running = RunningStats()
+    for value in data:
+        running.add(float(value))
+    assert running.readings == len(data)
+    assert running.mean == pytest.approx(np.mean(data), rel=1e-12)
+    assert running.std == pytest.approx(np.std(data), rel=1e-9)
+
+def test_replace_matches_numpy():
+    data = values()
+    running = RunningStats()
+    for value in data:
+        running.add(float(value))
+    
+    rng = np.random.default_rng(5)
+    for index in rng.choice(len(data), 50, replace=False):
+        new = float(rng.uniform(0, 200))
+        running.replace(float(data[index]), new)
+        data[index] = new
+    assert running.readings == len(data)
+    assert running.mean == pytest.approx(np.mean(data), rel=1e-12)
+    assert running.std == pytest.approx(np.std(data), rel=1e-9)
+
+def test_decay_matches_weighted_numpy():
+    data = values(200)
+    decay = 1 - 1 / 50
+    running = RunningStats()
+    for value in data:
+        running.add(float(value), decay)
+    
+    weights = decay ** np.arange(len(data) - 1, -1, -1)
+    mean = np.average(data, weights=weights)
+    assert running.weight == pytest.approx(weights.sum(), rel=1e-12)
+    assert running.mean == pytest.approx(mean, rel=1e-12)
+    assert running.std == pytest.approx(np.sqrt(np.average((data - mean) ** 2, weights=weights)), rel=1e-9)
+
+def test_stored_stats_follow_ingest_and_corrections(customers):
+    data = values(60)
+    rows = [{'customer_id': customers[0], 'date': START + timedelta(days=i), 'usage_ccf': float(value)}
+            for i, value in enumerate(data)]
+    upsert_usage(rows[:40])
+    db.session.commit()
+    upsert_usage(rows[40:] + [dict(rows[5], usage_ccf=250.0)])
+    db.session.commit()
+    data[5] = 250.0
+    
+    stats = db.session.get(UsageStats, customers[0]).to_dict()
+    assert stats['readings'] == len(data)
+    assert stats['mean'] == round(np.mean(data), 4)
+    assert stats['std_deviation'] == round(np.std(data), 4)
@@ -0,0 +1,46 @@
+from datetime import date, datetime, timedelta
+import numpy as np
+import pytest
+from models import db, Usage
+from utils.usage_ingest import upsert_usage
+from utils.usage_store import load_store_series, load_usage_columns, rebuild_usage_store
+from conftest import daily_rows
+
+START = date(2024, 1, 1)
+
+@pytest.fixture
+def store(app, tmp_path):
+    app.config['USAGE_STORE_PATH'] = str(tmp_path / 'store')
+    return app.config['USAGE_STORE_PATH']
+
+def usage_on(customer_id, day):
+    customer_ids, dates, usage = load_usage_columns(customer_id, customer_id)
+    return usage[dates == np.datetime64(day)].tolist()
+
+def test_ingest_keeps_the_store_current(store, customers):
+    upsert_usage(daily_rows(customers, START, 10))
+    db.session.commit()
+    upsert_usage([{'customer_id': customers[0], 'date': START + timedelta(days=3), 'usage_ccf': 7.0}])
+    db.session.commit()
+    
+    series = load_store_series(customers[0])
+    assert series is not None
+    assert series.usage[3] == 7.0
+
+def test_rewritten_past_day_missing_from_the_store_is_detected(store, customers):
+    upsert_usage(daily_rows(customers, START, 10))
+    db.session.commit()
+    assert load_store_series(customers[0]) is not None
+    
+    # A correction committed without reaching the file (crash, another host): count and last date unchanged
+    Usage.query.filter_by(customer_id=customers[0], date=START + timedelta(days=3)).update({
+        Usage.usage_ccf: 7.0, Usage.updated_at: datetime.utcnow() + timedelta(seconds=1)
+    })
+    db.session.commit()
+    
+    assert load_store_series(customers[0]) is None
+    assert usage_on(customers[0], START + timedelta(days=3)) == [7.0]
+    
+    rebuild_usage_store()
+    series = load_store_series(customers[0])
+    assert series is not None and series.usage[3] == 7.0
@@ -0,0 +1,18 @@
+from sqlalchemy import text
+from models import db, Customer
+from utils.worker_pool import app_process_pool
+
+def count_customers():
+    return Customer.query.count()
+
+def test_pool_leaves_parent_engine_in_use(app, customers):
+    pool_before = db.engine.pool
+    with db.engine.connect() as connection:
+        with app_process_pool(2) as pool:
+            counts = [pool.submit(count_customers).result() for _ in range(4)]
+        
+        # A connection checked out by another request keeps working
+        assert connection.execute(text('SELECT COUNT(*) FROM customers')).scalar() == 3
+    
+    assert counts == [3, 3, 3, 3]
+    assert db.engine.pool is pool_before
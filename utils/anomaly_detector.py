@@ -7,20 +7,27 @@ def detect_anomalies(customer_usage_data, threshold_sigma=None):
     Detect anomalies in water usage using statistical analysis
     
     Args:
-        customer_usage_data (list): List of usage records [{date, usage_ccf}, ...]
+        customer_usage_data (UsageSeries or list): Usage series, or list of usage records [{date, usage_ccf}, ...]
         threshold_sigma (float): Number of standard deviations for threshold
     
     Returns:
         list: Anomalies detected [{date, usage, avg, std, sigma}, ...]
     """
+    from utils.forecasting import UsageSeries
+    
     if threshold_sigma is None:
         threshold_sigma = Config.ANOMALY_THRESHOLD_SIGMA
     
     if len(customer_usage_data) < 30:  # Need at least 30 days for meaningful statistics
         return []
     
-    # Extract usage values
-    usage_values = [record['usage_ccf'] for record in customer_usage_data]
+    # Extract usage values (a series' arrays are used as they are)
+    if isinstance(customer_usage_data, UsageSeries):
+        dates = customer_usage_data.dates
+        usage_values = customer_usage_data.usage
+    else:
+        dates = [record['date'] for record in customer_usage_data]
+        usage_values = np.array([record['usage_ccf'] for record in customer_usage_data], dtype=float)
     
     # Calculate statistics
     mean_usage = np.mean(usage_values)
@@ -30,25 +37,116 @@ def detect_anomalies(customer_usage_data, threshold_sigma=None):
     if std_usage == 0:
         return []
     
-    # Detect anomalies
+    # Flag usage more than threshold_sigma standard deviations above mean
+    sigma_values = (usage_values - mean_usage) / std_usage
     anomalies = []
-    for record in customer_usage_data:
-        usage = record['usage_ccf']
-        sigma_value = (usage - mean_usage) / std_usage
-        
-        # Flag if usage is more than threshold_sigma standard deviations above mean
-        if sigma_value > threshold_sigma:
-            anomalies.append({
-                'date': record['date'],
-                'usage_ccf': usage,
-                'average_usage': round(mean_usage, 2),
-                'std_deviation': round(std_usage, 2),
-                'sigma_value': round(sigma_value, 2),
-                'deviation_percent': round(((usage - mean_usage) / mean_usage) * 100, 1)
-            })
+    for i in np.flatnonzero(sigma_values > threshold_sigma).tolist():
+        usage = usage_values[i].item()
+        anomalies.append({
+            'date': dates[i] if isinstance(dates, list) else dates[i].item(),
+            'usage_ccf': usage,
+            'average_usage': round(mean_usage, 2),
+            'std_deviation': round(std_usage, 2),
+            'sigma_value': round(sigma_values[i], 2),
+            'deviation_percent': round(((usage - mean_usage) / mean_usage) * 100, 1)
+        })
     
     return anomalies
 
+def detect_grouped_anomalies(customer_ids, usage_values, threshold_sigma=None, min_readings=30):
+    """
+    Detect anomalies for many customers at once with NumPy group reductions
+    
+    Applies the same rule as detect_anomalies to every customer: readings
+    more than threshold_sigma population standard deviations above that
+    customer's mean, for customers with at least min_readings readings.
+    
+    Args:
+        customer_ids (array-like): Customer id per reading
+        usage_values (array-like): Usage in CCF per reading
+        threshold_sigma (float): Number of standard deviations for threshold
+        min_readings (int): Minimum readings per customer for meaningful statistics
+    
+    Returns:
+        dict: Arrays for the flagged readings - index (into the inputs), mean, std, sigma
+    """
+    if threshold_sigma is None:
+        threshold_sigma = Config.ANOMALY_THRESHOLD_SIGMA
+    
+    customer_ids = np.asarray(customer_ids)
+    usage = np.asarray(usage_values, dtype=float)
+    _, group = np.unique(customer_ids, return_inverse=True)
+    
+    counts = np.bincount(group)
+    means = np.bincount(group, weights=usage) / counts
+    deviations = usage - means[group]
+    stds = np.sqrt(np.bincount(group, weights=deviations ** 2) / counts)
+    
+    reading_std = stds[group]
+    eligible = (counts[group] >= min_readings) & (reading_std > 0)
+    sigma = np.divide(deviations, reading_std, out=np.zeros_like(usage), where=eligible)
+    index = np.flatnonzero(eligible & (sigma > threshold_sigma))
+    
+    return {
+        'index': index,
+        'mean': means[group[index]],
+        'std': reading_std[index],
+        'sigma': sigma[index]
+    }
+
+def detect_continuous_flow(customer_ids, epoch_days, night_flow, min_flow=None, min_nights=None):
+    """
+    Find runs of consecutive nights on which a meter never stopped flowing
+    
+    A night counts when the lowest interval in the overnight window is
+    above min_flow; a household asleep should read zero at some point, so
+    several such nights in a row usually mean a leak or a running fixture.
+    
+    Args:
+        customer_ids (array-like): Customer id per meter-night, ordered by customer and day
+        epoch_days (array-like): Day of each meter-night as days since 1970-01-01
+        night_flow (array-like): Lowest overnight flow rate in CCF per hour, NaN when the window is incomplete
+        min_flow (float): Flow rate every interval in the window must exceed
+        min_nights (int): Shortest run of nights reported
+    
+    Returns:
+        dict: Arrays per run - customer_id, first_day, last_day, nights, min_flow (lowest rate across the run)
+    """
+    if min_flow is None:
+        min_flow = Config.CONTINUOUS_FLOW_MIN_CCF
+    if min_nights is None:
+        min_nights = Config.CONTINUOUS_FLOW_MIN_NIGHTS
+    
+    customer_ids = np.asarray(customer_ids, dtype=np.int64)
+    epoch_days = np.asarray(epoch_days, dtype=np.int64)
+    night_flow = np.asarray(night_flow, dtype=float)
+    
+    # NaN compares False, so incomplete nights break a run
+    index = np.flatnonzero(night_flow > min_flow)
+    if not len(index):
+        return {key: np.empty(0, dtype=dtype) for key, dtype in [
+            ('customer_id', np.int64), ('first_day', np.int64), ('last_day', np.int64),
+            ('nights', np.int64), ('min_flow', float)
+        ]}
+    
+    # A run continues while the same customer flows again the next day
+    continues = np.zeros(len(index), dtype=bool)
+    continues[1:] = (customer_ids[index[1:]] == customer_ids[index[:-1]]) & (epoch_days[index[1:]] == epoch_days[index[:-1]] + 1)
+    starts = np.flatnonzero(~continues)
+    nights = np.diff(np.append(starts, len(index)))
+    lowest = np.minimum.reduceat(night_flow[index], starts)
+    
+    keep = nights >= min_nights
+    first = index[starts[keep]]
+    last = index[starts[keep] + nights[keep] - 1]
+    return {
+        'customer_id': customer_ids[first],
+        'first_day': epoch_days[first],
+        'last_day': epoch_days[last],
+        'nights': nights[keep],
+        'min_flow': lowest[keep]
+    }
+
 def get_recent_anomalies(customer_usage_data, days=30):
     """
     Get anomalies from the last N days
@@ -76,15 +174,16 @@ def analyze_usage_pattern(customer_usage_data):
     Analyze usage patterns to provide insights
     
     Args:
-        customer_usage_data (list): List of usage records
+        customer_usage_data (UsageSeries or list): Usage series, or list of usage records
     
     Returns:
         dict: Usage pattern analysis
     """
-    if len(customer_usage_data) < 7:
-        return {'error': 'Insufficient data for pattern analysis'}
+    from utils.forecasting import as_series
     
-    usage_values = [record['usage_ccf'] for record in customer_usage_data]
+    usage_values = as_series(customer_usage_data).usage
+    if len(usage_values) < 7:
+        return {'error': 'Insufficient data for pattern analysis'}
     
     # Calculate statistics
     stats = {
@@ -0,0 +1,114 @@
+from datetime import datetime
+from sqlalchemy import func
+from models import db, Customer, Bill
+from utils.billing_calculator import calculate_total_bills
+from utils.tariff import get_tariff
+from utils.billing_summary import ensure_summary, record_bills, to_cents
+from utils.usage_ingest import bulk_upsert, supports_returning
+from utils.usage_rollups import monthly_usage
+
+def generate_period_bills(period_start, period_end, customer_ids=None, cycle_number=None):
+    """
+    Generate bills for a billing period with set-based queries
+    
+    Period totals come from one grouped aggregate, customers that already
+    have a bill are excluded with one anti-join, and the tariff is applied
+    to all customers at once before a single bulk insert. Inserts skip rows
+    that hit the unique_customer_period constraint, so concurrent or
+    resumed runs never create duplicate bills. The new bills are added to
+    the pending billing summary counter in the caller's transaction.
+    
+    Args:
+        period_start (date): First day of the billing period
+        period_end (date): Last day of the billing period
+        customer_ids (list): Restrict to these customers, None for all
+        cycle_number (int): Restrict to customers in this billing cycle
+    
+    Returns:
+        tuple: (generated bills as (id, customer_id) rows, errors [{customer_id, error}, ...])
+    """
+    customers = db.session.query(Customer.id)
+    if customer_ids is not None:
+        customers = customers.filter(Customer.id.in_(customer_ids))
+    if cycle_number is not None:
+        customers = customers.filter(Customer.cycle_number == cycle_number)
+    target_ids = [row[0] for row in customers.order_by(Customer.id)]
+    target = customers.subquery()
+    
+    billed_ids = {row[0] for row in db.session.query(Bill.customer_id).filter(
+        Bill.billing_period_start == period_start,
+        Bill.billing_period_end == period_end,
+        Bill.customer_id.in_(db.select(target.c.id))
+    )}
+    
+    # Per-customer totals for customers without a bill for this period, from monthly rollups
+    monthly = monthly_usage(period_start, period_end)
+    usage_totals = dict(db.session.query(
+        monthly.c.customer_id,
+        func.sum(monthly.c.usage_ccf)
+    ).outerjoin(Bill, db.and_(
+        Bill.customer_id == monthly.c.customer_id,
+        Bill.billing_period_start == period_start,
+        Bill.billing_period_end == period_end
+    )).filter(
+        monthly.c.customer_id.in_(db.select(target.c.id)),
+        Bill.id.is_(None)
+    ).group_by(monthly.c.customer_id).all())
+    
+    errors = []
+    billable_ids = []
+    for customer_id in target_ids:
+        if customer_id in billed_ids:
+            errors.append({
+                'customer_id': customer_id,
+                'error': 'Bill already exists for this period'
+            })
+        elif customer_id not in usage_totals:
+            errors.append({
+                'customer_id': customer_id,
+                'error': 'No usage data for this period'
+            })
+        else:
+            billable_ids.append(customer_id)
+    
+    if not billable_ids:
+        return [], errors
+    
+    tariff = get_tariff(period_start)
+    bills = calculate_total_bills([usage_totals[c] for c in billable_ids], period_start.month, tariff)
+    generated_at = datetime.utcnow()
+    ensure_summary()
+    
+    amounts = dict(zip(billable_ids, bills['total_amount'].tolist()))
+    
+    returning = ['id', 'customer_id'] if supports_returning() else None
+    written = bulk_upsert(Bill.__table__, [{
+        'customer_id': customer_id,
+        'billing_period_start': period_start,
+        'billing_period_end': period_end,
+        'total_usage': total_usage,
+        'base_charge': usage_charge,
+        'usage_charge': usage_charge,
+        'fees': bills['total_fees'],
+        'total_amount': amounts[customer_id],
+        'status': 'pending',
+        'tariff_version': tariff.version,
+        'generated_at': generated_at
+    } for customer_id, total_usage, usage_charge in zip(
+        billable_ids,
+        bills['total_usage'].tolist(),
+        bills['usage_charge'].tolist()
+    )], index_elements=['customer_id', 'billing_period_start', 'billing_period_end'], returning=returning)
+    
+    if returning is None:
+        # No RETURNING (MySQL): a bill for these customers and period can only be one just inserted,
+        # short of a concurrent run racing past the anti-join above
+        written = db.session.query(Bill.id, Bill.customer_id).filter(
+            Bill.customer_id.in_(billable_ids),
+            Bill.billing_period_start == period_start,
+            Bill.billing_period_end == period_end
+        ).all()
+    generated = sorted(written, key=lambda row: row.customer_id)
+    record_bills('pending', len(generated), sum(to_cents(amounts[row.customer_id]) for row in generated))
+    
+    return generated, errors
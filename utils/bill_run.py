@@ -0,0 +1,117 @@
+import os
+from concurrent.futures import as_completed
+from datetime import datetime
+from models import db, Customer, BillRun, BillRunShard
+from utils.bill_engine import generate_period_bills
+from utils.worker_pool import app_process_pool
+
+def get_or_create_run(period_start, period_end):
+    """
+    Load the bill run for a period, creating it and its cycle shards if needed
+    
+    Shards are added for any cycle number not yet covered, so customers
+    moved into a new cycle are picked up when an existing run is resumed.
+    
+    Args:
+        period_start (date): First day of the billing period
+        period_end (date): Last day of the billing period
+    
+    Returns:
+        BillRun: The run for this period
+    """
+    run = BillRun.query.filter_by(
+        billing_period_start=period_start,
+        billing_period_end=period_end
+    ).first()
+    if not run:
+        run = BillRun(billing_period_start=period_start, billing_period_end=period_end)
+        db.session.add(run)
+        db.session.flush()
+    
+    existing_cycles = {shard.cycle_number for shard in run.shards}
+    cycles = [row[0] for row in db.session.query(Customer.cycle_number).distinct().order_by(Customer.cycle_number)]
+    for cycle_number in cycles:
+        if cycle_number not in existing_cycles:
+            db.session.add(BillRunShard(run_id=run.id, cycle_number=cycle_number))
+    
+    run.status = 'running'
+    run.completed_at = None
+    db.session.commit()
+    return run
+
+def run_shard(shard_id):
+    """
+    Bill every customer in one cycle shard and checkpoint it in the same transaction
+    
+    Args:
+        shard_id (int): BillRunShard id
+    
+    Returns:
+        dict: Shard result {shard_id, cycle_number, status, bills_generated, error_count}
+    """
+    shard = BillRunShard.query.get(shard_id)
+    run = shard.run
+    
+    try:
+        generated, errors = generate_period_bills(
+            run.billing_period_start,
+            run.billing_period_end,
+            cycle_number=shard.cycle_number
+        )
+        shard.status = 'completed'
+        shard.bills_generated = len(generated)
+        shard.error_count = len(errors)
+        shard.error = None
+        shard.completed_at = datetime.utcnow()
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        shard = BillRunShard.query.get(shard_id)
+        shard.status = 'failed'
+        shard.error = str(e)
+        db.session.commit()
+    
+    return {
+        'shard_id': shard.id,
+        'cycle_number': shard.cycle_number,
+        'status': shard.status,
+        'bills_generated': shard.bills_generated,
+        'error_count': shard.error_count
+    }
+
+def execute_bill_run(run_id, workers=None, on_shard_done=None):
+    """
+    Run all unfinished shards of a bill run across a process pool
+    
+    Completed shards are skipped, so calling this again after an
+    interruption resumes the run where it stopped.
+    
+    Args:
+        run_id (int): BillRun id
+        workers (int): Worker processes, defaults to the CPU count
+        on_shard_done (callable): Called with each shard result as it finishes
+    
+    Returns:
+        BillRun: The run with its final status
+    """
+    pending = [shard.id for shard in BillRunShard.query.filter(
+        BillRunShard.run_id == run_id,
+        BillRunShard.status != 'completed'
+    ).order_by(BillRunShard.cycle_number)]
+    
+    if pending:
+        workers = min(workers or os.cpu_count() or 1, len(pending))
+        with app_process_pool(workers) as pool:
+            futures = [pool.submit(run_shard, shard_id) for shard_id in pending]
+            for future in as_completed(futures):
+                if on_shard_done:
+                    on_shard_done(future.result())
+    
+    run = BillRun.query.get(run_id)
+    if all(shard.status == 'completed' for shard in run.shards):
+        run.status = 'completed'
+        run.completed_at = datetime.utcnow()
+    else:
+        run.status = 'failed'
+    db.session.commit()
+    return run
@@ -0,0 +1,69 @@
+from datetime import datetime
+from sqlalchemy import func
+from models import db, Bill, Customer
+from utils.billing_summary import ensure_summary, transition_bills, to_cents
+
+# Statuses a bill may move from when changed in bulk
+ALLOWED_TRANSITIONS = {
+    'sent': ['pending'],
+    'paid': ['pending', 'sent']
+}
+
+TIMESTAMP_COLUMNS = {
+    'sent': 'sent_at',
+    'paid': 'paid_at'
+}
+
+def bill_conditions(bill_ids=None, period_start=None, period_end=None, cycle_number=None):
+    """
+    Build filter conditions selecting bills by id list, period and billing cycle
+    
+    Returns:
+        list: SQLAlchemy conditions, empty when no selector was given
+    """
+    conditions = []
+    if bill_ids is not None:
+        conditions.append(Bill.id.in_(bill_ids))
+    if period_start is not None:
+        conditions.append(Bill.billing_period_start == period_start)
+    if period_end is not None:
+        conditions.append(Bill.billing_period_end == period_end)
+    if cycle_number is not None:
+        conditions.append(Bill.customer_id.in_(
+            db.select(Customer.id).where(Customer.cycle_number == cycle_number)
+        ))
+    return conditions
+
+def update_bill_status(conditions, to_status):
+    """
+    Move every matching bill to a new status with one set-based UPDATE
+    
+    Only bills in a status allowed by ALLOWED_TRANSITIONS are changed. The
+    billing summary counters are moved in the same transaction; the caller
+    commits.
+    
+    Args:
+        conditions (list): Filters from bill_conditions
+        to_status (str): 'sent' or 'paid'
+    
+    Returns:
+        tuple: (number of bills updated, timestamp written to sent_at/paid_at)
+    """
+    from_statuses = ALLOWED_TRANSITIONS[to_status]
+    conditions = conditions + [Bill.status.in_(from_statuses)]
+    changed_at = datetime.utcnow()
+    ensure_summary()
+    
+    moving = db.session.query(
+        Bill.status, func.count(Bill.id), func.sum(Bill.total_amount)
+    ).filter(*conditions).group_by(Bill.status).all()
+    
+    updated = Bill.query.filter(*conditions).update({
+        Bill.status: to_status,
+        getattr(Bill, TIMESTAMP_COLUMNS[to_status]): changed_at
+    }, synchronize_session=False)
+    
+    for from_status, count, amount in moving:
+        transition_bills(from_status, to_status, count, to_cents(amount))
+    
+    return updated, changed_at
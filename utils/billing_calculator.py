@@ -1,5 +1,5 @@
 from datetime import datetime
-from config import Config
+from utils.tariff import get_tariff
 
 def get_season(month):
     """Determine season based on month"""
@@ -10,50 +10,35 @@ def get_season(month):
     else:
         return 'spring_fall'
 
-def calculate_usage_charge(usage_ccf, month):
+def calculate_usage_charge(usage_ccf, month, tariff=None):
     """
     Calculate usage charge based on tiered pricing and seasonal multipliers
     
     Args:
         usage_ccf (float): Total usage in CCF (hundred cubic feet)
         month (int): Month number (1-12)
+        tariff (CompiledTariff): Tariff to apply, defaults to the one in effect today
     
     Returns:
         dict: Breakdown of charges
     """
-    pricing = Config.PRICING
-    tiers = pricing['tiers']
+    tariff = tariff or get_tariff()
     
     # Get seasonal multiplier
-    season = get_season(month)
-    seasonal_multiplier = pricing['seasonal_multipliers'][season]
+    season = tariff.season(month)
+    seasonal_multiplier = tariff.seasonal_multiplier(month)
     
     # Calculate tiered charges
-    remaining_usage = usage_ccf
+    total_charge = tariff.tiered_charge(usage_ccf)
+    
     tier_charges = []
-    total_charge = 0
-    
-    for tier in tiers:
-        if remaining_usage <= 0:
-            break
-        
-        tier_min = tier['min']
-        tier_max = tier['max']
-        tier_rate = tier['rate']
-        
-        # Calculate usage in this tier
-        tier_usage = min(remaining_usage, tier_max - tier_min)
-        tier_charge = tier_usage * tier_rate
-        
+    for label, tier_usage, tier_rate in tariff.tier_breakdown(usage_ccf):
         tier_charges.append({
-            'tier': f"{tier_min}-{tier_max if tier_max != float('inf') else '+'} CCF",
+            'tier': label,
             'usage': round(tier_usage, 2),
             'rate': tier_rate,
-            'charge': round(tier_charge, 2)
+            'charge': round(tier_usage * tier_rate, 2)
         })
-        
-        total_charge += tier_charge
-        remaining_usage -= tier_usage
     
     # Apply seasonal multiplier
     base_charge = total_charge
@@ -69,26 +54,27 @@ def calculate_usage_charge(usage_ccf, month):
         'tier_breakdown': tier_charges
     }
 
-def calculate_total_bill(usage_ccf, month):
+def calculate_total_bill(usage_ccf, month, tariff=None):
     """
     Calculate complete bill including fees
     
     Args:
         usage_ccf (float): Total usage in CCF
         month (int): Month number (1-12)
+        tariff (CompiledTariff): Tariff to apply, defaults to the one in effect today
     
     Returns:
         dict: Complete bill breakdown
     """
-    pricing = Config.PRICING
+    tariff = tariff or get_tariff()
     
     # Calculate usage charge
-    usage_breakdown = calculate_usage_charge(usage_ccf, month)
+    usage_breakdown = calculate_usage_charge(usage_ccf, month, tariff)
     
     # Add fees
-    base_service_fee = pricing['fees']['base_service']
-    infrastructure_fee = pricing['fees']['infrastructure']
-    total_fees = base_service_fee + infrastructure_fee
+    base_service_fee = tariff.base_service_fee
+    infrastructure_fee = tariff.infrastructure_fee
+    total_fees = tariff.total_fees
     
     # Calculate total
     total_amount = usage_breakdown['usage_charge'] + total_fees
@@ -100,9 +86,28 @@ def calculate_total_bill(usage_ccf, month):
         'infrastructure_fee': infrastructure_fee,
         'total_fees': total_fees,
         'total_amount': round(total_amount, 2),
+        'tariff_version': tariff.version,
         'breakdown': usage_breakdown
     }
 
+def calculate_total_bills(usage_ccf, month, tariff=None):
+    """
+    Calculate bills for many usage totals at once
+    
+    Uses the compiled tariff's array API, so each result matches
+    calculate_total_bill for the same usage exactly.
+    
+    Args:
+        usage_ccf (array-like): Total usage per bill in CCF
+        month (int): Month number (1-12)
+        tariff (CompiledTariff): Tariff to apply, defaults to the one in effect today
+    
+    Returns:
+        dict: Arrays of total_usage, usage_charge, total_fees and total_amount
+    """
+    tariff = tariff or get_tariff()
+    return tariff.total_bills(usage_ccf, month)
+
 def generate_bill_summary(bill_data):
     """
     Generate human-readable bill summary
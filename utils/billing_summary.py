@@ -0,0 +1,124 @@
+from datetime import datetime
+from sqlalchemy import func
+from models import db, Bill, BillingSummary
+from utils.usage_ingest import bulk_upsert
+
+BILL_STATUSES = ['pending', 'sent', 'paid']
+
+def to_cents(amount):
+    """Convert a dollar amount to integer cents"""
+    return int(round((amount or 0) * 100))
+
+def _ensure_rows(statuses):
+    """Create zeroed counter rows for statuses that don't have one yet"""
+    bulk_upsert(BillingSummary.__table__, [
+        {'status': status, 'bill_count': 0, 'amount_cents': 0, 'updated_at': datetime.utcnow()}
+        for status in statuses
+    ], index_elements=['status'])
+
+def ensure_summary():
+    """
+    Seed the counters from the bills table when any status row is missing
+    
+    Call before changing bills, so bills that existed before the counters
+    did are counted and the change itself is applied once on top.
+    
+    Returns:
+        bool: Whether the counters were rebuilt
+    """
+    present = BillingSummary.query.filter(BillingSummary.status.in_(BILL_STATUSES)).count()
+    if present == len(BILL_STATUSES):
+        return False
+    reconcile()
+    return True
+
+def record_bills(status, count, amount_cents):
+    """
+    Add bills to a status counter with a single atomic UPDATE
+    
+    Callers run ensure_summary before changing the bills being counted.
+    
+    Args:
+        status (str): Bill status
+        count (int): Number of bills (negative to remove)
+        amount_cents (int): Sum of their total_amount in cents
+    """
+    if not count and not amount_cents:
+        return
+    
+    updated = BillingSummary.query.filter_by(status=status).update({
+        BillingSummary.bill_count: BillingSummary.bill_count + count,
+        BillingSummary.amount_cents: BillingSummary.amount_cents + amount_cents,
+        BillingSummary.updated_at: datetime.utcnow()
+    }, synchronize_session=False)
+    
+    if not updated:
+        _ensure_rows([status])
+        record_bills(status, count, amount_cents)
+
+def transition_bills(from_status, to_status, count, amount_cents):
+    """Move bills between status counters"""
+    if from_status == to_status:
+        return
+    record_bills(from_status, -count, -amount_cents)
+    record_bills(to_status, count, amount_cents)
+
+def get_summary():
+    """
+    Read the billing summary counters
+    
+    The counters are seeded from the bills table on first use so an
+    existing bills table doesn't start from zero.
+    
+    Returns:
+        dict: status -> {'count', 'amount'}
+    """
+    if ensure_summary():
+        db.session.commit()
+    rows = BillingSummary.query.all()
+    
+    summary = {status: {'count': 0, 'amount': 0.0} for status in BILL_STATUSES}
+    for row in rows:
+        summary[row.status] = {'count': row.bill_count, 'amount': row.amount_cents / 100}
+    return summary
+
+def reconcile():
+    """
+    Rebuild the counters from the bills table in one grouped query
+    
+    Returns:
+        list: Drift per status [{status, stored_count, actual_count, stored_amount, actual_amount}, ...]
+    """
+    actual = {
+        status: (count, to_cents(amount))
+        for status, count, amount in db.session.query(
+            Bill.status, func.count(Bill.id), func.sum(Bill.total_amount)
+        ).group_by(Bill.status)
+    }
+    stored = {row.status: row for row in BillingSummary.query.all()}
+    
+    _ensure_rows(sorted(set(BILL_STATUSES) | set(actual) - set(stored)))
+    
+    drift = []
+    for status in sorted(set(BILL_STATUSES) | set(actual) | set(stored)):
+        actual_count, actual_cents = actual.get(status, (0, 0))
+        row = stored.get(status)
+        stored_count = row.bill_count if row else 0
+        stored_cents = row.amount_cents if row else 0
+        
+        if (stored_count, stored_cents) != (actual_count, actual_cents):
+            drift.append({
+                'status': status,
+                'stored_count': stored_count,
+                'actual_count': actual_count,
+                'stored_amount': stored_cents / 100,
+                'actual_amount': actual_cents / 100
+            })
+        
+        BillingSummary.query.filter_by(status=status).update({
+            BillingSummary.bill_count: actual_count,
+            BillingSummary.amount_cents: actual_cents,
+            BillingSummary.updated_at: datetime.utcnow()
+        }, synchronize_session=False)
+    
+    return drift
@@ -0,0 +1,157 @@
+import os
+import shutil
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.ipc as ipc
+import pyarrow.parquet as pq
+from config import Config
+from models import db, Customer, Usage, Bill, Anomaly
+from utils.usage_ingest import upsert_usage
+
+PARQUET_EXTENSIONS = ('.parquet', '.pq')
+ARROW_EXTENSIONS = ('.arrow', '.feather', '.ipc')
+
+# Table name -> (query, date column used for year/month partitions)
+EXPORT_TABLES = {
+    'usage': (
+        lambda: db.select(Usage, Customer.location_id).join(Customer).order_by(Usage.date),
+        'date'
+    ),
+    'bills': (
+        lambda: db.select(Bill, Customer.location_id).join(Customer).order_by(Bill.billing_period_start),
+        'billing_period_start'
+    ),
+    'anomalies': (
+        lambda: db.select(Anomaly, Customer.location_id).join(Customer).order_by(Anomaly.date),
+        'date'
+    )
+}
+
+def iter_record_batches(path, batch_size):
+    """
+    Read a Parquet or Arrow IPC file as a stream of record batches
+    
+    Args:
+        path (str): Path to .parquet or .arrow/.feather file
+        batch_size (int): Maximum rows per batch
+    
+    Yields:
+        RecordBatch: Arrow record batches
+    """
+    if path.endswith(PARQUET_EXTENSIONS):
+        yield from pq.ParquetFile(path).iter_batches(batch_size=batch_size)
+    elif path.endswith(ARROW_EXTENSIONS):
+        with pa.memory_map(path) as source:
+            try:
+                reader = ipc.open_file(source)
+                batches = (reader.get_batch(i) for i in range(reader.num_record_batches))
+            except pa.ArrowInvalid:
+                source.seek(0)
+                batches = ipc.open_stream(source)
+            for batch in batches:
+                # Respect batch_size for files written with very large batches
+                for offset in range(0, batch.num_rows, batch_size):
+                    yield batch.slice(offset, batch_size)
+    else:
+        raise ValueError(f'Unsupported file type: {path}')
+
+def _customer_id_column(batch, location_map):
+    """Resolve the customer id column, mapping location_id when present"""
+    names = batch.schema.names
+    if 'location_id' in names:
+        location_ids = pa.array(list(location_map.keys()), type=pa.int64())
+        customer_ids = pa.array(list(location_map.values()), type=pa.int64())
+        index = pc.index_in(batch.column('location_id').cast(pa.int64()), value_set=location_ids)
+        return pc.take(customer_ids, index)
+    if 'customer_id' in names:
+        return batch.column('customer_id').cast(pa.int64())
+    raise ValueError('File must contain a customer_id or location_id column')
+
+def _keep_last(table, keys):
+    """Keep the last row for each key, in file order, so one upsert never writes a row twice"""
+    rows = table.append_column('_row', pa.array(range(table.num_rows), type=pa.int64()))
+    last = rows.group_by(keys).aggregate([('_row', 'max')]).column('_row_max')
+    return table.take(last.take(pc.sort_indices(last)))
+
+def import_usage_file(path, batch_size=None, overwrite=True):
+    """
+    Import usage from a Parquet or Arrow IPC file straight into the usage table
+    
+    Columns are resolved and validated with Arrow compute kernels and each
+    batch is written with the shared multi-row upsert, so no ORM objects or
+    per-row lookups are created. A day repeated within a batch keeps its
+    last reading.
+    
+    Args:
+        path (str): Source file path
+        batch_size (int): Rows per batch and commit
+        overwrite (bool): Replace usage_ccf on existing days
+    
+    Returns:
+        dict: Import counts {read, imported, skipped}
+    """
+    batch_size = batch_size or Config.INGEST_BATCH_SIZE
+    location_map = dict(db.session.query(Customer.location_id, Customer.id).all())
+    known_ids = pa.array(list(location_map.values()), type=pa.int64())
+    
+    read = imported = 0
+    for batch in iter_record_batches(path, batch_size):
+        read += batch.num_rows
+        
+        customer_ids = _customer_id_column(batch, location_map)
+        dates = batch.column('date')
+        if not pa.types.is_date32(dates.type):
+            dates = dates.cast(pa.timestamp('us')) if pa.types.is_string(dates.type) else dates
+            dates = dates.cast(pa.date32())
+        usage = batch.column('usage_ccf').cast(pa.float64())
+        
+        # Drop rows for unknown customers or with missing values
+        valid = pc.and_(
+            pc.is_in(customer_ids, value_set=known_ids),
+            pc.and_(pc.is_valid(dates), pc.is_valid(usage))
+        )
+        table = pa.table({
+            'customer_id': customer_ids,
+            'date': dates,
+            'usage_ccf': usage
+        }).filter(pc.fill_null(valid, False))
+        table = _keep_last(table, ['customer_id', 'date'])
+        
+        imported += upsert_usage(table.to_pylist(), overwrite=overwrite)
+        db.session.commit()
+    
+    return {'read': read, 'imported': imported, 'skipped': read - imported}
+
+def export_table(name, out_dir, chunk_size=None):
+    """
+    Export a table to Parquet partitioned by year/month
+    
+    Args:
+        name (str): One of EXPORT_TABLES
+        out_dir (str): Root directory, the table is written to out_dir/name
+        chunk_size (int): Rows fetched per chunk
+    
+    Returns:
+        int: Number of rows exported
+    """
+    query, date_column = EXPORT_TABLES[name]
+    chunk_size = chunk_size or Config.INGEST_BATCH_SIZE
+    root = os.path.join(out_dir, name)
+    if os.path.exists(root):
+        shutil.rmtree(root)
+    
+    exported = 0
+    with db.engine.connect() as connection:
+        for df in pd.read_sql(query(), connection, chunksize=chunk_size):
+            dates = pd.to_datetime(df[date_column])
+            df['year'] = dates.dt.year
+            df['month'] = dates.dt.month
+            pq.write_to_dataset(
+                pa.Table.from_pandas(df, preserve_index=False),
+                root_path=root,
+                partition_cols=['year', 'month']
+            )
+            exported += len(df)
+    
+    return exported
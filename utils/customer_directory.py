@@ -0,0 +1,145 @@
+import re
+from sqlalchemy import event, select, text, and_, or_, func
+from models import db, Customer
+from utils.customer_stats import load_customer_stats
+
+DIRECTORY_FIELDS = [
+    'id', 'name', 'address', 'location_id', 'customer_type', 'cycle_number',
+    'phone', 'business_name', 'facility_name', 'created_at', 'stats'
+]
+SEARCH_COLUMNS = ['name', 'address', 'business_name']
+SEARCH_INDEX = 'customers_fts'  # FTS5 table on SQLite, FULLTEXT index name on MySQL
+
+# External-content FTS5 table kept in sync with customers by triggers
+SQLITE_SEARCH_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS customers_fts USING fts5("
+    "name, address, business_name, content='customers', content_rowid='id')",
+    "CREATE TRIGGER IF NOT EXISTS customers_fts_insert AFTER INSERT ON customers BEGIN "
+    "INSERT INTO customers_fts(rowid, name, address, business_name) "
+    "VALUES (new.id, new.name, new.address, new.business_name); END",
+    "CREATE TRIGGER IF NOT EXISTS customers_fts_delete AFTER DELETE ON customers BEGIN "
+    "INSERT INTO customers_fts(customers_fts, rowid, name, address, business_name) "
+    "VALUES ('delete', old.id, old.name, old.address, old.business_name); END",
+    "CREATE TRIGGER IF NOT EXISTS customers_fts_update AFTER UPDATE OF name, address, business_name ON customers BEGIN "
+    "INSERT INTO customers_fts(customers_fts, rowid, name, address, business_name) "
+    "VALUES ('delete', old.id, old.name, old.address, old.business_name); "
+    "INSERT INTO customers_fts(rowid, name, address, business_name) "
+    "VALUES (new.id, new.name, new.address, new.business_name); END",
+    "INSERT INTO customers_fts(customers_fts) VALUES ('rebuild')"
+]
+
+MYSQL_SEARCH_DDL = "CREATE FULLTEXT INDEX customers_fts ON customers (name, address, business_name)"
+
+def create_search_index(connection):
+    """
+    Create (or rebuild) the customer full-text index for the connection's database
+    
+    SQLite gets an FTS5 table maintained by triggers, MySQL/MariaDB a
+    FULLTEXT index. Other databases fall back to LIKE scans in search.
+    
+    Returns:
+        bool: Whether a full-text index exists afterwards
+    """
+    dialect_name = connection.dialect.name
+    if dialect_name == 'sqlite':
+        for statement in SQLITE_SEARCH_DDL:
+            connection.execute(text(statement))
+        return True
+    if dialect_name in ('mysql', 'mariadb'):
+        exists = connection.execute(
+            text("SHOW INDEX FROM customers WHERE Key_name = :name"), {'name': SEARCH_INDEX}
+        ).first()
+        if not exists:
+            connection.execute(text(MYSQL_SEARCH_DDL))
+        return True
+    return False
+
+@event.listens_for(Customer.__table__, 'after_create')
+def _create_search_index(target, connection, **kw):
+    create_search_index(connection)
+
+@event.listens_for(Customer.__table__, 'before_drop')
+def _drop_search_index(target, connection, **kw):
+    if connection.dialect.name == 'sqlite':
+        connection.execute(text(f"DROP TABLE IF EXISTS {SEARCH_INDEX}"))
+
+def _search_condition(search, dialect_name):
+    """Every word of search must prefix-match a word in name, address or business_name"""
+    terms = re.findall(r'\w+', search.lower())
+    if not terms:
+        return None
+    
+    if dialect_name == 'sqlite':
+        match = ' '.join(f'"{term}"*' for term in terms)
+        matching_ids = text(f"SELECT rowid FROM {SEARCH_INDEX} WHERE {SEARCH_INDEX} MATCH :match").bindparams(match=match)
+        return Customer.id.in_(matching_ids.columns(Customer.id))
+    if dialect_name in ('mysql', 'mariadb'):
+        match = ' '.join(f'+{term}*' for term in terms)
+        return text("MATCH (customers.name, customers.address, customers.business_name) "
+                    "AGAINST (:match IN BOOLEAN MODE)").bindparams(match=match)
+    
+    return and_(*[
+        or_(*[func.lower(getattr(Customer, column)).like(f'%{term}%') for column in SEARCH_COLUMNS])
+        for term in terms
+    ])
+
+def search_customers(fields=None, customer_type=None, cycle_number=None, search=None,
+                     cursor=None, limit=50, include_total=False):
+    """
+    One page of the customer directory in id order
+    
+    Pages are keyset-paginated on the primary key, so each page costs the
+    same no matter how deep it is, and only the requested columns are
+    selected. Stats are loaded for the page's customers only.
+    
+    Args:
+        fields (list): Subset of DIRECTORY_FIELDS to return (id is always included), None for all
+        customer_type (str): Only this customer type
+        cycle_number (int): Only this billing cycle
+        search (str): Words matched against name, address and business_name
+        cursor (int): next_cursor from the previous page
+        limit (int): Customers per page
+        include_total (bool): Also count all customers matching the filters
+    
+    Returns:
+        dict: {customers, next_cursor, total (when requested)}
+    """
+    fields = ['id'] + [f for f in (fields or DIRECTORY_FIELDS) if f != 'id']
+    columns = [getattr(Customer, f) for f in fields if f != 'stats']
+    
+    conditions = []
+    if customer_type:
+        conditions.append(Customer.customer_type == customer_type)
+    if cycle_number is not None:
+        conditions.append(Customer.cycle_number == cycle_number)
+    if search:
+        condition = _search_condition(search, db.session.get_bind().dialect.name)
+        if condition is not None:
+            conditions.append(condition)
+    
+    query = select(*columns).where(*conditions)
+    if cursor is not None:
+        query = query.where(Customer.id > cursor)
+    rows = db.session.execute(query.order_by(Customer.id).limit(limit + 1)).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    
+    customers = []
+    for row in rows:
+        customer = dict(row._mapping)
+        if 'created_at' in customer:
+            customer['created_at'] = customer['created_at'].isoformat() if customer['created_at'] else None
+        customers.append(customer)
+    
+    if 'stats' in fields:
+        stats = load_customer_stats([c['id'] for c in customers])
+        for customer in customers:
+            customer['stats'] = stats[customer['id']]
+    
+    page = {
+        'customers': customers,
+        'next_cursor': customers[-1]['id'] if has_more else None
+    }
+    if include_total:
+        page['total'] = db.session.execute(select(func.count(Customer.id)).where(*conditions)).scalar()
+    return page
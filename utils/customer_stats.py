@@ -0,0 +1,47 @@
+from collections import defaultdict
+from sqlalchemy import func
+from models import db, UsageMonthly, Bill, Anomaly
+
+def _grouped(query, key_column, customer_ids):
+    if customer_ids is not None:
+        query = query.filter(key_column.in_(customer_ids))
+    return query.group_by(key_column).all()
+
+def load_customer_stats(customer_ids=None):
+    """
+    Usage, bill and anomaly statistics for many customers
+    
+    Each statistic is one grouped query, joined per customer in memory,
+    so the number of queries doesn't depend on the number of customers.
+    
+    Args:
+        customer_ids (list): Customers to include, None for all
+    
+    Returns:
+        defaultdict: customer_id -> {total_usage, avg_daily_usage, total_bills, anomaly_count},
+            zeros for customers without any rows
+    """
+    stats = defaultdict(lambda: {
+        'total_usage': 0.0,
+        'avg_daily_usage': 0.0,
+        'total_bills': 0,
+        'anomaly_count': 0
+    })
+    if customer_ids is not None and not customer_ids:
+        return stats
+    
+    # Usage totals from the monthly rollup rather than every daily reading
+    usage = db.session.query(UsageMonthly.customer_id, func.sum(UsageMonthly.total), func.sum(UsageMonthly.readings))
+    for customer_id, total, readings in _grouped(usage, UsageMonthly.customer_id, customer_ids):
+        stats[customer_id].update(total_usage=float(total or 0), avg_daily_usage=float(total or 0) / readings if readings else 0.0)
+    
+    bills = db.session.query(Bill.customer_id, func.count(Bill.id))
+    for customer_id, count in _grouped(bills, Bill.customer_id, customer_ids):
+        stats[customer_id]['total_bills'] = count
+    
+    # Unreviewed anomalies only
+    anomalies = db.session.query(Anomaly.customer_id, func.count(Anomaly.id)).filter(Anomaly.reviewed.isnot(True))
+    for customer_id, count in _grouped(anomalies, Anomaly.customer_id, customer_ids):
+        stats[customer_id]['anomaly_count'] = count
+    
+    return stats
@@ -0,0 +1,103 @@
+from datetime import datetime
+import numpy as np
+from sqlalchemy import select
+from models import db, Customer, Anomaly
+from utils.anomaly_detector import detect_grouped_anomalies
+from utils.usage_store import load_usage_columns
+
+SCAN_CHUNK_CUSTOMERS = 2000  # Customers per columnar scan
+MIN_READINGS = 30  # Same minimum history as detect_anomalies
+
+def _date_keys(customer_ids, dates):
+    """Pack (customer_id, date) pairs into int64 keys for set operations"""
+    ordinals = np.fromiter((d.toordinal() for d in dates), dtype=np.int64, count=len(dates))
+    return np.asarray(customer_ids, dtype=np.int64) * 1_000_000 + ordinals
+
+def store_new_anomalies(flagged, id_range, detected_at):
+    """
+    Insert flagged readings that aren't already stored as anomalies
+    
+    Existing anomalies for the customer id range are fetched with one
+    query and removed with a key anti-join before a single bulk insert.
+    
+    Args:
+        flagged (dict): Parallel lists customer_id, date, usage, mean, std, sigma
+        id_range (tuple): (first, last) customer id covering the flagged rows
+        detected_at (datetime): Timestamp written to the new anomalies
+    
+    Returns:
+        int: Number of anomalies inserted
+    """
+    if not len(flagged['customer_id']):
+        return 0
+    
+    keys = _date_keys(flagged['customer_id'], flagged['date'])
+    existing = db.session.execute(
+        select(Anomaly.customer_id, Anomaly.date).where(
+            Anomaly.customer_id.between(*id_range)
+        )
+    ).all()
+    new = np.ones(len(keys), dtype=bool)
+    if existing:
+        existing_ids, existing_dates = zip(*existing)
+        new = ~np.isin(keys, _date_keys(existing_ids, existing_dates))
+    
+    records = [{
+        'customer_id': int(flagged['customer_id'][i]),
+        'date': flagged['date'][i],
+        'usage_ccf': float(flagged['usage'][i]),
+        'average_usage': round(float(flagged['mean'][i]), 2),
+        'std_deviation': round(float(flagged['std'][i]), 2),
+        'sigma_value': round(float(flagged['sigma'][i]), 2),
+        'detected_at': detected_at,
+        'reviewed': False
+    } for i in np.flatnonzero(new).tolist()]
+    if records:
+        db.session.execute(Anomaly.__table__.insert(), records)
+    return len(records)
+
+def detect_fleet_anomalies(customer_ids=None, threshold_sigma=None, progress=None):
+    """
+    Detect and store anomalies for the whole fleet with columnar scans
+    
+    Usage is read in customer id ranges as plain (customer_id, date, usage)
+    columns (from the usage store when configured), scored with detect_grouped_anomalies, checked against the
+    anomalies already stored for the range with one query and bulk
+    inserted. The caller commits.
+    
+    Args:
+        customer_ids (list): Restrict to these customers, None for all
+        threshold_sigma (float): Defaults to Config.ANOMALY_THRESHOLD_SIGMA
+        progress (callable): Called with (customers_done, customers_total, anomalies_created) after each chunk
+    
+    Returns:
+        tuple: (number of anomalies created, detected_at timestamp written to them)
+    """
+    if customer_ids is None:
+        ids = [row[0] for row in db.session.query(Customer.id).order_by(Customer.id)]
+    else:
+        ids = sorted(customer_ids)
+    
+    detected_at = datetime.utcnow()
+    created = 0
+    
+    for start in range(0, len(ids), SCAN_CHUNK_CUSTOMERS):
+        chunk = ids[start:start + SCAN_CHUNK_CUSTOMERS]
+        chunk_ids, dates, usage = load_usage_columns(chunk[0], chunk[-1], None if customer_ids is None else chunk)
+        
+        if len(chunk_ids):
+            flagged = detect_grouped_anomalies(chunk_ids, usage, threshold_sigma, MIN_READINGS)
+            index = flagged['index']
+            created += store_new_anomalies({
+                'customer_id': chunk_ids[index].tolist(),
+                'date': dates[index].tolist(),
+                'usage': usage[index],
+                'mean': flagged['mean'],
+                'std': flagged['std'],
+                'sigma': flagged['sigma']
+            }, (chunk[0], chunk[-1]), detected_at)
+        
+        if progress:
+            progress(min(start + SCAN_CHUNK_CUSTOMERS, len(ids)), len(ids), created)
+    
+    return created, detected_at
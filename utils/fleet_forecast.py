@@ -0,0 +1,227 @@
+import multiprocessing
+import os
+from calendar import monthrange
+from concurrent.futures import as_completed
+from datetime import date, datetime
+import numpy as np
+from flask import current_app
+from sqlalchemy import func
+from models import db, Customer, Usage, Forecast
+from utils.forecasting import MIN_FORECAST_READINGS, compute_profiles, weekdays
+from utils.tariff import get_tariff
+from utils.usage_ingest import bulk_upsert
+from utils.usage_store import load_usage_columns
+from utils.worker_pool import app_process_pool
+
+PARTITION_CUSTOMERS = 2000  # Customers per columnar scan and worker task
+
+FORECAST_COLUMNS = [
+    'weekday_mean', 'weekday_std', 'trend_factor', 'recent_avg', 'previous_avg', 'data_points',
+    'last_usage_date', 'target_year', 'target_month', 'predicted_usage', 'predicted_amount',
+    'tariff_version', 'generated_at'
+]
+
+def predict_month(profiles, year, month):
+    """
+    Predicted usage and bill for a month, priced with the month's tariff
+    
+    Like forecast_monthly_bill, the forecast covers as many days as the
+    target month has, starting the day after each customer's last reading.
+    
+    Returns:
+        tuple: (predicted usage array, predicted amount array, tariff version)
+    """
+    forecast_days = monthrange(year, month)[1]
+    
+    # Number of each weekday among the forecast days
+    first_weekday = weekdays(profiles['last_date'] + 1)
+    offset = (np.arange(7) - first_weekday[:, None]) % 7
+    weekday_days = forecast_days // 7 + (offset < forecast_days % 7)
+    
+    daily = np.round(profiles['weekday_mean'] * profiles['trend_factor'][:, None], 2)
+    predicted_usage = np.round((daily * weekday_days).sum(axis=1), 2)
+    
+    tariff = get_tariff(date(year, month, 1))
+    priced = tariff.total_bills(predicted_usage, month)
+    return priced['total_usage'], priced['total_amount'], tariff.version
+
+def forecast_partition(first_id, last_id, year, month):
+    """
+    Forecast one customer id range and upsert its rows into the forecasts table
+    
+    Args:
+        first_id (int): First customer id in the partition
+        last_id (int): Last customer id in the partition
+        year (int): Target year
+        month (int): Target month
+    
+    Returns:
+        int: Forecasts written
+    """
+    customer_ids, dates, usage = load_usage_columns(first_id, last_id)
+    if not len(customer_ids):
+        return 0
+    
+    profiles = compute_profiles(customer_ids, dates, usage)
+    eligible = profiles['data_points'] >= MIN_FORECAST_READINGS
+    profiles = {key: values[eligible] for key, values in profiles.items()}
+    if not len(profiles['customer_id']):
+        return 0
+    
+    predicted_usage, predicted_amount, tariff_version = predict_month(profiles, year, month)
+    generated_at = datetime.utcnow()
+    
+    records = [{
+        'customer_id': customer_id,
+        'weekday_mean': weekday_mean,
+        'weekday_std': weekday_std,
+        'trend_factor': trend_factor,
+        'recent_avg': recent_avg,
+        'previous_avg': previous_avg,
+        'data_points': data_points,
+        'last_usage_date': date.fromisoformat(last_date),
+        'target_year': year,
+        'target_month': month,
+        'predicted_usage': usage,
+        'predicted_amount': amount,
+        'tariff_version': tariff_version,
+        'generated_at': generated_at
+    } for customer_id, weekday_mean, weekday_std, trend_factor, recent_avg, previous_avg,
+          data_points, last_date, usage, amount in zip(
+        profiles['customer_id'].tolist(),
+        profiles['weekday_mean'].tolist(),
+        profiles['weekday_std'].tolist(),
+        profiles['trend_factor'].tolist(),
+        profiles['recent_avg'].tolist(),
+        profiles['previous_avg'].tolist(),
+        profiles['data_points'].tolist(),
+        np.datetime_as_string(profiles['last_date']).tolist(),
+        predicted_usage.tolist(),
+        predicted_amount.tolist()
+    )]
+    
+    bulk_upsert(Forecast.__table__, records, ['customer_id'], update_columns=FORECAST_COLUMNS)
+    db.session.commit()
+    return len(records)
+
+def run_fleet_forecast(year, month, workers=None, progress=None):
+    """
+    Forecast every customer for a month in parallel customer id partitions
+    
+    Each partition is a columnar usage scan scored with compute_profiles
+    in its own process and committed independently. Workers are spawned
+    rather than forked so this is safe to call from a job thread.
+    
+    Args:
+        year (int): Target year
+        month (int): Target month
+        workers (int): Worker processes, defaults to Config.FORECAST_WORKERS or the CPU count
+        progress (callable): Called with (customers_done, customers_total, forecasts_written) after each partition
+    
+    Returns:
+        int: Forecasts written
+    """
+    ids = [row[0] for row in db.session.query(Customer.id).order_by(Customer.id)]
+    partitions = [
+        (ids[start], ids[min(start + PARTITION_CUSTOMERS, len(ids)) - 1])
+        for start in range(0, len(ids), PARTITION_CUSTOMERS)
+    ]
+    sizes = {p: min(PARTITION_CUSTOMERS, len(ids) - i * PARTITION_CUSTOMERS) for i, p in enumerate(partitions)}
+    workers = min(workers or current_app.config['FORECAST_WORKERS'] or os.cpu_count() or 1, len(partitions))
+    
+    done = 0
+    written = 0
+    if workers <= 1:
+        for partition in partitions:
+            written += forecast_partition(*partition, year, month)
+            done += sizes[partition]
+            if progress:
+                progress(done, len(ids), written)
+        return written
+    
+    with app_process_pool(workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+        futures = {pool.submit(forecast_partition, *partition, year, month): partition for partition in partitions}
+        for future in as_completed(futures):
+            written += future.result()
+            done += sizes[futures[future]]
+            if progress:
+                progress(done, len(ids), written)
+    
+    return written
+
+def load_fresh_forecast(customer_id):
+    """
+    Stored forecast for a customer if no usage was written since it was generated
+    
+    Returns:
+        Forecast: The stored row, or None when missing or stale
+    """
+    forecast = Forecast.query.get(customer_id)
+    if forecast is None:
+        return None
+    
+    latest_date, latest_write = db.session.query(
+        func.max(Usage.date), func.max(Usage.updated_at)
+    ).filter(Usage.customer_id == customer_id).one()
+    if latest_date != forecast.last_usage_date or (latest_write and latest_write > forecast.generated_at):
+        return None
+    return forecast
+
+def forecast_profile(forecast):
+    """Profile dict for forecast_from_profile from a stored forecast"""
+    return {
+        'weekday_mean': forecast.weekday_mean,
+        'weekday_std': forecast.weekday_std,
+        'trend_factor': forecast.trend_factor,
+        'recent_avg': forecast.recent_avg,
+        'previous_avg': forecast.previous_avg,
+        'data_points': forecast.data_points,
+        'last_date': forecast.last_usage_date
+    }
+
+def _demand_rows(key, column, conditions):
+    rows = db.session.query(
+        column,
+        func.count(Forecast.customer_id),
+        func.sum(Forecast.predicted_usage),
+        func.sum(Forecast.predicted_amount)
+    ).join(Customer, Customer.id == Forecast.customer_id).filter(*conditions).group_by(column).order_by(column)
+    return [{
+        key: value,
+        'customers': count,
+        'predicted_usage': round(usage or 0, 2),
+        'predicted_amount': round(amount or 0, 2)
+    } for value, count, usage, amount in rows]
+
+def system_demand(year, month):
+    """
+    Aggregate stored forecasts for a month into system demand
+    
+    Args:
+        year (int): Target year
+        month (int): Target month
+    
+    Returns:
+        dict: Totals plus breakdowns by customer_type and billing cycle
+    """
+    conditions = [Forecast.target_year == year, Forecast.target_month == month]
+    count, usage, amount, oldest, newest = db.session.query(
+        func.count(Forecast.customer_id),
+        func.sum(Forecast.predicted_usage),
+        func.sum(Forecast.predicted_amount),
+        func.min(Forecast.generated_at),
+        func.max(Forecast.generated_at)
+    ).filter(*conditions).one()
+    
+    return {
+        'year': year,
+        'month': month,
+        'customers_forecast': count,
+        'customers_total': Customer.query.count(),
+        'predicted_usage': round(usage or 0, 2),
+        'predicted_amount': round(amount or 0, 2),
+        'generated_from': oldest.isoformat() if oldest else None,
+        'generated_to': newest.isoformat() if newest else None,
+        'by_customer_type': _demand_rows('customer_type', Customer.customer_type, conditions),
+        'by_cycle': _demand_rows('cycle_number', Customer.cycle_number, conditions)
+    }
@@ -0,0 +1,169 @@
+import json
+import threading
+from collections import OrderedDict
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+PENDING_KEY = 'forecast_cache_invalidations'
+
+class LRUBackend:
+    """Bounded in-process store with least-recently-used eviction"""
+    
+    name = 'memory'
+    
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._generations = {}  # Kept apart so eviction never resurrects stale entries
+        self._lock = threading.Lock()
+    
+    def get(self, key):
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+            return self._entries[key]
+    
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+    
+    def generation(self, customer_id):
+        with self._lock:
+            return self._generations.get(customer_id, 0)
+    
+    def bump_generation(self, customer_id):
+        with self._lock:
+            self._generations[customer_id] = self._generations.get(customer_id, 0) + 1
+    
+    def size(self):
+        return len(self._entries)
+
+class RedisBackend:
+    """Store shared by every worker process through Redis, entries expire after a TTL"""
+    
+    name = 'redis'
+    
+    def __init__(self, url, ttl_seconds, prefix='hydrospark:forecast:'):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError('FORECAST_CACHE_URL is set but the redis package is not installed (pip install redis)')
+        self.client = redis.Redis.from_url(url)
+        self.ttl_seconds = ttl_seconds
+        self.prefix = prefix
+    
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        return json.loads(value) if value is not None else None
+    
+    def set(self, key, value):
+        self.client.set(self.prefix + key, json.dumps(value), ex=self.ttl_seconds)
+    
+    def generation(self, customer_id):
+        return int(self.client.get(f'{self.prefix}gen:{customer_id}') or 0)
+    
+    def bump_generation(self, customer_id):
+        self.client.incr(f'{self.prefix}gen:{customer_id}')
+    
+    def size(self):
+        return None
+
+class ForecastCache:
+    """
+    Cache of forecast results per customer
+    
+    Keys combine the customer's cache generation with the caller's parts
+    (latest usage date, forecast days, tariff version, ...). Invalidating a
+    customer bumps its generation, so old entries are never read again and
+    age out through LRU eviction or the Redis TTL.
+    """
+    
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._lock = threading.Lock()
+    
+    def _key(self, customer_id, parts):
+        generation = self.backend.generation(customer_id)
+        return f"{customer_id}:{generation}:" + ':'.join(str(p) for p in parts)
+    
+    def get_or_compute(self, customer_id, parts, compute):
+        """
+        Return the cached result for a key, computing and storing it on a miss
+        
+        Args:
+            customer_id (int): Customer the result belongs to
+            parts (tuple): Remaining key parts, e.g. (kind, latest_date, days, tariff_version)
+            compute (callable): Produces a JSON-serialisable result
+        
+        Returns:
+            dict: Forecast result
+        """
+        key = self._key(customer_id, parts)
+        value = self.backend.get(key)
+        with self._lock:
+            if value is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+        if value is not None:
+            return value
+        
+        value = compute()
+        self.backend.set(key, value)
+        return value
+    
+    def invalidate(self, customer_ids):
+        for customer_id in set(customer_ids):
+            self.backend.bump_generation(customer_id)
+        with self._lock:
+            self.invalidations += len(set(customer_ids))
+    
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'backend': self.backend.name,
+            'entries': self.backend.size(),
+            'max_entries': getattr(self.backend, 'maxsize', None),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+            'invalidations': self.invalidations
+        }
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_forecast_cache():
+    """Process-wide forecast cache built from the app config"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            config = current_app.config
+            if config['FORECAST_CACHE_URL']:
+                backend = RedisBackend(config['FORECAST_CACHE_URL'], config['FORECAST_CACHE_TTL'])
+            else:
+                backend = LRUBackend(config['FORECAST_CACHE_SIZE'])
+            _cache = ForecastCache(backend)
+        return _cache
+
+def invalidate_after_commit(session, customer_ids):
+    """Drop cached forecasts for customers once the session's transaction commits"""
+    session.info.setdefault(PENDING_KEY, set()).update(int(c) for c in customer_ids)
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_committed(session):
+    pending = session.info.pop(PENDING_KEY, None)
+    if pending:
+        get_forecast_cache().invalidate(pending)
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_pending(session):
+    session.info.pop(PENDING_KEY, None)
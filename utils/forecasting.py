@@ -1,93 +1,241 @@
 import numpy as np
-from datetime import datetime, timedelta
-from collections import defaultdict
+from datetime import date
 
-def forecast_usage(customer_usage_data, forecast_days=30):
+MIN_FORECAST_READINGS = 60  # Need at least 60 days for meaningful forecast
+PATTERN_READINGS = 90  # Readings behind the day-of-week pattern
+TREND_READINGS = 30  # Readings per trend window
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+FORECAST_METHODS = ['weekday', 'holt_winters']
+DAY_NAMES = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+class UsageSeries:
+    """
+    One customer's daily usage as parallel columns sorted by date
+    
+    Attributes:
+        dates (np.ndarray): datetime64[D] reading dates
+        usage (np.ndarray): Usage in CCF per date
+        total (int): Readings in the full history when the series is a recent window of it
+    """
+    
+    def __init__(self, dates, usage, total=None):
+        dates = to_datetime64(dates)
+        usage = np.asarray(usage, dtype=float)
+        if len(dates) > 1 and (np.diff(dates.astype(np.int64)) < 0).any():
+            order = np.argsort(dates, kind='stable')
+            dates, usage = dates[order], usage[order]
+        self.dates = dates
+        self.usage = usage
+        self.total = len(usage) if total is None else total
+    
+    @classmethod
+    def from_records(cls, records):
+        """Build a series from [{date, usage_ccf}, ...] with date objects or ISO strings"""
+        return cls(
+            [r['date'] for r in records],
+            np.fromiter((r['usage_ccf'] for r in records), dtype=float, count=len(records))
+        )
+    
+    def __len__(self):
+        return len(self.usage)
+    
+    def weekdays(self):
+        """Day of week per reading, Monday = 0"""
+        return weekdays(self.dates)
+
+def as_series(usage_data):
+    """Accept a UsageSeries or a list of usage record dicts"""
+    if isinstance(usage_data, UsageSeries):
+        return usage_data
+    return UsageSeries.from_records(usage_data)
+
+def to_datetime64(dates):
+    """datetime64[D] array from date/datetime objects, ISO strings or datetime64 values"""
+    if isinstance(dates, np.ndarray):
+        return dates.astype('datetime64[D]')
+    try:
+        # Ordinals convert far faster than NumPy's per-object date parsing
+        ordinals = np.fromiter((d.toordinal() for d in dates), dtype=np.int64, count=len(dates))
+        return (ordinals - EPOCH_ORDINAL).astype('datetime64[D]')
+    except AttributeError:
+        return np.array(dates, dtype='datetime64[D]')
+
+def weekdays(dates):
+    """Day of week for datetime64[D] values, Monday = 0"""
+    return (np.asarray(dates, dtype='datetime64[D]').astype(np.int64) + 3) % 7  # 1970-01-01 was a Thursday
+
+def _group_mean(group, values, mask, n_groups):
+    """Mean of values per group over the masked rows (0 where a group has none)"""
+    counts = np.bincount(group[mask], minlength=n_groups)
+    sums = np.bincount(group[mask], weights=values[mask], minlength=n_groups)
+    return np.divide(sums, counts, out=np.zeros(n_groups), where=counts > 0), counts
+
+def compute_profiles(customer_ids, dates, usage):
+    """
+    Day-of-week patterns and trend factors for many customers at once
+    
+    Weekday means and standard deviations come from each customer's last
+    90 readings, falling back to the overall mean and deviation for
+    weekdays without readings. The trend factor is the mean of the last 30
+    readings over the mean of the 30 before them.
+    
+    Args:
+        customer_ids (sequence): Customer id per reading, grouped by customer
+        dates (sequence): Reading date per reading, ascending within each customer
+        usage (np.ndarray): Usage in CCF per reading
+    
+    Returns:
+        dict: Arrays customer_id, data_points, last_date (datetime64[D]),
+            weekday_mean and weekday_std (N x 7), recent_avg, previous_avg, trend_factor
+    """
+    customers, group = np.unique(np.asarray(customer_ids, dtype=np.int64), return_inverse=True)
+    n = len(customers)
+    days = np.asarray(dates, dtype='datetime64[D]')
+    
+    counts = np.bincount(group, minlength=n)
+    ends = np.cumsum(counts)
+    rank = ends[group] - 1 - np.arange(len(usage))  # 0 for each customer's latest reading
+    
+    # Day-of-week mean and deviation over the pattern window
+    pattern = rank < PATTERN_READINGS
+    cell = group * 7 + weekdays(days)
+    cell_mean, cell_count = _group_mean(cell, usage, pattern, n * 7)
+    cell_var, _ = _group_mean(cell, (usage - cell_mean[cell]) ** 2, pattern, n * 7)
+    
+    overall_mean, _ = _group_mean(group, usage, pattern, n)
+    overall_var, _ = _group_mean(group, (usage - overall_mean[group]) ** 2, pattern, n)
+    
+    missing = cell_count.reshape(n, 7) == 0
+    weekday_mean = np.where(missing, overall_mean[:, None], cell_mean.reshape(n, 7))
+    weekday_std = np.where(missing, np.sqrt(overall_var)[:, None], np.sqrt(cell_var.reshape(n, 7)))
+    
+    # Monthly trend
+    recent_avg, _ = _group_mean(group, usage, rank < TREND_READINGS, n)
+    previous_avg, _ = _group_mean(group, usage, (rank >= TREND_READINGS) & (rank < 2 * TREND_READINGS), n)
+    trend_factor = np.divide(recent_avg, previous_avg, out=np.ones(n), where=previous_avg > 0)
+    
+    return {
+        'customer_id': customers,
+        'data_points': counts,
+        'last_date': days[ends - 1],
+        'weekday_mean': weekday_mean,
+        'weekday_std': weekday_std,
+        'recent_avg': recent_avg,
+        'previous_avg': previous_avg,
+        'trend_factor': trend_factor
+    }
+
+def forecast_usage(customer_usage_data, forecast_days=30, method='weekday'):
     """
     Forecast future water usage based on historical patterns
     
     Args:
-        customer_usage_data (list): List of usage records [{date, usage_ccf}, ...]
+        customer_usage_data (UsageSeries or list): Usage series (the last 90 readings are enough), or
+            usage records [{date, usage_ccf}, ...]. With method 'holt_winters' a HoltWintersState may
+            be passed instead of history.
         forecast_days (int): Number of days to forecast
+        method (str): 'weekday' (last 90 readings' day-of-week pattern and trend)
+            or 'holt_winters' (smoothed level, trend, weekly and yearly seasonality)
     
     Returns:
         dict: Forecast data including predictions and confidence intervals
     """
-    if len(customer_usage_data) < 60:  # Need at least 60 days for meaningful forecast
+    if method == 'holt_winters':
+        from utils.holt_winters import forecast_holt_winters
+        return forecast_holt_winters(customer_usage_data, forecast_days)
+    if method != 'weekday':
+        raise ValueError(f'Unknown forecast method: {method}')
+    
+    series = as_series(customer_usage_data)
+    if series.total < MIN_FORECAST_READINGS:
         return {
             'error': 'Insufficient historical data for forecasting',
-            'required_days': 60,
-            'available_days': len(customer_usage_data)
+            'required_days': MIN_FORECAST_READINGS,
+            'available_days': series.total
         }
     
-    # Sort by date
-    sorted_data = sorted(customer_usage_data, key=lambda x: x['date'])
-    
-    # Calculate day-of-week patterns
-    day_of_week_usage = defaultdict(list)
-    for record in sorted_data[-90:]:  # Use last 90 days
-        date = record['date']
-        if isinstance(date, str):
-            date = datetime.fromisoformat(date)
-        day_of_week = date.weekday()
-        day_of_week_usage[day_of_week].append(record['usage_ccf'])
-    
-    # Calculate average usage per day of week
-    day_patterns = {}
-    for day in range(7):
-        if day in day_of_week_usage and day_of_week_usage[day]:
-            day_patterns[day] = {
-                'mean': np.mean(day_of_week_usage[day]),
-                'std': np.std(day_of_week_usage[day])
-            }
-        else:
-            # Use overall mean if no data for this day
-            overall_mean = np.mean([r['usage_ccf'] for r in sorted_data[-90:]])
-            overall_std = np.std([r['usage_ccf'] for r in sorted_data[-90:]])
-            day_patterns[day] = {
-                'mean': overall_mean,
-                'std': overall_std
-            }
-    
-    # Calculate monthly trend
-    recent_usage = [r['usage_ccf'] for r in sorted_data[-30:]]
-    previous_usage = [r['usage_ccf'] for r in sorted_data[-60:-30]]
-    
-    recent_avg = np.mean(recent_usage)
-    previous_avg = np.mean(previous_usage)
-    trend_factor = recent_avg / previous_avg if previous_avg > 0 else 1.0
-    
-    # Generate forecast
-    last_date = sorted_data[-1]['date']
-    if isinstance(last_date, str):
-        last_date = datetime.fromisoformat(last_date)
-    
-    forecast = []
-    for i in range(1, forecast_days + 1):
-        forecast_date = last_date + timedelta(days=i)
-        day_of_week = forecast_date.weekday()
-        
-        # Base prediction on day-of-week pattern
-        base_prediction = day_patterns[day_of_week]['mean']
-        
-        # Apply trend
-        prediction = base_prediction * trend_factor
-        
-        # Calculate confidence interval (95%)
-        std = day_patterns[day_of_week]['std']
-        lower_bound = max(0, prediction - 1.96 * std)
-        upper_bound = prediction + 1.96 * std
-        
-        forecast.append({
-            'date': forecast_date.isoformat(),
-            'predicted_usage': round(prediction, 2),
-            'lower_bound': round(lower_bound, 2),
-            'upper_bound': round(upper_bound, 2),
-            'confidence': 95
-        })
-    
-    # Calculate forecast summary
-    total_predicted = sum(f['predicted_usage'] for f in forecast)
+    # Day-of-week pattern over the last 90 readings, overall figures for missing weekdays
+    usage = series.usage[-PATTERN_READINGS:]
+    day_of_week = weekdays(series.dates[-PATTERN_READINGS:])
+    counts = np.bincount(day_of_week, minlength=7)
+    day_mean = np.divide(np.bincount(day_of_week, weights=usage, minlength=7), counts,
+                         out=np.full(7, usage.mean()), where=counts > 0)
+    day_var = np.bincount(day_of_week, weights=(usage - day_mean[day_of_week]) ** 2, minlength=7)
+    day_std = np.divide(day_var, counts, out=np.full(7, usage.var()), where=counts > 0) ** 0.5
+    
+    # Monthly trend
+    recent_avg = series.usage[-TREND_READINGS:].mean().item()
+    previous_avg = series.usage[-2 * TREND_READINGS:-TREND_READINGS].mean().item()
+    
+    return forecast_from_profile({
+        'weekday_mean': day_mean,
+        'weekday_std': day_std,
+        'trend_factor': recent_avg / previous_avg if previous_avg > 0 else 1.0,
+        'recent_avg': recent_avg,
+        'previous_avg': previous_avg,
+        'data_points': series.total,
+        'last_date': series.dates[-1]
+    }, forecast_days)
+
+def forecast_from_profile(profile, forecast_days=30):
+    """
+    Build a forecast_usage result from a precomputed usage profile
+    
+    Args:
+        profile (dict): weekday_mean and weekday_std (7 values, Monday first),
+            trend_factor, recent_avg, previous_avg, data_points and last_date
+        forecast_days (int): Number of days to forecast
+    
+    Returns:
+        dict: Same shape as forecast_usage
+    """
+    dates = np.datetime64(profile['last_date'], 'D') + np.arange(1, forecast_days + 1)
+    day_of_week = weekdays(dates)
+    trend_factor = profile['trend_factor']
+    
+    # Day-of-week pattern with trend applied
+    prediction = np.asarray(profile['weekday_mean'], dtype=float)[day_of_week] * trend_factor
+    std = np.asarray(profile['weekday_std'], dtype=float)[day_of_week]
+    
+    return build_forecast(dates, prediction, std, trend_factor, {
+        'recent_30_day_avg': round(profile['recent_avg'], 2),
+        'previous_30_day_avg': round(profile['previous_avg'], 2),
+        'data_points_used': profile['data_points']
+    })
+
+def build_forecast(dates, prediction, std, trend_factor, historical_context):
+    """
+    Format daily predictions as a forecast_usage result with 95% confidence bands
+    
+    Args:
+        dates (np.ndarray): datetime64[D] forecast dates
+        prediction (np.ndarray): Predicted usage per date
+        std (np.ndarray): Standard deviation per date
+        trend_factor (float): Expected usage over the next 30 days relative to now
+        historical_context (dict): Method-specific summary of the history used
+    
+    Returns:
+        dict: forecast, summary and historical_context
+    """
+    forecast_days = len(dates)
+    lower_bound = np.maximum(0, prediction - 1.96 * std)
+    upper_bound = prediction + 1.96 * std
+    
+    predicted = np.round(prediction, 2).tolist()
+    forecast = [{
+        'date': day,
+        'predicted_usage': p,
+        'lower_bound': l,
+        'upper_bound': u,
+        'confidence': 95
+    } for day, p, l, u in zip(
+        np.datetime_as_string(dates).tolist(),
+        predicted,
+        np.round(lower_bound, 2).tolist(),
+        np.round(upper_bound, 2).tolist()
+    )]
+    
+    total_predicted = sum(predicted)
     
     return {
         'forecast': forecast,
@@ -98,42 +246,63 @@ def forecast_usage(customer_usage_data, forecast_days=30):
             'trend_factor': round(trend_factor, 3),
             'trend_direction': 'increasing' if trend_factor > 1.05 else 'decreasing' if trend_factor < 0.95 else 'stable'
         },
-        'historical_context': {
-            'recent_30_day_avg': round(recent_avg, 2),
-            'previous_30_day_avg': round(previous_avg, 2),
-            'data_points_used': len(sorted_data)
-        }
+        'historical_context': historical_context
     }
 
-def forecast_monthly_bill(customer_usage_data, month, year):
+def forecast_monthly_bill(customer_usage_data, month, year, method='weekday'):
     """
     Forecast the bill amount for a future month
     
     Args:
-        customer_usage_data (list): Historical usage data
+        customer_usage_data (UsageSeries or list): Historical usage data, or a
+            HoltWintersState with method 'holt_winters'
         month (int): Target month (1-12)
         year (int): Target year
+        method (str): Forecast method, see forecast_usage
     
     Returns:
         dict: Forecasted bill information
     """
-    from utils.billing_calculator import calculate_total_bill
     from calendar import monthrange
     
     # Get number of days in the target month
     days_in_month = monthrange(year, month)[1]
     
     # Forecast usage for the month
-    forecast_result = forecast_usage(customer_usage_data, forecast_days=days_in_month)
+    if method == 'holt_winters':
+        # The state can forecast any horizon, so cover the target month's own days
+        from utils.holt_winters import forecast_holt_winters
+        forecast_result = forecast_holt_winters(customer_usage_data, days_in_month, start_date=date(year, month, 1))
+    else:
+        forecast_result = forecast_usage(customer_usage_data, forecast_days=days_in_month, method=method)
+    
+    return price_forecast(forecast_result, month, year)
+
+def price_forecast(forecast_result, month, year):
+    """
+    Price a usage forecast covering the target month as a bill
+    
+    Args:
+        forecast_result (dict): Result of forecast_usage for the month's number of days
+        month (int): Target month (1-12)
+        year (int): Target year
+    
+    Returns:
+        dict: Forecasted bill information
+    """
+    from utils.billing_calculator import calculate_total_bill
+    from utils.tariff import get_tariff
     
     if 'error' in forecast_result:
         return forecast_result
     
+    days_in_month = forecast_result['summary']['forecast_days']
+    
     # Calculate total predicted usage
     total_usage = forecast_result['summary']['total_predicted_usage']
     
     # Calculate bill
-    bill_data = calculate_total_bill(total_usage, month)
+    bill_data = calculate_total_bill(total_usage, month, get_tariff(date(year, month, 1)))
     
     # Add forecast context
     bill_data['forecast_info'] = {
@@ -152,31 +321,23 @@ def get_usage_insights(customer_usage_data):
     Generate insights about usage patterns
     
     Args:
-        customer_usage_data (list): Historical usage data
+        customer_usage_data (UsageSeries or list): Usage series, or historical usage records
     
     Returns:
         dict: Usage insights and recommendations
     """
-    if len(customer_usage_data) < 30:
+    series = as_series(customer_usage_data)
+    if len(series) < 30:
         return {'error': 'Insufficient data for insights'}
     
-    sorted_data = sorted(customer_usage_data, key=lambda x: x['date'])
-    usage_values = [r['usage_ccf'] for r in sorted_data]
-    
     # Day of week analysis
-    day_of_week_usage = defaultdict(list)
-    for record in sorted_data:
-        date = record['date']
-        if isinstance(date, str):
-            date = datetime.fromisoformat(date)
-        day_of_week = date.weekday()
-        day_of_week_usage[day_of_week].append(record['usage_ccf'])
-    
-    day_names = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-    day_averages = {}
-    for day in range(7):
-        if day in day_of_week_usage and day_of_week_usage[day]:
-            day_averages[day_names[day]] = round(np.mean(day_of_week_usage[day]), 2)
+    day_counts = np.bincount(series.weekdays(), minlength=7)
+    day_totals = np.bincount(series.weekdays(), weights=series.usage, minlength=7)
+    day_averages = {
+        DAY_NAMES[day]: round(total / count, 2)
+        for day, (total, count) in enumerate(zip(day_totals.tolist(), day_counts.tolist()))
+        if count
+    }
     
     # Find highest and lowest usage days
     if day_averages:
@@ -186,8 +347,8 @@ def get_usage_insights(customer_usage_data):
         highest_day = lowest_day = 'Unknown'
     
     # Calculate variability
-    std_dev = np.std(usage_values)
-    mean_usage = np.mean(usage_values)
+    std_dev = series.usage.std().item()
+    mean_usage = series.usage.mean().item()
     coefficient_of_variation = (std_dev / mean_usage) * 100 if mean_usage > 0 else 0
     
     # Determine usage consistency
@@ -0,0 +1,336 @@
+from datetime import date, datetime
+import numpy as np
+from sqlalchemy import select
+from config import Config
+from models import db, Customer, Usage, ForecastState
+from utils.forecasting import (
+    MIN_FORECAST_READINGS, EPOCH_ORDINAL, as_series, build_forecast, to_datetime64, weekdays
+)
+
+ID_CHUNK_SIZE = 900  # Customer ids per IN (...) query
+
+def months(dates):
+    """Month of year for datetime64[D] values, January = 0"""
+    return np.asarray(dates, dtype='datetime64[M]').astype(np.int64) % 12
+
+def damped_steps(damping, days):
+    """Trend multiplier after `days` damped steps: damping + damping**2 + ... + damping**days"""
+    if damping == 1.0:
+        return days * 1.0
+    return damping * (1 - damping ** days) / (1 - damping)
+
+class HoltWintersState:
+    """
+    Additive Holt-Winters state for one customer's daily usage
+    
+    A damped trend is smoothed together with day-of-week and month-of-year
+    offsets. Each new reading updates the state in constant time, and
+    forecasts for any horizon come from the state alone. Readings must
+    arrive in date order; gaps advance the level along the damped trend.
+    """
+    
+    def __init__(self, readings=0, level=0.0, trend=0.0, weekly=None, yearly=None,
+                 error_var=0.0, last_date=None, needs_rebuild=False):
+        self.readings = readings
+        self.level = level
+        self.trend = trend
+        self.weekly = list(weekly) if weekly is not None else [0.0] * 7
+        self.yearly = list(yearly) if yearly is not None else [0.0] * 12
+        self.error_var = error_var
+        self.last_date = last_date
+        self.needs_rebuild = needs_rebuild
+    
+    @classmethod
+    def from_series(cls, usage_data, params=None):
+        """Replay a usage history (UsageSeries or record list) into a new state"""
+        series = as_series(usage_data)
+        states = replay(np.zeros(len(series), dtype=np.int64), series.dates, series.usage, params)
+        return states.get(0, cls())
+    
+    def update(self, reading_date, value, params=None):
+        """Fold in one reading dated after last_date"""
+        params = params or Config.HOLT_WINTERS
+        if self.readings == 0:
+            self.level = value
+            self.readings = 1
+            self.last_date = reading_date
+            return
+        
+        alpha = params['alpha']
+        damping = params['damping']
+        gap = (reading_date - self.last_date).days
+        day_of_week = reading_date.weekday()
+        month = reading_date.month - 1
+        
+        level = self.level + self.trend * damped_steps(damping, gap)
+        trend = self.trend * damping ** gap
+        error = value - (level + self.weekly[day_of_week] + self.yearly[month])
+        
+        smoothing = max(params['error_smoothing'], 1.0 / self.readings)
+        self.error_var += smoothing * (error * error - self.error_var)
+        self.level = level + alpha * error
+        self.trend = trend + alpha * params['beta'] * error
+        self.weekly[day_of_week] += params['gamma_weekly'] * (1 - alpha) * error
+        self.yearly[month] += params['gamma_yearly'] * (1 - alpha) * error
+        self.readings += 1
+        self.last_date = reading_date
+    
+    def predict(self, dates, params=None):
+        """
+        Predicted usage and standard deviation for future dates
+        
+        The deviation grows with the horizon like simple exponential
+        smoothing's, which is a reasonable approximation here.
+        
+        Args:
+            dates (np.ndarray): datetime64[D] dates after last_date
+            params (dict): Smoothing parameters, defaults to Config.HOLT_WINTERS
+        
+        Returns:
+            tuple: (prediction array, std array)
+        """
+        params = params or Config.HOLT_WINTERS
+        alpha = params['alpha']
+        horizon = np.maximum((dates - np.datetime64(self.last_date, 'D')).astype(np.int64), 1)
+        
+        prediction = (
+            self.level
+            + self.trend * damped_steps(params['damping'], horizon)
+            + np.asarray(self.weekly)[weekdays(dates)]
+            + np.asarray(self.yearly)[months(dates)]
+        )
+        std = np.sqrt(self.error_var * (1 + (horizon - 1) * alpha ** 2))
+        return np.maximum(prediction, 0), std
+
+def replay(customer_ids, dates, usage, params=None):
+    """
+    Build Holt-Winters states for many customers from their full history
+    
+    Readings are laid out as a customers x readings grid and the update is
+    applied one reading position at a time to every customer that has one,
+    giving the same result as calling HoltWintersState.update in order.
+    
+    Args:
+        customer_ids (sequence): Customer id per reading, grouped by customer
+        dates (sequence): Reading date per reading, ascending within each customer
+        usage (np.ndarray): Usage in CCF per reading
+        params (dict): Smoothing parameters, defaults to Config.HOLT_WINTERS
+    
+    Returns:
+        dict: customer_id -> HoltWintersState
+    """
+    params = params or Config.HOLT_WINTERS
+    if not len(usage):
+        return {}
+    
+    customers, group = np.unique(np.asarray(customer_ids, dtype=np.int64), return_inverse=True)
+    dates = to_datetime64(dates)
+    n = len(customers)
+    counts = np.bincount(group, minlength=n)
+    position = np.arange(len(usage)) - (np.cumsum(counts) - counts)[group]
+    
+    grid_shape = (n, counts.max())
+    grid_day = np.zeros(grid_shape, dtype=np.int64)
+    grid_value = np.zeros(grid_shape)
+    grid_weekday = np.zeros(grid_shape, dtype=np.int64)
+    grid_month = np.zeros(grid_shape, dtype=np.int64)
+    grid_day[group, position] = dates.astype(np.int64)
+    grid_value[group, position] = usage
+    grid_weekday[group, position] = weekdays(dates)
+    grid_month[group, position] = months(dates)
+    
+    alpha = params['alpha']
+    damping = params['damping']
+    level = grid_value[:, 0].copy()
+    trend = np.zeros(n)
+    weekly = np.zeros((n, 7))
+    yearly = np.zeros((n, 12))
+    error_var = np.zeros(n)
+    last_day = grid_day[:, 0].copy()
+    
+    for k in range(1, grid_shape[1]):
+        active = np.flatnonzero(counts > k)
+        day_of_week = grid_weekday[active, k]
+        month = grid_month[active, k]
+        gap = grid_day[active, k] - last_day[active]
+        
+        predicted_level = level[active] + trend[active] * damped_steps(damping, gap)
+        predicted_trend = trend[active] * damping ** gap
+        error = grid_value[active, k] - (predicted_level + weekly[active, day_of_week] + yearly[active, month])
+        
+        smoothing = max(params['error_smoothing'], 1.0 / k)
+        error_var[active] += smoothing * (error * error - error_var[active])
+        level[active] = predicted_level + alpha * error
+        trend[active] = predicted_trend + alpha * params['beta'] * error
+        weekly[active, day_of_week] += params['gamma_weekly'] * (1 - alpha) * error
+        yearly[active, month] += params['gamma_yearly'] * (1 - alpha) * error
+        last_day[active] = grid_day[active, k]
+    
+    last_dates = [date.fromordinal(day + EPOCH_ORDINAL) for day in last_day.tolist()]
+    return {
+        customer_id: HoltWintersState(readings, lv, tr, wk, yr, var, last_date)
+        for customer_id, readings, lv, tr, wk, yr, var, last_date in zip(
+            customers.tolist(), counts.tolist(), level.tolist(), trend.tolist(),
+            weekly.tolist(), yearly.tolist(), error_var.tolist(), last_dates
+        )
+    }
+
+def forecast_holt_winters(state, forecast_days=30, start_date=None):
+    """
+    Forecast usage from Holt-Winters state
+    
+    Args:
+        state (HoltWintersState): Customer state, or usage history to replay
+        forecast_days (int): Number of days to forecast
+        start_date (date): First forecast date, defaults to the day after the last reading
+    
+    Returns:
+        dict: Same shape as forecast_usage
+    """
+    if not isinstance(state, HoltWintersState):
+        state = HoltWintersState.from_series(state)
+    if state.readings < MIN_FORECAST_READINGS:
+        return {
+            'error': 'Insufficient historical data for forecasting',
+            'required_days': MIN_FORECAST_READINGS,
+            'available_days': state.readings
+        }
+    
+    first = np.datetime64(start_date, 'D') if start_date else np.datetime64(state.last_date, 'D') + 1
+    dates = first + np.arange(forecast_days)
+    prediction, std = state.predict(dates)
+    
+    # Expected usage over the next 30 days relative to the current level
+    trend_factor = 1.0
+    if state.level > 0:
+        trend_factor = 1 + state.trend * damped_steps(Config.HOLT_WINTERS['damping'], 30) / state.level
+    
+    return build_forecast(dates, prediction, std, trend_factor, {
+        'method': 'holt_winters',
+        'level': round(state.level, 4),
+        'trend_per_day': round(state.trend, 6),
+        'last_reading_date': state.last_date.isoformat(),
+        'data_points_used': state.readings
+    })
+
+def _load_states(customer_ids):
+    states = {}
+    for start in range(0, len(customer_ids), ID_CHUNK_SIZE):
+        chunk = customer_ids[start:start + ID_CHUNK_SIZE]
+        for row in ForecastState.query.filter(ForecastState.customer_id.in_(chunk)):
+            states[row.customer_id] = HoltWintersState(
+                row.readings, row.level, row.trend, row.weekly, row.yearly,
+                row.error_var, row.last_date, row.needs_rebuild
+            )
+    return states
+
+def _save_states(states):
+    from utils.usage_ingest import bulk_upsert
+    
+    now = datetime.utcnow()
+    bulk_upsert(ForecastState.__table__, [{
+        'customer_id': customer_id,
+        'readings': s.readings,
+        'level': s.level,
+        'trend': s.trend,
+        'weekly': s.weekly,
+        'yearly': s.yearly,
+        'error_var': s.error_var,
+        'last_date': s.last_date,
+        'needs_rebuild': s.needs_rebuild,
+        'updated_at': now
+    } for customer_id, s in states.items()], index_elements=['customer_id'], update_columns=[
+        'readings', 'level', 'trend', 'weekly', 'yearly', 'error_var', 'last_date', 'needs_rebuild', 'updated_at'
+    ])
+
+def load_forecast_state(customer_id):
+    """Stored Holt-Winters state for a customer (empty if none yet)"""
+    return _load_states([customer_id]).get(customer_id, HoltWintersState())
+
+def update_forecast_states(rows, previous, overwrite=True):
+    """
+    Fold incoming readings into each customer's Holt-Winters state
+    
+    Readings after a customer's last date are applied in O(1) each. A new
+    reading for an earlier day, or a changed value for an existing day,
+    can't be folded in after the fact, so the state is flagged for
+    rebuild_forecast_states instead. The caller commits.
+    
+    Args:
+        rows (list): Usage rows [{customer_id, date, usage_ccf}, ...]
+        previous (dict): Stored usage per key from load_previous_usage
+        overwrite (bool): Whether existing readings were replaced
+    
+    Returns:
+        int: Number of readings applied
+    """
+    if not rows:
+        return 0
+    
+    params = Config.HOLT_WINTERS
+    previous = dict(previous)
+    states = _load_states(sorted({int(row['customer_id']) for row in rows}))
+    applied = 0
+    
+    for row in sorted(rows, key=lambda r: (int(r['customer_id']), r['date'])):
+        customer_id = int(row['customer_id'])
+        usage = float(row['usage_ccf'])
+        key = (customer_id, row['date'])
+        old = previous.get(key)
+        # Repeated keys in one batch behave like the stored row they will hit
+        if old is None or overwrite:
+            previous[key] = usage
+        state = states.setdefault(customer_id, HoltWintersState())
+        
+        if old is None and (state.last_date is None or row['date'] > state.last_date):
+            state.update(row['date'], usage, params)
+            applied += 1
+        elif old is None or (overwrite and old != usage):
+            state.needs_rebuild = True
+    
+    _save_states(states)
+    return applied
+
+def rebuild_forecast_states(full=False, chunk_customers=2000, progress=None):
+    """
+    Replay stored usage into Holt-Winters states
+    
+    Args:
+        full (bool): Rebuild every customer instead of those flagged needs_rebuild
+        chunk_customers (int): Customers per columnar scan
+        progress (callable): Called with (customers_done, customers_total) after each chunk
+    
+    Returns:
+        int: Number of customers rebuilt
+    """
+    from utils.forecast_cache import invalidate_after_commit
+    
+    if full:
+        ids = [row[0] for row in db.session.query(Customer.id).order_by(Customer.id)]
+    else:
+        ids = [row[0] for row in db.session.query(ForecastState.customer_id).filter(
+            ForecastState.needs_rebuild.is_(True)
+        ).order_by(ForecastState.customer_id)]
+    if not full:
+        chunk_customers = min(chunk_customers, ID_CHUNK_SIZE)
+    rebuilt = 0
+    
+    for start in range(0, len(ids), chunk_customers):
+        chunk = ids[start:start + chunk_customers]
+        in_chunk = Usage.customer_id.between(chunk[0], chunk[-1]) if full else Usage.customer_id.in_(chunk)
+        rows = db.session.execute(
+            select(Usage.customer_id, Usage.date, Usage.usage_ccf).where(in_chunk)
+            .order_by(Usage.customer_id, Usage.date)
+        ).all()
+        
+        if rows:
+            columns = list(zip(*rows))
+            states = replay(columns[0], columns[1], np.array(columns[2], dtype=float))
+            _save_states(states)
+            invalidate_after_commit(db.session, states)
+            rebuilt += len(states)
+        
+        if progress:
+            progress(min(start + chunk_customers, len(ids)), len(ids))
+    
+    return rebuilt
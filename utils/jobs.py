@@ -0,0 +1,336 @@
+import os
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from flask import current_app
+from models import db, Customer, Job
+
+JOB_HANDLERS = {}
+FINISHED_STATUSES = ['completed', 'failed', 'cancelled']
+
+# Identifies this process as the owner of the jobs it claims; the token tells a
+# restarted process apart from a dead one that had the same pid
+WORKER_ID = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+
+_executor = None
+_executor_lock = threading.Lock()
+
+class JobCancelled(Exception):
+    """Raised inside a running job once cancellation has been requested"""
+
+def job_handler(job_type):
+    """Register a function as the handler for a job type"""
+    def register(func):
+        JOB_HANDLERS[job_type] = func
+        return func
+    return register
+
+class JobContext:
+    """Progress reporting and cancellation checks for a running job"""
+    
+    def __init__(self, job):
+        self.job_id = job.id
+        self.params = job.params or {}
+    
+    def progress(self, done, total=None, result=None):
+        """
+        Commit progress and partial results together with the work done so far
+        
+        The job row is looked up again each time, so handlers may reset the
+        session (e.g. before starting a process pool).
+        
+        Raises:
+            JobCancelled: If cancellation was requested, after the commit
+        """
+        job = Job.query.get(self.job_id)
+        job.heartbeat_at = datetime.utcnow()
+        job.progress_done = done
+        if total is not None:
+            job.progress_total = total
+        if result is not None:
+            job.result = dict(result)
+        db.session.commit()
+        
+        if db.session.query(Job.cancel_requested).filter(Job.id == self.job_id).scalar():
+            raise JobCancelled()
+
+def enqueue_job(job_type, params=None, user_id=None):
+    """
+    Store a queued job and, in local worker mode, start it on the in-process pool
+    
+    Args:
+        job_type (str): A registered job type
+        params (dict): JSON-serialisable job parameters
+        user_id (int): Requesting user
+    
+    Returns:
+        Job: The queued job
+    """
+    if job_type not in JOB_HANDLERS:
+        raise ValueError(f'Unknown job type: {job_type}')
+    
+    job = Job(job_type=job_type, params=params or {}, created_by=user_id)
+    db.session.add(job)
+    db.session.commit()
+    
+    if current_app.config['JOB_WORKER_MODE'] == 'local':
+        _local_executor().submit(_run_in_app, current_app._get_current_object(), job.id)
+    return job
+
+def _local_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=current_app.config['JOB_WORKERS'], thread_name_prefix='job'
+            )
+        return _executor
+
+def _run_in_app(app, job_id):
+    with app.app_context():
+        run_job(job_id)
+
+def run_job(job_id):
+    """
+    Claim a queued job and run its handler
+    
+    The claim is a conditional UPDATE, so several workers can poll the same
+    queue without running a job twice.
+    
+    Args:
+        job_id (int): Job id
+    
+    Returns:
+        Job: The finished job, or None if another worker claimed it
+    """
+    now = datetime.utcnow()
+    claimed = Job.query.filter(Job.id == job_id, Job.status == 'queued').update({
+        Job.status: 'running',
+        Job.started_at: now,
+        Job.heartbeat_at: now,
+        Job.worker: WORKER_ID,
+        Job.attempts: db.func.coalesce(Job.attempts, 0) + 1
+    }, synchronize_session=False)
+    db.session.commit()
+    if not claimed:
+        return None
+    
+    job = Job.query.get(job_id)
+    try:
+        result = JOB_HANDLERS[job.job_type](JobContext(job))
+        job = Job.query.get(job_id)
+        job.status = 'completed'
+        job.result = result
+        job.progress_done = job.progress_total or job.progress_done
+    except JobCancelled:
+        db.session.rollback()
+        job = Job.query.get(job_id)
+        job.status = 'cancelled'
+    except Exception as e:
+        db.session.rollback()
+        job = Job.query.get(job_id)
+        job.status = 'failed'
+        job.error = str(e)
+    
+    job.completed_at = datetime.utcnow()
+    db.session.commit()
+    return job
+
+def cancel_job(job_id):
+    """
+    Cancel a queued job immediately or ask a running one to stop at its next checkpoint
+    
+    Returns:
+        bool: False if the job had already finished
+    """
+    cancelled = Job.query.filter(Job.id == job_id, Job.status == 'queued').update({
+        Job.status: 'cancelled',
+        Job.completed_at: datetime.utcnow()
+    }, synchronize_session=False)
+    if not cancelled:
+        cancelled = Job.query.filter(Job.id == job_id, Job.status == 'running').update({
+            Job.cancel_requested: True
+        }, synchronize_session=False)
+    db.session.commit()
+    return bool(cancelled)
+
+def _worker_alive(worker, heartbeat_at, stale_before):
+    """Whether the process that claimed a job may still be running it"""
+    host, _, rest = (worker or '').partition(':')
+    pid = rest.partition(':')[0]
+    if os.name == 'posix' and host == socket.gethostname() and pid.isdigit():
+        if int(pid) == os.getpid():
+            return worker == WORKER_ID  # Same pid, earlier process
+        try:
+            os.kill(int(pid), 0)
+            return True
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True
+    return heartbeat_at is not None and heartbeat_at >= stale_before
+
+def recover_jobs():
+    """
+    Requeue running jobs whose worker process has died
+    
+    A worker on this host is checked by pid; workers elsewhere are presumed
+    dead once their heartbeat is older than JOB_STALE_SECONDS. Handlers
+    commit per chunk and skip work already done, so a requeued job resumes
+    rather than repeats. Jobs that were being cancelled are cancelled, and
+    jobs that have used JOB_MAX_ATTEMPTS claims are failed.
+    
+    Returns:
+        int: Number of jobs recovered
+    """
+    stale_before = datetime.utcnow() - timedelta(seconds=current_app.config['JOB_STALE_SECONDS'])
+    max_attempts = current_app.config['JOB_MAX_ATTEMPTS']
+    recovered = 0
+    
+    for job in Job.query.filter(Job.status == 'running').all():
+        if _worker_alive(job.worker, job.heartbeat_at, stale_before):
+            continue
+        
+        if job.cancel_requested:
+            values = {Job.status: 'cancelled', Job.completed_at: datetime.utcnow()}
+        elif (job.attempts or 0) >= max_attempts:
+            values = {
+                Job.status: 'failed',
+                Job.error: f'Worker stopped while running the job ({job.attempts} attempts)',
+                Job.completed_at: datetime.utcnow()
+            }
+        else:
+            values = {Job.status: 'queued', Job.worker: None}
+        
+        # Conditional on the owner, so a worker that is only slow keeps its claim
+        recovered += Job.query.filter(
+            Job.id == job.id, Job.status == 'running', Job.worker == job.worker
+        ).update(values, synchronize_session=False)
+    
+    db.session.commit()
+    return recovered
+
+def resume_local_jobs():
+    """
+    Recover orphaned jobs and resubmit queued ones to this process's pool
+    
+    Registered as a request hook in local worker mode; it does its work
+    on the first request only, once the database is reachable.
+    """
+    app = current_app._get_current_object()
+    if app.extensions.get('jobs_resumed'):
+        return
+    
+    # A job submitted twice by concurrent first requests is only claimed once
+    recover_jobs()
+    queued = [row[0] for row in db.session.query(Job.id).filter(Job.status == 'queued').order_by(Job.id)]
+    for job_id in queued:
+        _local_executor().submit(_run_in_app, app, job_id)
+    app.extensions['jobs_resumed'] = True
+
+def work_queue(poll_seconds=None, once=False, on_job_done=None):
+    """
+    Run queued jobs one at a time from this process (external worker mode)
+    
+    Args:
+        poll_seconds (float): Sleep between empty polls, defaults to Config.JOB_POLL_SECONDS
+        once (bool): Return when the queue is empty instead of polling
+        on_job_done (callable): Called with each finished Job
+    
+    Returns:
+        int: Number of jobs run
+    """
+    poll_seconds = poll_seconds or current_app.config['JOB_POLL_SECONDS']
+    processed = 0
+    recover_jobs()
+    
+    while True:
+        job_id = db.session.query(Job.id).filter(Job.status == 'queued').order_by(Job.id).limit(1).scalar()
+        if job_id is None:
+            # Idle, so reap jobs orphaned by workers that died meanwhile
+            if recover_jobs():
+                continue
+            db.session.remove()
+            if once:
+                return processed
+            time.sleep(poll_seconds)
+            continue
+        
+        job = run_job(job_id)
+        if job:
+            processed += 1
+            if on_job_done:
+                on_job_done(job)
+
+@job_handler('generate_bills')
+def generate_bills_job(context):
+    """Generate bills a chunk of customers at a time, committing after each chunk"""
+    from utils.bill_engine import generate_period_bills
+    
+    params = context.params
+    period_start = date.fromisoformat(params['period_start'])
+    period_end = date.fromisoformat(params['period_end'])
+    
+    customers = db.session.query(Customer.id)
+    if params.get('customer_ids'):
+        customers = customers.filter(Customer.id.in_(params['customer_ids']))
+    if params.get('cycle_number') is not None:
+        customers = customers.filter(Customer.cycle_number == params['cycle_number'])
+    ids = [row[0] for row in customers.order_by(Customer.id)]
+    
+    chunk_size = current_app.config['JOB_CHUNK_CUSTOMERS']
+    max_errors = current_app.config['JOB_MAX_ERRORS']
+    result = {'bills_generated': 0, 'error_count': 0, 'errors': []}
+    context.progress(0, len(ids), result)
+    
+    for start in range(0, len(ids), chunk_size):
+        generated, errors = generate_period_bills(period_start, period_end, ids[start:start + chunk_size])
+        result = {
+            'bills_generated': result['bills_generated'] + len(generated),
+            'error_count': result['error_count'] + len(errors),
+            'errors': (result['errors'] + errors)[:max_errors]
+        }
+        context.progress(min(start + chunk_size, len(ids)), len(ids), result)
+    
+    return result
+
+@job_handler('detect_anomalies')
+def detect_anomalies_job(context):
+    """Run fleet anomaly detection, committing after each customer chunk"""
+    from utils.usage_baselines import DETECTION_METHODS
+    
+    method = context.params.get('method', 'seasonal')
+    
+    def report(done, total, created):
+        context.progress(done, total, {'method': method, 'anomalies_created': created})
+    
+    options = {}
+    if method == 'seasonal':
+        for key in ['start_date', 'end_date']:
+            if context.params.get(key):
+                options[key] = date.fromisoformat(context.params[key])
+        options['full'] = context.params.get('full', False)
+    
+    created, detected_at = DETECTION_METHODS[method](context.params.get('customer_ids'), progress=report, **options)
+    return {
+        'method': method,
+        'anomalies_created': created,
+        'detected_at': detected_at.isoformat()
+    }
+
+@job_handler('forecast_fleet')
+def forecast_fleet_job(context):
+    """Forecast every customer for a month across worker processes, committing per partition"""
+    from utils.fleet_forecast import run_fleet_forecast
+    
+    year = context.params['year']
+    month = context.params['month']
+    
+    def report(done, total, written):
+        context.progress(done, total, {'year': year, 'month': month, 'forecasts_written': written})
+    
+    written = run_fleet_forecast(year, month, workers=context.params.get('workers'), progress=report)
+    return {'year': year, 'month': month, 'forecasts_written': written}
@@ -0,0 +1,202 @@
+import smtplib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from email.message import EmailMessage
+from sqlalchemy import insert, literal, select
+from sqlalchemy.orm import joinedload
+from config import Config
+from models import db, Bill, BillNotification, User
+from utils.billing_calculator import calculate_total_bill, generate_bill_summary
+from utils.tariff import get_tariff
+
+def queue_bill_notifications(conditions):
+    """
+    Queue a notification for every customer user of the matching bills
+    
+    Runs as a single INSERT ... SELECT, so queuing a whole billing cycle
+    costs one statement. Bills whose customer has no user account are skipped.
+    
+    Args:
+        conditions (list): Filters selecting the bills to notify about
+    
+    Returns:
+        int: Number of notifications queued
+    """
+    now = datetime.utcnow()
+    recipients = select(
+        Bill.id, User.email, literal('queued'), literal(now)
+    ).join(User, User.customer_id == Bill.customer_id).where(*conditions)
+    
+    result = db.session.execute(
+        insert(BillNotification).from_select(
+            ['bill_id', 'recipient', 'status', 'created_at'], recipients
+        )
+    )
+    return result.rowcount
+
+def open_smtp_connection():
+    """Open and authenticate an SMTP connection from Config.MAIL_* settings"""
+    connection = smtplib.SMTP(Config.MAIL_SERVER, Config.MAIL_PORT, timeout=30)
+    if Config.MAIL_USE_TLS:
+        connection.starttls()
+    if Config.MAIL_USERNAME:
+        connection.login(Config.MAIL_USERNAME, Config.MAIL_PASSWORD)
+    return connection
+
+class SMTPConnectionPool:
+    """
+    Send messages over a fixed set of persistent SMTP connections
+    
+    Each worker thread opens one connection on first use and keeps it for
+    every message it sends, so the TCP/TLS handshake and login happen once
+    per connection instead of once per message.
+    """
+    
+    def __init__(self, size, connect=open_smtp_connection):
+        self.size = size
+        self._connect = connect
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=size)
+    
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = self._local.connection = self._connect()
+            with self._lock:
+                self._connections.append(connection)
+        return connection
+    
+    def _send(self, message):
+        """Send one message, reconnecting once if the server dropped us; returns an error or None"""
+        try:
+            try:
+                self._connection().send_message(message)
+            except smtplib.SMTPServerDisconnected:
+                self._local.connection = None
+                self._connection().send_message(message)
+            return None
+        except Exception as e:
+            return str(e) or type(e).__name__
+    
+    def send_all(self, messages):
+        """Send messages across the pool; returns an error (or None) per message in order"""
+        return list(self._executor.map(self._send, messages))
+    
+    def close(self):
+        self._executor.shutdown()
+        for connection in self._connections:
+            try:
+                connection.quit()
+            except Exception:
+                pass
+        self._connections = []
+
+def render_notifications(notifications):
+    """
+    Render the email for each notification
+    
+    Bill text comes from generate_bill_summary, with the tariff for each
+    billing period looked up once per batch.
+    
+    Args:
+        notifications (list): BillNotification objects with their bills loaded
+    
+    Returns:
+        list: EmailMessage per notification
+    """
+    tariffs = {}
+    messages = []
+    
+    for notification in notifications:
+        bill = notification.bill
+        period_start = bill.billing_period_start
+        if period_start not in tariffs:
+            tariffs[period_start] = get_tariff(period_start)
+        
+        bill_data = calculate_total_bill(bill.total_usage, period_start.month, tariffs[period_start])
+        message = EmailMessage()
+        message['From'] = Config.MAIL_DEFAULT_SENDER
+        message['To'] = notification.recipient
+        message['Subject'] = f"Your HydroSpark water bill for {period_start.strftime('%B %Y')}"
+        message.set_content(generate_bill_summary(bill_data))
+        messages.append(message)
+    
+    return messages
+
+def dispatch_notifications(batch_size=None, connections=None, connect=open_smtp_connection, limit=None,
+                           retry_failed=False):
+    """
+    Deliver queued bill notifications
+    
+    Queued rows are read in id order a batch at a time, rendered, sent
+    through an SMTPConnectionPool and marked sent or failed with one
+    commit per batch. Failed notifications stay failed unless retry_failed
+    requeues them first.
+    
+    Args:
+        batch_size (int): Notifications per batch, defaults to Config.NOTIFICATION_BATCH_SIZE
+        connections (int): Parallel SMTP connections, defaults to Config.NOTIFICATION_CONNECTIONS
+        connect (callable): Returns a connected smtplib.SMTP-like object
+        limit (int): Stop after this many notifications, None for all queued
+        retry_failed (bool): Requeue failed notifications before sending
+    
+    Returns:
+        dict: {sent, failed, elapsed_seconds, messages_per_second}
+    """
+    batch_size = batch_size or Config.NOTIFICATION_BATCH_SIZE
+    if retry_failed:
+        BillNotification.query.filter(BillNotification.status == 'failed').update({
+            BillNotification.status: 'queued',
+            BillNotification.error: None
+        }, synchronize_session=False)
+        db.session.commit()
+    
+    pool = SMTPConnectionPool(connections or Config.NOTIFICATION_CONNECTIONS, connect)
+    started = time.perf_counter()
+    sent = failed = 0
+    last_id = 0
+    
+    try:
+        while limit is None or sent + failed < limit:
+            size = batch_size if limit is None else min(batch_size, limit - sent - failed)
+            batch = BillNotification.query.options(
+                joinedload(BillNotification.bill)
+            ).filter(
+                BillNotification.status == 'queued',
+                BillNotification.id > last_id
+            ).order_by(BillNotification.id).limit(size).all()
+            if not batch:
+                break
+            last_id = batch[-1].id
+            
+            errors = pool.send_all(render_notifications(batch))
+            
+            sent_at = datetime.utcnow()
+            delivered = [n.id for n, error in zip(batch, errors) if error is None]
+            if delivered:
+                BillNotification.query.filter(BillNotification.id.in_(delivered)).update({
+                    BillNotification.status: 'sent',
+                    BillNotification.sent_at: sent_at
+                }, synchronize_session=False)
+            for notification, error in zip(batch, errors):
+                if error is not None:
+                    notification.status = 'failed'
+                    notification.error = error
+            db.session.commit()
+            
+            sent += len(delivered)
+            failed += len(batch) - len(delivered)
+    finally:
+        pool.close()
+    
+    elapsed = time.perf_counter() - started
+    return {
+        'sent': sent,
+        'failed': failed,
+        'elapsed_seconds': round(elapsed, 3),
+        'messages_per_second': round((sent + failed) / elapsed, 1) if elapsed else 0
+    }
@@ -0,0 +1,152 @@
+from collections import defaultdict
+from datetime import datetime
+from sqlalchemy import func
+from models import db, Bill, BillAdjustment, RebillRun, Tariff, Usage
+from utils.billing_calculator import calculate_total_bills
+from utils.tariff import get_tariff, invalidate_tariff_cache
+
+ID_CHUNK_SIZE = 900  # Bill ids per IN (...) query
+
+def find_stale_bills(since=None):
+    """
+    Find bills whose usage or tariff changed after they were priced
+    
+    Only usage rows updated after `since` are joined to bills (through the
+    usage.updated_at index), and tariff versions are only checked when one
+    was created after `since`, so the cost follows the number of changes.
+    
+    Args:
+        since (datetime): Only consider changes after this time, None for all
+    
+    Returns:
+        dict: bill_id -> reason ('usage_correction' or 'tariff_change')
+    """
+    stale = {}
+    
+    # Usage written after the bill was last priced
+    changed = db.session.query(Bill.id).join(Usage, db.and_(
+        Usage.customer_id == Bill.customer_id,
+        Usage.date >= Bill.billing_period_start,
+        Usage.date <= Bill.billing_period_end
+    )).filter(
+        Usage.updated_at > func.coalesce(Bill.repriced_at, Bill.generated_at)
+    )
+    if since is not None:
+        changed = changed.filter(Usage.updated_at > since)
+    for (bill_id,) in changed.distinct():
+        stale[bill_id] = 'usage_correction'
+    
+    # Bills priced with a tariff version that is no longer in effect for their period
+    tariff_changes = Tariff.query
+    if since is not None:
+        tariff_changes = tariff_changes.filter(Tariff.created_at > since)
+    earliest = tariff_changes.with_entities(func.min(Tariff.effective_date)).scalar()
+    if earliest is not None:
+        periods = db.session.query(Bill.billing_period_start).filter(
+            Bill.billing_period_start >= earliest
+        ).distinct()
+        for (period_start,) in periods:
+            version = get_tariff(period_start).version
+            mismatched = db.session.query(Bill.id).filter(
+                Bill.billing_period_start == period_start,
+                Bill.tariff_version.is_distinct_from(version)
+            )
+            for (bill_id,) in mismatched:
+                stale.setdefault(bill_id, 'tariff_change')
+    
+    return stale
+
+def _current_pricing(bills):
+    """Latest (usage, amount) per bill, taking previous adjustments into account"""
+    pricing = {b.id: (b.total_usage, b.total_amount) for b in bills}
+    adjustments = BillAdjustment.query.filter(
+        BillAdjustment.bill_id.in_(list(pricing))
+    ).order_by(BillAdjustment.id)
+    for adjustment in adjustments:
+        pricing[adjustment.bill_id] = (adjustment.new_usage, adjustment.new_amount)
+    return pricing
+
+def rebill(stale):
+    """
+    Re-price stale bills and write adjustment records
+    
+    Args:
+        stale (dict): bill_id -> reason, from find_stale_bills
+    
+    Returns:
+        list: Created BillAdjustment objects
+    """
+    created = []
+    bill_ids = sorted(stale)
+    repriced_at = datetime.utcnow()
+    
+    for start in range(0, len(bill_ids), ID_CHUNK_SIZE):
+        chunk = bill_ids[start:start + ID_CHUNK_SIZE]
+        bills = Bill.query.filter(Bill.id.in_(chunk)).all()
+        current = _current_pricing(bills)
+        
+        # Corrected period totals for the whole chunk in one grouped query
+        totals = dict(db.session.query(Bill.id, func.sum(Usage.usage_ccf)).join(Usage, db.and_(
+            Usage.customer_id == Bill.customer_id,
+            Usage.date >= Bill.billing_period_start,
+            Usage.date <= Bill.billing_period_end
+        )).filter(Bill.id.in_(chunk)).group_by(Bill.id).all())
+        
+        by_period = defaultdict(list)
+        for bill in bills:
+            by_period[bill.billing_period_start].append(bill)
+        
+        for period_start, period_bills in by_period.items():
+            tariff = get_tariff(period_start)
+            priced = calculate_total_bills(
+                [totals.get(b.id, 0.0) for b in period_bills], period_start.month, tariff
+            )
+            
+            for bill, new_usage, new_amount in zip(
+                period_bills, priced['total_usage'].tolist(), priced['total_amount'].tolist()
+            ):
+                previous_usage, previous_amount = current[bill.id]
+                if new_amount != previous_amount or new_usage != previous_usage or bill.tariff_version != tariff.version:
+                    adjustment = BillAdjustment(
+                        bill_id=bill.id,
+                        reason=stale[bill.id],
+                        previous_usage=previous_usage,
+                        new_usage=new_usage,
+                        previous_amount=previous_amount,
+                        new_amount=new_amount,
+                        amount_delta=round(new_amount - previous_amount, 2),
+                        previous_tariff_version=bill.tariff_version,
+                        tariff_version=tariff.version,
+                        created_at=repriced_at
+                    )
+                    db.session.add(adjustment)
+                    created.append(adjustment)
+                    bill.tariff_version = tariff.version
+                bill.repriced_at = repriced_at
+    
+    return created
+
+def run_rebill():
+    """
+    Re-bill everything that changed since the last completed run
+    
+    Returns:
+        RebillRun: The completed run
+    """
+    last_run = RebillRun.query.filter(
+        RebillRun.completed_at.isnot(None)
+    ).order_by(RebillRun.started_at.desc()).first()
+    since = last_run.started_at if last_run else None
+    invalidate_tariff_cache()
+    
+    run = RebillRun(started_at=datetime.utcnow())
+    db.session.add(run)
+    
+    stale = find_stale_bills(since)
+    adjustments = rebill(stale)
+    
+    run.bills_checked = len(stale)
+    run.adjustments_created = len(adjustments)
+    run.completed_at = datetime.utcnow()
+    db.session.commit()
+    return run
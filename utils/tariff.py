@@ -0,0 +1,245 @@
+import time
+import threading
+from bisect import bisect_left, bisect_right
+from datetime import date
+import numpy as np
+from flask import has_app_context
+from config import Config
+
+SEASON_MONTHS = {
+    'summer': [6, 7, 8],
+    'winter': [12, 1, 2],
+    'spring_fall': [3, 4, 5, 9, 10, 11]
+}
+
+class CompiledTariff:
+    """
+    Tariff compiled into cumulative breakpoint arrays
+    
+    Usage is charged by locating its tier with a binary search and adding
+    the precomputed charge for all lower tiers, so pricing costs the same
+    for any number of tiers and works on scalars or whole arrays.
+    """
+    
+    def __init__(self, definition, version=None, name='Default', effective_date=None):
+        self.version = version
+        self.name = name
+        self.effective_date = effective_date
+        self.definition = definition = _normalize_tiers(definition)
+        
+        tiers = definition['tiers']
+        self.breakpoints = np.array([float(t['min']) for t in tiers])
+        self.upper_bounds = np.array([float('inf') if t['max'] is None else float(t['max']) for t in tiers])
+        self.rates = np.array([float(t['rate']) for t in tiers])
+        
+        # Charge accumulated below each breakpoint
+        widths = self.upper_bounds - self.breakpoints
+        self.prefix_charges = np.concatenate(([0.0], np.cumsum(widths[:-1] * self.rates[:-1])))
+        
+        self.tier_labels = [
+            f"{t['min']}-{t['max'] if t['max'] is not None else '+'} CCF"
+            for t in tiers
+        ]
+        
+        # Month number -> season and multiplier
+        season_months = definition.get('season_months', SEASON_MONTHS)
+        self.month_seasons = [None] * 13
+        for season, months in season_months.items():
+            for month in months:
+                self.month_seasons[month] = season
+        self.month_multipliers = np.array([
+            definition['seasonal_multipliers'][season] if season else 1.0
+            for season in self.month_seasons
+        ])
+        
+        self.base_service_fee = definition['fees']['base_service']
+        self.infrastructure_fee = definition['fees']['infrastructure']
+        self.total_fees = self.base_service_fee + self.infrastructure_fee
+        
+        self._breakpoint_list = self.breakpoints.tolist()
+        self._upper_list = self.upper_bounds.tolist()
+        self._prefix_list = self.prefix_charges.tolist()
+        self._rate_list = self.rates.tolist()
+    
+    def season(self, month):
+        """Season name for a month number"""
+        return self.month_seasons[month]
+    
+    def seasonal_multiplier(self, month):
+        """Seasonal multiplier for a month number"""
+        return self.month_multipliers[month].item()
+    
+    def tiered_charge(self, usage_ccf):
+        """Tiered charge before seasonal adjustment for one usage value"""
+        if usage_ccf <= 0:
+            return 0.0
+        tier = bisect_right(self._breakpoint_list, usage_ccf) - 1
+        return self._prefix_list[tier] + (usage_ccf - self._breakpoint_list[tier]) * self._rate_list[tier]
+    
+    def tiered_charges(self, usage_ccf):
+        """Tiered charges before seasonal adjustment for an array of usage values"""
+        usage = np.asarray(usage_ccf, dtype=float)
+        tier = np.clip(np.searchsorted(self.breakpoints, usage, side='right') - 1, 0, len(self.rates) - 1)
+        charges = self.prefix_charges[tier] + (usage - self.breakpoints[tier]) * self.rates[tier]
+        return np.where(usage > 0, charges, 0.0)
+    
+    def tier_breakdown(self, usage_ccf):
+        """(label, usage, rate) for each tier the usage reaches"""
+        reached = bisect_left(self._breakpoint_list, usage_ccf)
+        return [
+            (self.tier_labels[i],
+             min(usage_ccf - self._breakpoint_list[i], self._upper_list[i] - self._breakpoint_list[i]),
+             self._rate_list[i])
+            for i in range(reached)
+        ]
+    
+    def tier_usage(self, usage_ccf):
+        """Usage falling into each tier, shape (..., len(tiers))"""
+        usage = np.asarray(usage_ccf, dtype=float)
+        return np.clip(usage[..., None] - self.breakpoints, 0, self.upper_bounds - self.breakpoints)
+    
+    def usage_charges(self, usage_ccf, months):
+        """Seasonally adjusted usage charges for arrays of usage and month numbers"""
+        return self.tiered_charges(usage_ccf) * self.month_multipliers[np.asarray(months)]
+    
+    def total_bills(self, usage_ccf, months):
+        """
+        Price many bills at once
+        
+        Args:
+            usage_ccf (array-like): Total usage per bill in CCF
+            months (int or array-like): Month number per bill (1-12)
+        
+        Returns:
+            dict: Arrays of total_usage, usage_charge and total_amount plus total_fees
+        """
+        usage = np.asarray(usage_ccf, dtype=float)
+        usage_charge = round_cents(self.usage_charges(usage, np.broadcast_to(months, usage.shape)))
+        return {
+            'total_usage': round_cents(usage),
+            'usage_charge': usage_charge,
+            'total_fees': self.total_fees,
+            'total_amount': round_cents(usage_charge + self.total_fees)
+        }
+    
+    def to_dict(self):
+        return {
+            'version': self.version,
+            'name': self.name,
+            'effective_date': self.effective_date.isoformat() if self.effective_date else None,
+            'definition': self.definition
+        }
+
+def _normalize_tiers(definition):
+    """Sort tiers and store an unbounded top tier as max None so definitions stay JSON-safe"""
+    tiers = sorted(definition['tiers'], key=lambda t: t['min'])
+    return dict(definition, tiers=[
+        dict(t, max=None if t['max'] in (None, float('inf')) else t['max']) for t in tiers
+    ])
+
+def round_cents(values):
+    """Round to cents with Python's round() so array and scalar paths agree exactly"""
+    return np.array([round(value, 2) for value in np.asarray(values, dtype=float).tolist()], dtype=float)
+
+def _is_amount(value):
+    """Whether a value is a finite, non-negative number (bools excluded)"""
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and 0 <= value < float('inf')
+
+def validate_definition(definition):
+    """
+    Check a tariff definition and return it with infinite tiers normalised to None
+    
+    Raises:
+        ValueError: If the definition is incomplete, its tiers are not contiguous
+            from 0, a rate, multiplier or fee is not a non-negative number, or the
+            seasons don't cover each month 1-12 exactly once
+    """
+    for key in ['tiers', 'seasonal_multipliers', 'fees']:
+        if key not in definition:
+            raise ValueError(f'Missing tariff field: {key}')
+    
+    for tier in definition['tiers']:
+        if not isinstance(tier, dict) or not all(key in tier for key in ['min', 'max', 'rate']):
+            raise ValueError('Each tier needs min, max and rate')
+        if not _is_amount(tier['min']) or not _is_amount(tier['rate']):
+            raise ValueError('Tier min and rate must be non-negative numbers')
+        if tier['max'] not in (None, float('inf')) and not (_is_amount(tier['max']) and tier['max'] > tier['min']):
+            raise ValueError('Tier max must be a number above its min, or null for the last tier')
+    
+    tiers = sorted(definition['tiers'], key=lambda t: t['min'])
+    if not tiers or tiers[0]['min'] != 0:
+        raise ValueError('Tiers must start at 0 CCF')
+    for lower, upper in zip(tiers, tiers[1:]):
+        if lower['max'] != upper['min']:
+            raise ValueError('Tiers must be contiguous')
+    for tier in tiers[:-1]:
+        if tier['max'] in (None, float('inf')):
+            raise ValueError('Only the last tier may be unbounded')
+    
+    season_months = definition.get('season_months', SEASON_MONTHS)
+    if not isinstance(season_months, dict):
+        raise ValueError('season_months must map season names to month lists')
+    assigned = []
+    for season, months in season_months.items():
+        if season not in definition['seasonal_multipliers']:
+            raise ValueError(f'Missing seasonal multiplier: {season}')
+        if not _is_amount(definition['seasonal_multipliers'][season]):
+            raise ValueError(f'Seasonal multiplier for {season} must be a non-negative number')
+        if not isinstance(months, list) or not all(isinstance(m, int) and not isinstance(m, bool) for m in months):
+            raise ValueError(f'Months for {season} must be a list of month numbers')
+        assigned.extend(months)
+    if sorted(assigned) != list(range(1, 13)):
+        raise ValueError('season_months must assign each month 1-12 to exactly one season')
+    
+    for key in ['base_service', 'infrastructure']:
+        if key not in definition['fees']:
+            raise ValueError(f'Missing fee: {key}')
+        if not _is_amount(definition['fees'][key]):
+            raise ValueError(f'Fee {key} must be a non-negative number')
+    
+    return _normalize_tiers(definition)
+
+_default_tariff = CompiledTariff(Config.PRICING)
+_cache = {'loaded_at': None, 'tariffs': []}
+_cache_lock = threading.Lock()
+
+def _load_tariffs():
+    """Compile all tariff versions, newest effective date last"""
+    from models import Tariff
+    
+    return [
+        CompiledTariff(t.definition, version=t.id, name=t.name, effective_date=t.effective_date)
+        for t in Tariff.query.order_by(Tariff.effective_date, Tariff.id).all()
+    ]
+
+def get_tariff(as_of=None):
+    """
+    Get the compiled tariff in effect on a date
+    
+    Tariff versions are cached in memory and reloaded after
+    Config.TARIFF_CACHE_SECONDS. Without any stored versions, or outside an
+    app context, the built-in Config.PRICING tariff is used.
+    
+    Args:
+        as_of (date): Date the tariff must be effective on, defaults to today
+    
+    Returns:
+        CompiledTariff: Tariff in effect
+    """
+    if not has_app_context():
+        return _default_tariff
+    
+    as_of = as_of or date.today()
+    with _cache_lock:
+        if _cache['loaded_at'] is None or time.monotonic() - _cache['loaded_at'] > Config.TARIFF_CACHE_SECONDS:
+            _cache['tariffs'] = _load_tariffs()
+            _cache['loaded_at'] = time.monotonic()
+        tariffs = _cache['tariffs']
+    
+    effective = [t for t in tariffs if t.effective_date <= as_of]
+    return effective[-1] if effective else _default_tariff
+
+def invalidate_tariff_cache():
+    """Force the next get_tariff call to reload versions"""
+    with _cache_lock:
+        _cache['loaded_at'] = None
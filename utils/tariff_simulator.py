@@ -0,0 +1,118 @@
+import time
+from datetime import date
+import numpy as np
+from models import db, Customer
+from utils.tariff import get_tariff
+from utils.usage_rollups import monthly_usage
+
+def load_monthly_usage(start_date, end_date):
+    """
+    Load per-customer monthly usage totals as arrays from the monthly rollups
+    
+    Args:
+        start_date (date): First day to include
+        end_date (date): Last day to include
+    
+    Returns:
+        dict: Parallel arrays customer_id, customer_type, cycle_number, year, month, usage
+    """
+    monthly = monthly_usage(start_date, end_date)
+    
+    rows = db.session.query(
+        monthly.c.customer_id,
+        Customer.customer_type,
+        Customer.cycle_number,
+        monthly.c.year,
+        monthly.c.month,
+        monthly.c.usage_ccf
+    ).join(Customer, Customer.id == monthly.c.customer_id).all()
+    
+    columns = list(zip(*rows)) if rows else [[]] * 6
+    return {
+        'customer_id': np.array(columns[0], dtype=np.int64),
+        'customer_type': np.array(columns[1], dtype=object),
+        'cycle_number': np.array(columns[2], dtype=np.int64),
+        'year': np.array(columns[3], dtype=np.int64),
+        'month': np.array(columns[4], dtype=np.int64),
+        'usage': np.array(columns[5], dtype=float)
+    }
+
+def price_bills(tariff, usage, months):
+    """Total amount per bill for arrays of usage and month numbers, rounded exactly as the bill engine rounds"""
+    return tariff.total_bills(usage, months)['total_amount']
+
+def _group_totals(name, keys, baseline, candidate):
+    """Sum baseline and candidate revenue per distinct key"""
+    labels, index = np.unique(keys, return_inverse=True)
+    bills = np.bincount(index, minlength=len(labels))
+    baseline_totals = np.bincount(index, weights=baseline, minlength=len(labels))
+    candidate_totals = np.bincount(index, weights=candidate, minlength=len(labels))
+    return [{
+        name: label.item() if hasattr(label, 'item') else label,
+        'bills': int(count),
+        'baseline_revenue': round(float(b), 2),
+        'candidate_revenue': round(float(c), 2),
+        'delta': round(float(c - b), 2)
+    } for label, count, b, c in zip(labels, bills, baseline_totals, candidate_totals)]
+
+def simulate_tariff(candidate, start_date, end_date, baseline=None):
+    """
+    Re-price historical monthly usage under a candidate tariff
+    
+    Each customer-month is priced under the baseline (by default the tariff
+    in effect for that month) and the candidate in one vectorized pass.
+    Nothing is written to the database.
+    
+    Args:
+        candidate (CompiledTariff): Proposed tariff
+        start_date (date): First day of history to re-price
+        end_date (date): Last day of history to re-price
+        baseline (CompiledTariff): Tariff to compare against, defaults to the effective versions
+    
+    Returns:
+        dict: Revenue totals and deltas by customer_type, cycle and candidate tier
+    """
+    started = time.perf_counter()
+    monthly = load_monthly_usage(start_date, end_date)
+    usage = monthly['usage']
+    months = monthly['month']
+    
+    if baseline is not None:
+        baseline_amounts = price_bills(baseline, usage, months)
+    else:
+        baseline_amounts = np.zeros_like(usage)
+        periods = monthly['year'] * 100 + months
+        for period in np.unique(periods):
+            mask = periods == period
+            tariff = get_tariff(date(int(period // 100), int(period % 100), 1))
+            baseline_amounts[mask] = price_bills(tariff, usage[mask], months[mask])
+    
+    candidate_amounts = price_bills(candidate, usage, months)
+    
+    # Band each bill by the highest candidate tier its usage reaches
+    tier_index = np.clip(
+        np.searchsorted(candidate.breakpoints, usage, side='left') - 1, 0, len(candidate.rates) - 1
+    )
+    tier_labels = np.array(candidate.tier_labels, dtype=object)[tier_index]
+    
+    baseline_total = float(baseline_amounts.sum())
+    candidate_total = float(candidate_amounts.sum())
+    
+    return {
+        'period': {
+            'start_date': start_date.isoformat(),
+            'end_date': end_date.isoformat()
+        },
+        'customers': int(len(np.unique(monthly['customer_id']))),
+        'bills': int(len(usage)),
+        'totals': {
+            'baseline_revenue': round(baseline_total, 2),
+            'candidate_revenue': round(candidate_total, 2),
+            'delta': round(candidate_total - baseline_total, 2),
+            'delta_percent': round((candidate_total - baseline_total) / baseline_total * 100, 2) if baseline_total else 0
+        },
+        'by_customer_type': _group_totals('customer_type', monthly['customer_type'], baseline_amounts, candidate_amounts),
+        'by_cycle': _group_totals('cycle_number', monthly['cycle_number'], baseline_amounts, candidate_amounts),
+        'by_tier': _group_totals('tier', tier_labels, baseline_amounts, candidate_amounts),
+        'elapsed_seconds': round(time.perf_counter() - started, 3)
+    }
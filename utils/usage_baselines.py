@@ -0,0 +1,244 @@
+from datetime import datetime, timedelta
+import numpy as np
+from sqlalchemy import func, select
+from config import Config
+from models import db, Customer, DetectionWatermark, Usage, UsageBaseline
+from utils.fleet_anomalies import detect_fleet_anomalies, store_new_anomalies
+
+SCAN_CHUNK_CUSTOMERS = 2000  # Customers per columnar scan
+CELL_MIN_READINGS = 8  # Readings before a month x weekday cell is trusted on its own
+MIN_READINGS = 30  # Same minimum history as detect_anomalies
+CELLS = 12 * 7
+WATERMARK_OVERLAP = timedelta(minutes=10)  # Rescans writes committed just after a run started (rescored readings are deduplicated)
+
+def calendar_cells(dates):
+    """Month (1-12) and weekday (0 = Monday) arrays for a sequence of dates"""
+    days = np.array(dates, dtype='datetime64[D]')
+    months = days.astype('datetime64[M]').astype(np.int64) % 12 + 1
+    weekdays = (days.astype(np.int64) + 3) % 7  # 1970-01-01 was a Thursday
+    return months, weekdays
+
+def _cell_moments(group, months, weekdays, usage, n_customers):
+    """Per customer x month x weekday reading count, mean and m2, shape (n_customers, 12, 7)"""
+    cell = group * CELLS + (months - 1) * 7 + weekdays
+    size = n_customers * CELLS
+    counts = np.bincount(cell, minlength=size)
+    sums = np.bincount(cell, weights=usage, minlength=size)
+    means = np.divide(sums, counts, out=np.zeros(size), where=counts > 0)
+    m2 = np.bincount(cell, weights=(usage - means[cell]) ** 2, minlength=size)
+    shape = (n_customers, 12, 7)
+    return counts.reshape(shape), means.reshape(shape), m2.reshape(shape)
+
+def _scan(id_condition):
+    """Ordered (customer_id, date, usage) columns for customers matching a condition"""
+    rows = db.session.execute(
+        select(Usage.customer_id, Usage.date, Usage.usage_ccf).where(id_condition)
+        .order_by(Usage.customer_id, Usage.date)
+    ).all()
+    return list(zip(*rows)) if rows else None
+
+def refresh_baselines(full=False, progress=None):
+    """
+    Recompute seasonal baselines for customers whose usage changed
+    
+    Only customers with usage written since the previous refresh are
+    rescanned, unless full is set. Each chunk is reduced to month x weekday
+    cells with bincount and its cells replaced in bulk. The caller commits.
+    
+    Args:
+        full (bool): Rebuild every customer's baselines
+        progress (callable): Called with (customers_done, customers_total) after each chunk
+    
+    Returns:
+        int: Number of customers refreshed
+    """
+    refreshed_at = datetime.utcnow()
+    watermark = None if full else db.session.query(func.max(UsageBaseline.updated_at)).scalar()
+    
+    changed = db.session.query(Usage.customer_id).distinct()
+    if watermark is not None:
+        changed = changed.filter(Usage.updated_at > watermark)
+    ids = sorted(row[0] for row in changed)
+    if full:
+        UsageBaseline.query.delete()
+    
+    for start in range(0, len(ids), SCAN_CHUNK_CUSTOMERS):
+        chunk = ids[start:start + SCAN_CHUNK_CUSTOMERS]
+        if not full:
+            UsageBaseline.query.filter(UsageBaseline.customer_id.in_(chunk)).delete(synchronize_session=False)
+        
+        columns = _scan(Usage.customer_id.in_(chunk))
+        if columns:
+            customers, group = np.unique(np.array(columns[0], dtype=np.int64), return_inverse=True)
+            months, weekdays = calendar_cells(columns[1])
+            counts, means, m2 = _cell_moments(group, months, weekdays, np.array(columns[2], dtype=float), len(customers))
+            
+            filled = np.argwhere(counts > 0)
+            db.session.execute(UsageBaseline.__table__.insert(), [{
+                'customer_id': int(customers[c]),
+                'month': int(m) + 1,
+                'day_of_week': int(w),
+                'readings': int(counts[c, m, w]),
+                'mean': float(means[c, m, w]),
+                'm2': float(m2[c, m, w]),
+                'updated_at': refreshed_at
+            } for c, m, w in filled.tolist()])
+        
+        if progress:
+            progress(min(start + SCAN_CHUNK_CUSTOMERS, len(ids)), len(ids))
+    
+    return len(ids)
+
+def load_baselines(customer_ids):
+    """
+    Load baselines as dense arrays with month-level fallbacks
+    
+    Cells with fewer than CELL_MIN_READINGS readings use the pooled
+    statistics of the whole month for that customer.
+    
+    Args:
+        customer_ids (array-like): Sorted customer ids, one row each in the result
+    
+    Returns:
+        dict: Arrays (len(customer_ids), 12, 7) of readings, mean, std plus total readings per customer
+    """
+    customer_ids = np.asarray(customer_ids, dtype=np.int64)
+    shape = (len(customer_ids), 12, 7)
+    counts, means, m2 = np.zeros(shape), np.zeros(shape), np.zeros(shape)
+    
+    rows = db.session.execute(
+        select(UsageBaseline.customer_id, UsageBaseline.month, UsageBaseline.day_of_week,
+               UsageBaseline.readings, UsageBaseline.mean, UsageBaseline.m2)
+        .where(UsageBaseline.customer_id.between(int(customer_ids[0]), int(customer_ids[-1])))
+    ).all() if len(customer_ids) else []
+    if rows:
+        cid, month, weekday, n, mean, sq = (np.array(c) for c in zip(*rows))
+        known = np.isin(cid, customer_ids)
+        c = np.searchsorted(customer_ids, cid[known])
+        index = (c, month[known] - 1, weekday[known])
+        counts[index], means[index], m2[index] = n[known], mean[known], sq[known]
+    
+    # Pool the seven weekday cells of each month (Chan et al. parallel variance)
+    month_counts = counts.sum(axis=2, keepdims=True)
+    month_means = np.divide((counts * means).sum(axis=2, keepdims=True), month_counts,
+                            out=np.zeros_like(month_counts), where=month_counts > 0)
+    month_m2 = (m2 + counts * (means - month_means) ** 2).sum(axis=2, keepdims=True)
+    
+    use_cell = counts >= CELL_MIN_READINGS
+    readings = np.where(use_cell, counts, month_counts)
+    mean = np.where(use_cell, means, month_means)
+    sum_sq = np.where(use_cell, m2, month_m2)
+    
+    return {
+        'readings': readings,
+        'mean': mean,
+        'std': np.sqrt(np.divide(sum_sq, readings, out=np.zeros(shape), where=readings > 0)),
+        'customer_readings': counts.sum(axis=(1, 2))
+    }
+
+def detect_seasonal_anomalies(customer_ids=None, start_date=None, end_date=None, threshold_sigma=None,
+                              progress=None, full=False):
+    """
+    Flag readings far above their customer's month x weekday baseline
+    
+    Baselines are refreshed incrementally first, then each reading is
+    scored with one vectorized lookup into the dense baseline arrays, so
+    summer irrigation is compared against other summer days instead of the
+    yearly mean. New anomalies are stored as in detect_fleet_anomalies.
+    
+    Without a start_date only readings written since the last fleet-wide
+    run are scored (a watermark against usage.updated_at), so repeated runs
+    don't rescan all history. Fleet-wide runs without date bounds advance
+    the watermark. The caller commits.
+    
+    Args:
+        customer_ids (list): Restrict to these customers, None for all
+        start_date (date): First reading date to score, None for readings written since the last run
+        end_date (date): Last reading date to score, None for no limit
+        threshold_sigma (float): Defaults to Config.ANOMALY_THRESHOLD_SIGMA
+        progress (callable): Called with (customers_done, customers_total, anomalies_created) after each chunk
+        full (bool): Score all history regardless of the watermark
+    
+    Returns:
+        tuple: (number of anomalies created, detected_at timestamp written to them)
+    """
+    if threshold_sigma is None:
+        threshold_sigma = Config.ANOMALY_THRESHOLD_SIGMA
+    
+    # Taken before the scan so writes that land during it are picked up next run
+    detected_at = datetime.utcnow()
+    refresh_baselines()
+    
+    watermark = None
+    if not full and start_date is None:
+        watermark = db.session.get(DetectionWatermark, 'seasonal')
+    written_after = watermark.scored_through - WATERMARK_OVERLAP if watermark else None
+    
+    if written_after is not None:
+        changed = db.session.query(Usage.customer_id).distinct().filter(Usage.updated_at > written_after)
+        if customer_ids is not None:
+            changed = changed.filter(Usage.customer_id.in_(customer_ids))
+        ids = sorted(row[0] for row in changed)
+    elif customer_ids is None:
+        ids = [row[0] for row in db.session.query(Customer.id).order_by(Customer.id)]
+    else:
+        ids = sorted(customer_ids)
+    
+    created = 0
+    
+    for start in range(0, len(ids), SCAN_CHUNK_CUSTOMERS):
+        chunk = ids[start:start + SCAN_CHUNK_CUSTOMERS]
+        if customer_ids is None:
+            condition = Usage.customer_id.between(chunk[0], chunk[-1])
+        else:
+            condition = Usage.customer_id.in_(chunk)
+        if start_date is not None:
+            condition = db.and_(condition, Usage.date >= start_date)
+        if end_date is not None:
+            condition = db.and_(condition, Usage.date <= end_date)
+        if written_after is not None:
+            condition = db.and_(condition, Usage.updated_at > written_after)
+        
+        columns = _scan(condition)
+        if columns:
+            chunk_ids = np.array(chunk, dtype=np.int64)
+            baselines = load_baselines(chunk_ids)
+            usage = np.array(columns[2], dtype=float)
+            c = np.searchsorted(chunk_ids, np.array(columns[0], dtype=np.int64))
+            months, weekdays = calendar_cells(columns[1])
+            index = (c, months - 1, weekdays)
+            
+            mean = baselines['mean'][index]
+            std = baselines['std'][index]
+            eligible = (
+                (baselines['customer_readings'][c] >= MIN_READINGS)
+                & (baselines['readings'][index] >= CELL_MIN_READINGS)
+                & (std > 0)
+            )
+            sigma = np.divide(usage - mean, std, out=np.zeros_like(usage), where=eligible)
+            flagged = np.flatnonzero(eligible & (sigma > threshold_sigma)).tolist()
+            
+            created += store_new_anomalies({
+                'customer_id': [columns[0][i] for i in flagged],
+                'date': [columns[1][i] for i in flagged],
+                'usage': usage[flagged],
+                'mean': mean[flagged],
+                'std': std[flagged],
+                'sigma': sigma[flagged]
+            }, (chunk[0], chunk[-1]), detected_at)
+        
+        if progress:
+            progress(min(start + SCAN_CHUNK_CUSTOMERS, len(ids)), len(ids), created)
+    
+    if customer_ids is None and start_date is None and end_date is None:
+        if watermark is None:
+            watermark = db.session.get(DetectionWatermark, 'seasonal') or DetectionWatermark(method='seasonal')
+            db.session.add(watermark)
+        watermark.scored_through = detected_at
+    
+    return created, detected_at
+
+DETECTION_METHODS = {
+    'seasonal': detect_seasonal_anomalies,
+    'global': detect_fleet_anomalies
+}
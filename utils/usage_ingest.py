@@ -0,0 +1,229 @@
+import csv
+import io
+import json
+import sqlite3
+from datetime import datetime
+from itertools import islice
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from config import Config
+from models import db, Customer, Usage
+from utils.forecast_cache import invalidate_after_commit
+
+def load_customer_ids():
+    """Load every customer id in a single query"""
+    return {row[0] for row in db.session.query(Customer.id)}
+
+def prepare_usage_records(records, customer_ids):
+    """
+    Validate raw usage records against a preloaded customer id set
+    
+    Args:
+        records (iterable): Raw records [{customer_id, date, usage_ccf}, ...]
+        customer_ids (set): Known customer ids
+    
+    Returns:
+        tuple: (rows keyed on (customer_id, date), processed count, errors)
+    """
+    rows = {}
+    processed = 0
+    errors = []
+    
+    for record in records:
+        try:
+            # Validate required fields
+            if not all(k in record for k in ['customer_id', 'date', 'usage_ccf']):
+                errors.append({'record': record, 'error': 'Missing required fields'})
+                continue
+            
+            # Check if customer exists
+            try:
+                customer_id = int(record['customer_id'])
+            except (TypeError, ValueError):
+                customer_id = None
+            if customer_id not in customer_ids:
+                errors.append({'record': record, 'error': 'Customer not found'})
+                continue
+            
+            # Parse date and usage
+            date = datetime.fromisoformat(record['date']).date()
+            usage_ccf = float(record['usage_ccf'])
+            
+            # Later records for the same day overwrite earlier ones
+            rows[(customer_id, date)] = {
+                'customer_id': customer_id,
+                'date': date,
+                'usage_ccf': usage_ccf
+            }
+            processed += 1
+        
+        except Exception as e:
+            errors.append({'record': record, 'error': str(e)})
+    
+    return list(rows.values()), processed, errors
+
+def iter_ndjson_records(stream):
+    """
+    Parse newline-delimited JSON records one line at a time
+    
+    Args:
+        stream (file): Binary or text stream of NDJSON lines
+    
+    Yields:
+        tuple: (line number, record dict or None, parse error or None)
+    """
+    for line_number, line in enumerate(stream, start=1):
+        if isinstance(line, bytes):
+            line = line.decode('utf-8')
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield line_number, None, f'Invalid JSON: {e}'
+            continue
+        if not isinstance(record, dict):
+            yield line_number, None, 'Record must be a JSON object'
+            continue
+        yield line_number, record, None
+
+def iter_csv_records(stream):
+    """
+    Parse CSV records with a header row one line at a time
+    
+    Args:
+        stream (file): Binary or text stream of CSV lines
+    
+    Yields:
+        tuple: (line number, record dict or None, parse error or None)
+    """
+    if not isinstance(stream, io.TextIOBase):
+        stream = io.TextIOWrapper(stream, encoding='utf-8', newline='')
+    reader = csv.DictReader(stream)
+    for record in reader:
+        yield reader.line_num, {k.strip(): v for k, v in record.items() if k}, None
+
+def iter_batches(iterable, batch_size):
+    """Group an iterable into lists of at most batch_size items"""
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
+def _max_rows_per_statement(dialect_name, column_count):
+    """Largest multi-row VALUES list the backend accepts in one statement"""
+    if dialect_name == 'sqlite':
+        max_params = 32766 if sqlite3.sqlite_version_info >= (3, 32, 0) else 999
+        return max(1, min(Config.UPSERT_CHUNK_SIZE, max_params // column_count))
+    return Config.UPSERT_CHUNK_SIZE
+
+def supports_returning():
+    """Whether bulk_upsert can return the rows it wrote (INSERT ... RETURNING)"""
+    dialect = db.session.get_bind().dialect
+    return dialect.name in ('sqlite', 'postgresql') and dialect.insert_returning
+
+def bulk_upsert(table, rows, index_elements, update_columns=None, touch_columns=None, returning=None):
+    """
+    Write rows with a native multi-row upsert
+    
+    Args:
+        table (Table): Target table
+        rows (list): Row dicts sharing the same keys
+        index_elements (list): Columns of the unique constraint used for conflicts
+        update_columns (list): Columns overwritten on conflict, None to keep existing rows
+        touch_columns (list): Columns refreshed only when an update column actually changes
+        returning (list): Columns to return for the rows written, only where supports_returning()
+    
+    Returns:
+        int or list: Number of rows sent to the database, or the written rows when returning is given
+    """
+    if not rows:
+        return [] if returning else 0
+    
+    touch_columns = touch_columns or []
+    dialect_name = db.session.get_bind().dialect.name
+    chunk_size = _max_rows_per_statement(dialect_name, len(rows[0]))
+    written = []
+    
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start:start + chunk_size]
+        
+        if dialect_name in ('sqlite', 'postgresql'):
+            dialect = sqlite if dialect_name == 'sqlite' else postgresql
+            stmt = dialect.insert(table).values(chunk)
+            if update_columns:
+                changed = db.or_(*[table.c[col].is_distinct_from(stmt.excluded[col]) for col in update_columns])
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=index_elements,
+                    set_={col: stmt.excluded[col] for col in update_columns + touch_columns},
+                    where=changed if touch_columns else None
+                )
+            else:
+                stmt = stmt.on_conflict_do_nothing(index_elements=index_elements)
+        elif dialect_name in ('mysql', 'mariadb'):
+            stmt = mysql.insert(table).values(chunk)
+            if update_columns:
+                # MySQL applies assignments left to right, so compare before overwriting
+                unchanged = db.and_(*[table.c[col].is_not_distinct_from(stmt.inserted[col]) for col in update_columns])
+                stmt = stmt.on_duplicate_key_update(
+                    [(col, db.case((unchanged, table.c[col]), else_=stmt.inserted[col])) for col in touch_columns]
+                    + [(col, stmt.inserted[col]) for col in update_columns]
+                )
+            else:
+                stmt = stmt.prefix_with('IGNORE')
+        else:
+            raise NotImplementedError(f'Bulk upsert is not supported on {dialect_name}')
+        
+        if returning:
+            written.extend(db.session.execute(stmt.returning(*[table.c[col] for col in returning])).all())
+        else:
+            db.session.execute(stmt)
+    
+    return written if returning else len(rows)
+
+def upsert_usage(rows, overwrite=True):
+    """
+    Write validated usage rows keyed on the unique_customer_date constraint
+    
+    Running usage statistics, Holt-Winters forecast state and the monthly
+    and daily usage rollups are updated, and new readings scored for
+    anomalies, in the same transaction. Once it commits, cached forecasts
+    for the affected customers are dropped and the usage store is synced.
+    
+    Args:
+        rows (list): Usage rows [{customer_id, date, usage_ccf}, ...]
+        overwrite (bool): Replace usage_ccf on existing days instead of skipping them
+    
+    Returns:
+        int: Number of rows written
+    """
+    from utils.usage_stats import load_previous_usage, update_usage_stats
+    from utils.holt_winters import update_forecast_states
+    from utils.usage_rollups import update_usage_rollups
+    from utils.usage_store import write_after_commit
+    
+    previous = load_previous_usage(rows)
+    update_usage_stats(rows, previous, overwrite=overwrite)
+    update_forecast_states(rows, previous, overwrite=overwrite)
+    invalidate_after_commit(db.session, {row['customer_id'] for row in rows})
+    now = datetime.utcnow()
+    write_after_commit(db.session, rows if overwrite else [
+        row for row in rows if (int(row['customer_id']), row['date']) not in previous
+    ], now)
+    
+    rows = [dict(row, created_at=now, updated_at=now) for row in rows]
+    
+    # updated_at only moves when the reading changes, so resent days don't trigger re-billing
+    written = bulk_upsert(
+        Usage.__table__,
+        rows,
+        index_elements=['customer_id', 'date'],
+        update_columns=['usage_ccf'] if overwrite else None,
+        touch_columns=['updated_at']
+    )
+    
+    # Rollups re-aggregate some groups from usage, so they follow the write
+    update_usage_rollups(rows, previous, overwrite=overwrite)
+    return written
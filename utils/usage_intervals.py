@@ -0,0 +1,339 @@
+from collections import defaultdict
+from datetime import date, datetime
+import numpy as np
+from sqlalchemy import select, func
+from config import Config
+from models import db, Customer, UsageInterval
+from utils.anomaly_detector import detect_continuous_flow
+from utils.forecasting import EPOCH_ORDINAL
+from utils.usage_ingest import bulk_upsert, upsert_usage
+
+VALUE_DTYPE = np.dtype('<f8')  # Same precision as the usage column
+MINUTES_PER_DAY = 24 * 60
+ID_CHUNK_SIZE = 900  # Customer ids per IN (...) query
+TOTAL_DECIMALS = 6  # Daily sums are rounded so float noise doesn't reach usage
+SCAN_CHUNK_CUSTOMERS = 2000  # Customers per continuous flow scan
+INTERVAL_COLUMNS = [UsageInterval.customer_id, UsageInterval.date, UsageInterval.interval_minutes, UsageInterval.readings]
+
+def pack_intervals(values):
+    """Pack a meter-day's interval usage into the stored blob"""
+    return np.asarray(values, dtype=VALUE_DTYPE).tobytes()
+
+def unpack_intervals(blob):
+    """Read-only float64 view of a stored meter-day blob"""
+    return np.frombuffer(blob, dtype=VALUE_DTYPE)
+
+def _unpack_matrix(blobs):
+    """Stack equally sized blobs into one (days, intervals) array"""
+    return np.frombuffer(b''.join(blobs), dtype=VALUE_DTYPE).reshape(len(blobs), -1)
+
+def prepare_interval_records(records, customer_ids):
+    """
+    Validate raw interval records and group them into meter-days
+    
+    A record is either one interval {customer_id, timestamp, usage_ccf},
+    where timestamp is the meter-local start of the interval, or a whole
+    day {customer_id, date, intervals: [...]} with null for missing reads.
+    Either may give interval_minutes (default INTERVAL_MINUTES).
+    
+    Args:
+        records (iterable): Raw interval records
+        customer_ids (set): Known customer ids
+    
+    Returns:
+        tuple: (meter-days [{customer_id, date, interval_minutes, values}, ...], processed count, errors)
+    """
+    days = {}
+    processed = 0
+    errors = []
+    
+    for record in records:
+        try:
+            # Validate required fields
+            has_day = 'date' in record and 'intervals' in record
+            has_interval = 'timestamp' in record and 'usage_ccf' in record
+            if 'customer_id' not in record or not (has_day or has_interval):
+                errors.append({'record': record, 'error': 'Missing required fields'})
+                continue
+            
+            # Check if customer exists
+            try:
+                customer_id = int(record['customer_id'])
+            except (TypeError, ValueError):
+                customer_id = None
+            if customer_id not in customer_ids:
+                errors.append({'record': record, 'error': 'Customer not found'})
+                continue
+            
+            minutes = int(record.get('interval_minutes') or Config.INTERVAL_MINUTES)
+            if minutes <= 0 or MINUTES_PER_DAY % minutes:
+                errors.append({'record': record, 'error': 'interval_minutes must divide a day'})
+                continue
+            slots = MINUTES_PER_DAY // minutes
+            
+            if has_day:
+                day = datetime.fromisoformat(record['date']).date()
+                values = np.array([np.nan if v is None else float(v) for v in record['intervals']], dtype=float)
+                if len(values) != slots:
+                    errors.append({'record': record, 'error': f'Expected {slots} intervals of {minutes} minutes'})
+                    continue
+            else:
+                start = datetime.fromisoformat(record['timestamp'])
+                offset = start.hour * 60 + start.minute
+                if offset % minutes or start.second or start.microsecond:
+                    errors.append({'record': record, 'error': f'timestamp must start a {minutes} minute interval'})
+                    continue
+                day = start.date()
+                values = np.full(slots, np.nan)
+                values[offset // minutes] = float(record['usage_ccf'])
+            
+            # Later reads for the same interval overwrite earlier ones
+            key = (customer_id, day)
+            meter_day = days.get(key)
+            if meter_day is None or meter_day['interval_minutes'] != minutes:
+                days[key] = {
+                    'customer_id': customer_id,
+                    'date': day,
+                    'interval_minutes': minutes,
+                    'values': values
+                }
+            else:
+                present = ~np.isnan(values)
+                meter_day['values'][present] = values[present]
+            processed += 1
+        
+        except Exception as e:
+            errors.append({'record': record, 'error': str(e)})
+    
+    return list(days.values()), processed, errors
+
+def load_stored_intervals(keys):
+    """
+    Fetch stored intervals for (customer_id, date) keys
+    
+    Returns:
+        dict: (customer_id, date) -> (interval_minutes, values) for keys that already exist
+    """
+    if not keys:
+        return {}
+    
+    customer_ids = sorted({customer_id for customer_id, _ in keys})
+    first = min(day for _, day in keys)
+    last = max(day for _, day in keys)
+    
+    stored = {}
+    for start in range(0, len(customer_ids), ID_CHUNK_SIZE):
+        chunk = customer_ids[start:start + ID_CHUNK_SIZE]
+        for customer_id, day, minutes, blob in db.session.execute(
+            select(*INTERVAL_COLUMNS).where(
+                UsageInterval.customer_id.in_(chunk),
+                UsageInterval.date.between(first, last)
+            )
+        ):
+            if (customer_id, day) in keys:
+                stored[(customer_id, day)] = (minutes, unpack_intervals(blob))
+    return stored
+
+def upsert_intervals(days, overwrite=True):
+    """
+    Merge meter-day intervals into usage_intervals and roll them up into usage
+    
+    Intervals missing from an incoming day keep their stored values, so a
+    day can arrive over several deliveries. Each day's interval sum is
+    then written as its daily reading through upsert_usage, replacing any
+    daily reading already there, so statistics, rollups, forecast state
+    and the usage store follow interval data like any other usage. The
+    caller commits.
+    
+    Args:
+        days (list): Meter-days from prepare_interval_records
+        overwrite (bool): Replace stored intervals that arrive again instead of keeping them
+    
+    Returns:
+        int: Number of meter-days written
+    """
+    stored = load_stored_intervals({(day['customer_id'], day['date']) for day in days})
+    now = datetime.utcnow()
+    rows = []
+    
+    for day in days:
+        values = day['values']
+        previous = stored.get((day['customer_id'], day['date']))
+        if previous is not None:
+            minutes, old_values = previous
+            if minutes != day['interval_minutes']:
+                if not overwrite:
+                    continue
+            else:
+                merged = old_values.copy()
+                incoming = ~np.isnan(values) if overwrite else ~np.isnan(values) & np.isnan(merged)
+                merged[incoming] = values[incoming]
+                values = merged
+        if np.isnan(values).all():
+            continue
+        
+        rows.append({
+            'customer_id': day['customer_id'],
+            'date': day['date'],
+            'interval_minutes': day['interval_minutes'],
+            'readings': pack_intervals(values),
+            'usage_ccf': round(float(np.nansum(values)), TOTAL_DECIMALS),
+            'updated_at': now
+        })
+    if not rows:
+        return 0
+    
+    written = bulk_upsert(
+        UsageInterval.__table__,
+        rows,
+        index_elements=['customer_id', 'date'],
+        update_columns=['interval_minutes', 'readings', 'usage_ccf', 'updated_at']
+    )
+    upsert_usage([{
+        'customer_id': row['customer_id'],
+        'date': row['date'],
+        'usage_ccf': row['usage_ccf']
+    } for row in rows])
+    return written
+
+def _hourly(rows):
+    """
+    Usage per hour of day for interval rows, NaN for hours with a missing interval
+    
+    Meters with different interval lengths are stacked group by group, so
+    each group is reshaped without a Python loop over days. Intervals that
+    don't divide an hour (coarser than hourly, or 9, 45 minutes...) leave
+    the hours NaN.
+    """
+    hourly = np.full((len(rows), 24), np.nan)
+    groups = defaultdict(list)
+    for i, row in enumerate(rows):
+        groups[row[2]].append(i)
+    for minutes, index in groups.items():
+        if 60 % minutes:
+            continue  # Interval boundaries don't line up with hours
+        hourly[index] = _unpack_matrix([rows[i][3] for i in index]).reshape(len(index), 24, -1).sum(axis=2)
+    return hourly
+
+def _night_flow(rows, hours=None):
+    """
+    Lowest flow rate in the overnight window per meter-day, in CCF per hour
+    
+    Rates rather than interval usage, so meters with different interval
+    lengths compare against one threshold. Only intervals lying wholly
+    inside the window count; NaN when any of them is missing, or for
+    meters too coarse to have one.
+    """
+    first_hour, last_hour = hours or Config.CONTINUOUS_FLOW_HOURS
+    night_flow = np.full(len(rows), np.nan)
+    groups = defaultdict(list)
+    for i, row in enumerate(rows):
+        groups[row[2]].append(i)
+    
+    for minutes, index in groups.items():
+        first_slot = -(-first_hour * 60 // minutes)
+        last_slot = last_hour * 60 // minutes
+        if first_slot >= last_slot:
+            continue  # No whole interval inside the window
+        window = _unpack_matrix([rows[i][3] for i in index])[:, first_slot:last_slot]
+        complete = ~np.isnan(window).any(axis=1)
+        night_flow[np.asarray(index)[complete]] = window[complete].min(axis=1) * 60 / minutes
+    return night_flow
+
+def _flow_runs(rows):
+    """Continuous flow runs for interval rows ordered by customer and date"""
+    if not rows:
+        return []
+    runs = detect_continuous_flow(
+        np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows)),
+        np.fromiter((row[1].toordinal() - EPOCH_ORDINAL for row in rows), dtype=np.int64, count=len(rows)),
+        _night_flow(rows)
+    )
+    return [{
+        'customer_id': customer_id,
+        'first_night': date.fromordinal(first_day + EPOCH_ORDINAL).isoformat(),
+        'last_night': date.fromordinal(last_day + EPOCH_ORDINAL).isoformat(),
+        'nights': nights,
+        'min_flow_ccf_per_hour': round(min_flow, 4),
+        'estimated_leak_ccf_per_day': round(min_flow * 24, 2)
+    } for customer_id, first_day, last_day, nights, min_flow in zip(
+        runs['customer_id'].tolist(), runs['first_day'].tolist(), runs['last_day'].tolist(),
+        runs['nights'].tolist(), runs['min_flow'].tolist()
+    )]
+
+def find_continuous_flow(start_date, end_date, customer_ids=None):
+    """
+    Meters whose interval data shows flow through the night for consecutive nights
+    
+    Interval blobs are scanned in customer id chunks and each chunk's
+    overnight windows are reduced as one array.
+    
+    Args:
+        start_date (date): First night to include
+        end_date (date): Last night to include
+        customer_ids (list): Restrict to these customers, None for all
+    
+    Returns:
+        list: Runs [{customer_id, first_night, last_night, nights, min_flow_ccf_per_hour, estimated_leak_ccf_per_day}, ...]
+    """
+    if customer_ids is None:
+        ids = [row[0] for row in db.session.query(Customer.id).order_by(Customer.id)]
+    else:
+        ids = sorted(customer_ids)
+    
+    runs = []
+    for start in range(0, len(ids), SCAN_CHUNK_CUSTOMERS):
+        chunk = ids[start:start + SCAN_CHUNK_CUSTOMERS]
+        conditions = [
+            UsageInterval.customer_id.between(chunk[0], chunk[-1]),
+            UsageInterval.date.between(start_date, end_date)
+        ]
+        if customer_ids is not None:
+            conditions.append(UsageInterval.customer_id.in_(chunk))
+        rows = db.session.execute(
+            select(*INTERVAL_COLUMNS).where(*conditions).order_by(UsageInterval.customer_id, UsageInterval.date)
+        ).all()
+        runs.extend(_flow_runs(rows))
+    return runs
+
+def interval_profile(customer_id, days=None):
+    """
+    Average hourly load profile and continuous flow over a customer's recent interval data
+    
+    Args:
+        customer_id (int): Customer ID
+        days (int): Trailing days of interval data (default INTERVAL_PROFILE_DAYS)
+    
+    Returns:
+        dict: {start_date, end_date, days, hourly_usage [24], peak_hour, min_night_flow_ccf_per_hour,
+            continuous_flow}, or None without interval data
+    """
+    days = days or Config.INTERVAL_PROFILE_DAYS
+    latest = db.session.query(func.max(UsageInterval.date)).filter(UsageInterval.customer_id == customer_id).scalar()
+    if latest is None:
+        return None
+    
+    first = date.fromordinal(latest.toordinal() - days + 1)
+    rows = db.session.execute(
+        select(*INTERVAL_COLUMNS).where(
+            UsageInterval.customer_id == customer_id,
+            UsageInterval.date.between(first, latest)
+        ).order_by(UsageInterval.date)
+    ).all()
+    
+    # Average each hour over the days where it is complete
+    hourly = _hourly(rows)
+    complete = ~np.isnan(hourly)
+    counts = complete.sum(axis=0)
+    averages = np.where(counts > 0, np.where(complete, hourly, 0).sum(axis=0) / np.maximum(counts, 1), np.nan)
+    night_flow = _night_flow(rows)
+    
+    return {
+        'start_date': rows[0][1].isoformat(),
+        'end_date': latest.isoformat(),
+        'days': len(rows),
+        'hourly_usage': [None if np.isnan(value) else round(value, 4) for value in averages.tolist()],
+        'peak_hour': int(np.nanargmax(averages)) if counts.any() else None,
+        'min_night_flow_ccf_per_hour': round(float(np.nanmin(night_flow)), 4) if (~np.isnan(night_flow)).any() else None,
+        'continuous_flow': _flow_runs(rows)
+    }
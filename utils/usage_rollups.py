@@ -0,0 +1,260 @@
+from calendar import monthrange
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from sqlalchemy import select, func, union_all
+from models import db, Customer, Usage, UsageMonthly, UsageDaily
+from utils.usage_stats import ID_CHUNK_SIZE
+
+ROLLUP_COLUMNS = ['readings', 'total', 'sum_squares', 'min_usage', 'max_usage', 'updated_at']
+
+class Rollup:
+    """
+    Count, sum, sum of squares, min and max of a group of readings
+    
+    The first three are additive, so adding or correcting a reading is
+    O(1). Min and max can't be restored when the reading holding them is
+    corrected away from them; replace reports that so the group can be
+    re-aggregated from usage.
+    """
+    
+    def __init__(self, readings=0, total=0.0, sum_squares=0.0, min_usage=None, max_usage=None):
+        self.readings = readings
+        self.total = total
+        self.sum_squares = sum_squares
+        self.min_usage = min_usage
+        self.max_usage = max_usage
+    
+    def add(self, value):
+        self.readings += 1
+        self.total += value
+        self.sum_squares += value * value
+        self.min_usage = value if self.min_usage is None else min(self.min_usage, value)
+        self.max_usage = value if self.max_usage is None else max(self.max_usage, value)
+    
+    def replace(self, old_value, new_value):
+        """
+        Swap a corrected reading for its old value
+        
+        Returns:
+            bool: False when min or max may now be wrong and the group must be re-aggregated
+        """
+        if not self.readings:
+            return False  # Rollup missing for an existing reading
+        self.total += new_value - old_value
+        self.sum_squares += new_value * new_value - old_value * old_value
+        if (old_value == self.min_usage and new_value > old_value) or (old_value == self.max_usage and new_value < old_value):
+            return False
+        self.min_usage = min(self.min_usage, new_value)
+        self.max_usage = max(self.max_usage, new_value)
+        return True
+
+def _month_index(year, month):
+    return year * 12 + month - 1
+
+def _aggregates():
+    return [
+        func.count(Usage.id),
+        func.sum(Usage.usage_ccf),
+        func.sum(Usage.usage_ccf * Usage.usage_ccf),
+        func.min(Usage.usage_ccf),
+        func.max(Usage.usage_ccf)
+    ]
+
+def _monthly_rows(*conditions):
+    """Aggregate usage per customer-month, portable through EXTRACT"""
+    year = func.extract('year', Usage.date)
+    month = func.extract('month', Usage.date)
+    rows = db.session.execute(
+        select(Usage.customer_id, year, month, *_aggregates()).where(*conditions).group_by(Usage.customer_id, year, month)
+    )
+    return {(customer_id, int(y), int(m)): Rollup(*values) for customer_id, y, m, *values in rows}
+
+def _daily_rows(*conditions):
+    rows = db.session.execute(select(Usage.date, *_aggregates()).where(*conditions).group_by(Usage.date))
+    return {day: Rollup(*values) for day, *values in rows}
+
+def _load_monthly(keys):
+    rollups = {}
+    customer_ids = sorted({customer_id for customer_id, _, _ in keys})
+    first = min(_month_index(year, month) for _, year, month in keys)
+    last = max(_month_index(year, month) for _, year, month in keys)
+    
+    for start in range(0, len(customer_ids), ID_CHUNK_SIZE):
+        chunk = customer_ids[start:start + ID_CHUNK_SIZE]
+        for row in UsageMonthly.query.filter(
+            UsageMonthly.customer_id.in_(chunk),
+            (UsageMonthly.year * 12 + UsageMonthly.month - 1).between(first, last)
+        ):
+            key = (row.customer_id, row.year, row.month)
+            if key in keys:
+                rollups[key] = Rollup(row.readings, row.total, row.sum_squares, row.min_usage, row.max_usage)
+    return rollups
+
+def _load_daily(days):
+    rollups = {}
+    days = sorted(days)
+    for start in range(0, len(days), ID_CHUNK_SIZE):
+        for row in UsageDaily.query.filter(UsageDaily.date.in_(days[start:start + ID_CHUNK_SIZE])):
+            rollups[row.date] = Rollup(row.readings, row.total, row.sum_squares, row.min_usage, row.max_usage)
+    return rollups
+
+def _save(table, key_columns, rollups):
+    from utils.usage_ingest import bulk_upsert
+    
+    now = datetime.utcnow()
+    bulk_upsert(table, [{
+        **dict(zip(key_columns, key if isinstance(key, tuple) else (key,))),
+        'readings': r.readings,
+        'total': r.total,
+        'sum_squares': r.sum_squares,
+        'min_usage': r.min_usage,
+        'max_usage': r.max_usage,
+        'updated_at': now
+    } for key, r in rollups.items()], index_elements=key_columns, update_columns=ROLLUP_COLUMNS)
+
+def _aggregate_months(keys):
+    """Re-aggregate customer-months from the usage table"""
+    by_month = defaultdict(list)
+    for customer_id, year, month in keys:
+        by_month[(year, month)].append(customer_id)
+    
+    rollups = {}
+    for (year, month), customer_ids in by_month.items():
+        first = date(year, month, 1)
+        last = date(year, month, monthrange(year, month)[1])
+        for start in range(0, len(customer_ids), ID_CHUNK_SIZE):
+            chunk = customer_ids[start:start + ID_CHUNK_SIZE]
+            rollups.update(_monthly_rows(Usage.customer_id.in_(chunk), Usage.date.between(first, last)))
+    return rollups
+
+def _aggregate_days(days):
+    rollups = {}
+    days = sorted(days)
+    for start in range(0, len(days), ID_CHUNK_SIZE):
+        rollups.update(_daily_rows(Usage.date.in_(days[start:start + ID_CHUNK_SIZE])))
+    return rollups
+
+def update_usage_rollups(rows, previous, overwrite=True):
+    """
+    Fold written readings into the monthly and fleet daily rollups
+    
+    New readings and corrections are applied as deltas; only groups whose
+    min or max was corrected away are re-aggregated, so call this after
+    the usage rows are written. The caller commits.
+    
+    Args:
+        rows (list): Usage rows [{customer_id, date, usage_ccf}, ...]
+        previous (dict): Stored usage per key from load_previous_usage, before the write
+        overwrite (bool): Whether existing readings were replaced
+    
+    Returns:
+        int: Number of readings folded in
+    """
+    previous = dict(previous)
+    changes = []
+    for row in rows:
+        key = (int(row['customer_id']), row['date'])
+        usage = float(row['usage_ccf'])
+        old = previous.get(key)
+        # Repeated keys in one batch behave like the stored row they will hit
+        if old is None or overwrite:
+            previous[key] = usage
+        if old is None or (overwrite and old != usage):
+            changes.append((key[0], key[1], old, usage))
+    
+    if not changes:
+        return 0
+    
+    monthly = _load_monthly({(customer_id, day.year, day.month) for customer_id, day, _, _ in changes})
+    daily = _load_daily({day for _, day, _, _ in changes})
+    stale_months = set()
+    stale_days = set()
+    
+    for customer_id, day, old, usage in changes:
+        for rollups, key, stale in (
+            (monthly, (customer_id, day.year, day.month), stale_months),
+            (daily, day, stale_days)
+        ):
+            rollup = rollups.setdefault(key, Rollup())
+            if old is None:
+                rollup.add(usage)
+            elif not rollup.replace(old, usage):
+                stale.add(key)
+    
+    monthly.update(_aggregate_months(stale_months))
+    daily.update(_aggregate_days(stale_days))
+    _save(UsageMonthly.__table__, ['customer_id', 'year', 'month'], monthly)
+    _save(UsageDaily.__table__, ['date'], daily)
+    return len(changes)
+
+def rebuild_usage_rollups(chunk_customers=2000, progress=None):
+    """
+    Recreate the monthly and fleet daily rollups from stored usage
+    
+    Monthly rollups are aggregated in customer id chunks; the fleet daily
+    rollup is one grouped scan. The caller commits.
+    
+    Args:
+        chunk_customers (int): Customers per grouped query
+        progress (callable): Called with (customers_done, customers_total) after each chunk
+    
+    Returns:
+        int: Number of customer-month rollups written
+    """
+    ids = [row[0] for row in db.session.query(Customer.id).order_by(Customer.id)]
+    UsageMonthly.query.delete()
+    UsageDaily.query.delete()
+    rebuilt = 0
+    
+    for start in range(0, len(ids), chunk_customers):
+        chunk = ids[start:start + chunk_customers]
+        monthly = _monthly_rows(Usage.customer_id.between(chunk[0], chunk[-1]))
+        _save(UsageMonthly.__table__, ['customer_id', 'year', 'month'], monthly)
+        rebuilt += len(monthly)
+        if progress:
+            progress(min(start + chunk_customers, len(ids)), len(ids))
+    
+    _save(UsageDaily.__table__, ['date'], _daily_rows())
+    return rebuilt
+
+def monthly_usage(start_date, end_date):
+    """
+    Per customer-month usage between two dates as a subquery
+    
+    Whole calendar months are read from usage_monthly; only the partial
+    months at either end are summed from usage, so the cost doesn't grow
+    with the number of daily readings in the range. Each customer-month
+    appears once.
+    
+    Args:
+        start_date (date): First day to include
+        end_date (date): Last day to include
+    
+    Returns:
+        Subquery: Columns customer_id, year, month, usage_ccf, readings
+    """
+    first_whole = start_date if start_date.day == 1 else (start_date.replace(day=1) + timedelta(days=32)).replace(day=1)
+    last_whole = end_date if end_date.day == monthrange(end_date.year, end_date.month)[1] else end_date.replace(day=1) - timedelta(days=1)
+    
+    def raw(first, last):
+        year = func.extract('year', Usage.date)
+        month = func.extract('month', Usage.date)
+        return select(
+            Usage.customer_id, year.label('year'), month.label('month'),
+            func.sum(Usage.usage_ccf).label('usage_ccf'), func.count(Usage.id).label('readings')
+        ).where(Usage.date.between(first, last)).group_by(Usage.customer_id, year, month)
+    
+    if first_whole > last_whole:
+        return raw(start_date, end_date).subquery()
+    
+    parts = [select(
+        UsageMonthly.customer_id, UsageMonthly.year, UsageMonthly.month,
+        UsageMonthly.total.label('usage_ccf'), UsageMonthly.readings
+    ).where((UsageMonthly.year * 12 + UsageMonthly.month - 1).between(
+        _month_index(first_whole.year, first_whole.month), _month_index(last_whole.year, last_whole.month)
+    ))]
+    if start_date < first_whole:
+        parts.append(raw(start_date, first_whole - timedelta(days=1)))
+    if last_whole < end_date:
+        parts.append(raw(last_whole + timedelta(days=1), end_date))
+    return union_all(*parts).subquery() if len(parts) > 1 else parts[0].subquery()
@@ -0,0 +1,52 @@
+from datetime import timedelta
+from sqlalchemy import select, func
+from models import db, Usage
+from utils.forecasting import UsageSeries
+from utils.usage_store import load_store_series
+
+def load_usage_series(customer_id, last_readings=None, days=None, with_total=False):
+    """
+    Load one customer's usage as a UsageSeries, bounded in SQL
+    
+    With a usage store the series is a view on the customer's mapped
+    array whenever the file matches the database. Otherwise only the date
+    and usage_ccf columns are selected (no ORM objects) and the window is
+    applied through the (customer_id, date) index, so the cost follows
+    the window rather than the length of the history.
+    
+    Args:
+        customer_id (int): Customer id
+        last_readings (int): Only the most recent N readings
+        days (int): Only the trailing N days ending at the latest reading
+        with_total (bool): Also count all readings (index-only) into series.total (always set from the store)
+    
+    Returns:
+        UsageSeries: Readings in date order
+    """
+    series = load_store_series(customer_id, last_readings=last_readings, days=days)
+    if series is not None:
+        return series
+    
+    query = select(Usage.date, Usage.usage_ccf).where(Usage.customer_id == customer_id)
+    
+    if days is not None:
+        latest = db.session.execute(
+            select(func.max(Usage.date)).where(Usage.customer_id == customer_id)
+        ).scalar()
+        if latest is not None:
+            query = query.where(Usage.date > latest - timedelta(days=days))
+    
+    if last_readings is not None:
+        rows = db.session.execute(query.order_by(Usage.date.desc()).limit(last_readings)).all()
+        rows.reverse()
+    else:
+        rows = db.session.execute(query.order_by(Usage.date)).all()
+    
+    total = None
+    if with_total:
+        total = db.session.execute(
+            select(func.count()).select_from(Usage).where(Usage.customer_id == customer_id)
+        ).scalar()
+    
+    dates, usage = zip(*rows) if rows else ([], [])
+    return UsageSeries(dates, usage, total=total)
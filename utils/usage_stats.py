@@ -0,0 +1,249 @@
+import math
+from datetime import datetime
+import numpy as np
+from sqlalchemy import select
+from config import Config
+from models import db, Usage, UsageStats, Anomaly
+
+ID_CHUNK_SIZE = 900  # Customer ids per IN (...) query
+MIN_READINGS = 30  # Same minimum history as detect_anomalies
+
+def decay_factor(window=None):
+    """Weight older readings keep per new reading: 1 for all history, 1 - 1/window otherwise"""
+    window = Config.ANOMALY_STATS_WINDOW if window is None else window
+    return 1.0 - 1.0 / window if window else 1.0
+
+class RunningStats:
+    """
+    Welford running mean and variance with optional exponential forgetting
+    
+    With decay < 1 every earlier reading's weight is multiplied by decay
+    when a new one arrives, so the statistics track roughly the last
+    1 / (1 - decay) readings.
+    """
+    
+    def __init__(self, readings=0, weight=0.0, mean=0.0, m2=0.0, last_date=None):
+        self.readings = readings
+        self.weight = weight
+        self.mean = mean
+        self.m2 = m2
+        self.last_date = last_date
+    
+    @property
+    def std(self):
+        return math.sqrt(max(self.m2, 0.0) / self.weight) if self.weight else 0.0
+    
+    def add(self, value, decay=1.0):
+        self.readings += 1
+        self.weight = self.weight * decay + 1.0
+        delta = value - self.mean
+        self.mean += delta / self.weight
+        self.m2 = self.m2 * decay + delta * (value - self.mean)
+    
+    def remove(self, value):
+        """Undo an earlier add (exact only without decay)"""
+        if self.readings <= 1:
+            self.readings, self.weight, self.mean, self.m2 = 0, 0.0, 0.0, 0.0
+            return
+        self.readings -= 1
+        self.weight -= 1.0
+        delta = value - self.mean
+        self.mean -= delta / self.weight
+        self.m2 -= delta * (value - self.mean)
+    
+    def replace(self, old_value, new_value, decay=1.0):
+        """
+        Swap a corrected reading for its old value
+        
+        Exact without decay; with decay the old value's weight is unknown, so
+        the new value is folded in as the most recent reading instead.
+        """
+        if decay == 1.0:
+            self.remove(old_value)
+            self.add(new_value)
+        else:
+            self.add(new_value, decay)
+            self.readings -= 1
+    
+    def sigma(self, value):
+        """Standard deviations above the mean, None without enough history"""
+        std = self.std
+        if self.readings < MIN_READINGS or std == 0:
+            return None
+        return (value - self.mean) / std
+
+def load_previous_usage(rows):
+    """
+    Fetch the stored usage for the (customer_id, date) keys of incoming rows
+    
+    Returns:
+        dict: (customer_id, date) -> usage_ccf for keys that already exist
+    """
+    if not rows:
+        return {}
+    
+    keys = {(int(row['customer_id']), row['date']) for row in rows}
+    customer_ids = sorted({customer_id for customer_id, _ in keys})
+    first = min(date for _, date in keys)
+    last = max(date for _, date in keys)
+    
+    previous = {}
+    for start in range(0, len(customer_ids), ID_CHUNK_SIZE):
+        chunk = customer_ids[start:start + ID_CHUNK_SIZE]
+        for customer_id, date, usage_ccf in db.session.execute(
+            select(Usage.customer_id, Usage.date, Usage.usage_ccf).where(
+                Usage.customer_id.in_(chunk),
+                Usage.date >= first,
+                Usage.date <= last
+            )
+        ):
+            if (customer_id, date) in keys:
+                previous[(customer_id, date)] = usage_ccf
+    return previous
+
+def _load_stats(customer_ids):
+    stats = {}
+    for start in range(0, len(customer_ids), ID_CHUNK_SIZE):
+        chunk = customer_ids[start:start + ID_CHUNK_SIZE]
+        for row in UsageStats.query.filter(UsageStats.customer_id.in_(chunk)):
+            stats[row.customer_id] = RunningStats(row.readings, row.weight, row.mean, row.m2, row.last_date)
+    return stats
+
+def _save_stats(stats):
+    from utils.usage_ingest import bulk_upsert
+    
+    now = datetime.utcnow()
+    bulk_upsert(UsageStats.__table__, [{
+        'customer_id': customer_id,
+        'readings': s.readings,
+        'weight': s.weight,
+        'mean': s.mean,
+        'm2': s.m2,
+        'last_date': s.last_date,
+        'updated_at': now
+    } for customer_id, s in stats.items()], index_elements=['customer_id'],
+        update_columns=['readings', 'weight', 'mean', 'm2', 'last_date', 'updated_at'])
+
+def update_usage_stats(rows, previous, overwrite=True, threshold_sigma=None):
+    """
+    Fold incoming readings into each customer's running statistics
+    
+    New readings are scored against the statistics before they are added,
+    so each costs O(1) regardless of history length, and readings above
+    threshold_sigma are written to anomalies. Corrected readings replace
+    the old value (exactly without a window, approximately with one) and
+    are not scored. The caller commits.
+    
+    Args:
+        rows (list): Usage rows [{customer_id, date, usage_ccf}, ...]
+        previous (dict): Stored usage per key from load_previous_usage
+        overwrite (bool): Whether existing readings were replaced
+        threshold_sigma (float): Defaults to Config.ANOMALY_THRESHOLD_SIGMA
+    
+    Returns:
+        int: Number of anomalies created
+    """
+    if not rows:
+        return 0
+    if threshold_sigma is None:
+        threshold_sigma = Config.ANOMALY_THRESHOLD_SIGMA
+    
+    decay = decay_factor()
+    previous = dict(previous)
+    stats = _load_stats(sorted({int(row['customer_id']) for row in rows}))
+    detected_at = datetime.utcnow()
+    anomalies = []
+    
+    for row in sorted(rows, key=lambda r: (int(r['customer_id']), r['date'])):
+        customer_id = int(row['customer_id'])
+        usage = float(row['usage_ccf'])
+        key = (customer_id, row['date'])
+        old = previous.get(key)
+        # Repeated keys in one batch behave like the stored row they will hit
+        if old is None or overwrite:
+            previous[key] = usage
+        running = stats.setdefault(customer_id, RunningStats())
+        
+        if old is None:
+            sigma = running.sigma(usage)
+            if sigma is not None and sigma > threshold_sigma:
+                anomalies.append({
+                    'customer_id': customer_id,
+                    'date': row['date'],
+                    'usage_ccf': usage,
+                    'average_usage': round(running.mean, 2),
+                    'std_deviation': round(running.std, 2),
+                    'sigma_value': round(sigma, 2),
+                    'detected_at': detected_at,
+                    'reviewed': False
+                })
+            running.add(usage, decay)
+        elif overwrite and old != usage:
+            running.replace(old, usage, decay)
+        else:
+            continue
+        
+        if running.last_date is None or row['date'] > running.last_date:
+            running.last_date = row['date']
+    
+    _save_stats(stats)
+    if anomalies:
+        db.session.execute(Anomaly.__table__.insert(), anomalies)
+    return len(anomalies)
+
+def rebuild_usage_stats(chunk_customers=2000, progress=None):
+    """
+    Recompute every customer's running statistics from stored usage
+    
+    Each chunk of customers is read as ordered columns and reduced with
+    bincount, weighting each reading by decay ** (readings after it) so
+    the result equals feeding the history through RunningStats.add.
+    The caller commits.
+    
+    Args:
+        chunk_customers (int): Customers per columnar scan
+        progress (callable): Called with (customers_done, customers_total) after each chunk
+    
+    Returns:
+        int: Number of customers with statistics
+    """
+    from models import Customer
+    
+    decay = decay_factor()
+    ids = [row[0] for row in db.session.query(Customer.id).order_by(Customer.id)]
+    UsageStats.query.delete()
+    rebuilt = 0
+    
+    for start in range(0, len(ids), chunk_customers):
+        chunk = ids[start:start + chunk_customers]
+        rows = db.session.execute(
+            select(Usage.customer_id, Usage.date, Usage.usage_ccf).where(
+                Usage.customer_id.between(chunk[0], chunk[-1])
+            ).order_by(Usage.customer_id, Usage.date)
+        ).all()
+        
+        if rows:
+            columns = list(zip(*rows))
+            customers, group = np.unique(np.array(columns[0], dtype=np.int64), return_inverse=True)
+            usage = np.array(columns[2], dtype=float)
+            
+            counts = np.bincount(group)
+            ends = np.cumsum(counts)
+            after = ends[group] - 1 - np.arange(len(usage))
+            weights = decay ** after
+            
+            total = np.bincount(group, weights=weights)
+            means = np.bincount(group, weights=weights * usage) / total
+            m2 = np.bincount(group, weights=weights * (usage - means[group]) ** 2)
+            last_dates = [columns[1][end - 1] for end in ends]
+            
+            _save_stats({
+                int(customer_id): RunningStats(int(n), float(w), float(mean), float(sq), last_date)
+                for customer_id, n, w, mean, sq, last_date in zip(customers, counts, total, means, m2, last_dates)
+            })
+            rebuilt += len(customers)
+        
+        if progress:
+            progress(min(start + chunk_customers, len(ids)), len(ids))
+    
+    return rebuilt
@@ -0,0 +1,375 @@
+import os
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+import numpy as np
+from flask import current_app
+from sqlalchemy import event, select, func
+from sqlalchemy.orm import Session
+from models import db, Customer, Usage
+from utils.forecasting import EPOCH_ORDINAL, UsageSeries, to_datetime64
+
+try:
+    import fcntl
+except ImportError:  # Windows: writers are only serialised within a process
+    fcntl = None
+
+PENDING_KEY = 'usage_store_writes'
+HEADER = np.dtype([('magic', '<u4'), ('first_day', '<i4'), ('changed_at', '<i8')])
+MAGIC = 0x32555348  # b'HSU2'
+CHANGED_AT_OFFSET = HEADER.fields['changed_at'][1]
+UNIX_EPOCH = datetime(1970, 1, 1)
+VALUE_DTYPE = np.dtype('<f8')  # Same precision as the usage column, so reads match the database exactly
+FILES_PER_DIRECTORY = 1000
+ID_CHUNK_SIZE = 900  # Customer ids per IN (...) query
+
+class UsageStore:
+    """
+    Daily usage history as one memory-mapped float64 array per customer
+    
+    Each file is a 16-byte header holding the epoch day of slot 0 and the
+    newest usage.updated_at the file reflects, then one float64 per day
+    with NaN where there is no reading. Readers map files read-only, so
+    every process on the host shares one copy through the page cache. The
+    store mirrors the usage table; readers check a customer's reading
+    count, last date and newest updated_at against the database before
+    trusting its file, so a rewritten past day that never reached the
+    file is caught too.
+    """
+    
+    def __init__(self, root):
+        self.root = root
+        self._lock = threading.Lock()
+    
+    def path(self, customer_id):
+        return os.path.join(self.root, str(customer_id // FILES_PER_DIRECTORY), f'{customer_id}.f64')
+    
+    def open(self, customer_id):
+        """
+        Map a customer's file read-only
+        
+        Returns:
+            tuple: (epoch day of slot 0, float64 array view, changed_at), or None without a file
+        """
+        path = self.path(customer_id)
+        try:
+            size = os.path.getsize(path) - HEADER.itemsize
+            header = np.fromfile(path, dtype=HEADER, count=1)
+        except FileNotFoundError:
+            return None
+        if len(header) != 1 or header['magic'][0] != MAGIC:
+            return None
+        
+        first_day = int(header['first_day'][0])
+        changed_at = int(header['changed_at'][0])
+        slots = size // VALUE_DTYPE.itemsize
+        if slots <= 0:
+            return first_day, np.empty(0, dtype=VALUE_DTYPE), changed_at
+        values = np.memmap(path, dtype=VALUE_DTYPE, mode='r', offset=HEADER.itemsize, shape=(slots,))
+        return first_day, values, changed_at
+    
+    def readings(self, customer_id):
+        """
+        Stored readings of one customer
+        
+        Returns:
+            tuple: (epoch days int64 array, float64 values, changed_at), values a view where the history
+            has no gaps; None without a file
+        """
+        opened = self.open(customer_id)
+        if opened is None:
+            return None
+        first_day, values, changed_at = opened
+        present = np.flatnonzero(~np.isnan(values))
+        if len(present) and present[-1] - present[0] + 1 == len(present):
+            return first_day + present, values[present[0]:present[-1] + 1], changed_at
+        return first_day + present, values[present], changed_at
+    
+    def series(self, customer_id, last_readings=None, days=None):
+        """
+        UsageSeries for a customer from the store, windowed like load_usage_series
+        
+        Returns:
+            tuple: (UsageSeries with total set to all stored readings, changed_at), or None without a file
+        """
+        readings = self.readings(customer_id)
+        if readings is None:
+            return None
+        epoch_days, values, changed_at = readings
+        total = len(epoch_days)
+        
+        start = 0
+        if days is not None and total:
+            start = int(np.searchsorted(epoch_days, epoch_days[-1] - days, side='right'))
+        if last_readings is not None:
+            start = max(start, total - last_readings)
+        return UsageSeries(epoch_days[start:].astype('datetime64[D]'), values[start:], total=total), changed_at
+    
+    def write(self, rows):
+        """
+        Write readings into the customers' files, extending or re-basing them as needed
+        
+        A customer whose file can't be written has it removed, so readers
+        fall back to the database until rebuild_usage_store recreates it.
+        
+        Args:
+            rows (list): Usage rows [{customer_id, date, usage_ccf, updated_at}, ...]
+        """
+        by_customer = defaultdict(dict)
+        changed_at = defaultdict(int)
+        for row in rows:
+            customer_id = int(row['customer_id'])
+            by_customer[customer_id][row['date'].toordinal()] = float(row['usage_ccf'])
+            changed_at[customer_id] = max(changed_at[customer_id], to_micros(row['updated_at']))
+        
+        for customer_id, readings in sorted(by_customer.items()):
+            epoch_days = np.fromiter(readings.keys(), dtype=np.int64, count=len(readings)) - EPOCH_ORDINAL
+            values = np.fromiter(readings.values(), dtype=VALUE_DTYPE, count=len(readings))
+            with self._locked(customer_id):
+                try:
+                    self._write_customer(customer_id, epoch_days, values, changed_at[customer_id])
+                except (OSError, ValueError):
+                    self.discard(customer_id)
+    
+    def replace(self, customer_id, epoch_days, values, changed_at):
+        """Replace a customer's whole history (epoch days sorted ascending, changed_at in microseconds)"""
+        with self._locked(customer_id):
+            array = np.full(int(epoch_days[-1] - epoch_days[0]) + 1, np.nan, dtype=VALUE_DTYPE)
+            array[epoch_days - epoch_days[0]] = values
+            self._save(customer_id, int(epoch_days[0]), array, changed_at)
+    
+    def discard(self, customer_id):
+        try:
+            os.remove(self.path(customer_id))
+        except FileNotFoundError:
+            pass
+    
+    @contextmanager
+    def _locked(self, customer_id):
+        directory = os.path.dirname(self.path(customer_id))
+        os.makedirs(directory, exist_ok=True)
+        with self._lock, open(os.path.join(directory, '.lock'), 'a') as lock:
+            if fcntl:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            yield
+    
+    def _save(self, customer_id, first_day, array, changed_at):
+        # Written aside and renamed so readers never map a half-written file
+        path = self.path(customer_id)
+        temp_path = f'{path}.{os.getpid()}.tmp'
+        with open(temp_path, 'wb') as f:
+            np.array([(MAGIC, first_day, changed_at)], dtype=HEADER).tofile(f)
+            array.astype(VALUE_DTYPE).tofile(f)
+        os.replace(temp_path, path)
+    
+    def _write_customer(self, customer_id, epoch_days, values, changed_at):
+        opened = self.open(customer_id)
+        if opened is not None:
+            changed_at = max(changed_at, opened[2])
+        
+        # New file, or readings before slot 0: rewrite with an earlier base day
+        if opened is None or epoch_days.min() < opened[0]:
+            first = int(epoch_days.min())
+            last = int(epoch_days.max())
+            if opened is not None:
+                last = max(last, opened[0] + len(opened[1]) - 1)
+            array = np.full(last - first + 1, np.nan, dtype=VALUE_DTYPE)
+            if opened is not None:
+                array[opened[0] - first:opened[0] - first + len(opened[1])] = opened[1]
+            array[epoch_days - first] = values
+            self._save(customer_id, first, array, changed_at)
+            return
+        
+        first_day, current, _ = opened
+        slots = max(len(current), int(epoch_days.max()) - first_day + 1)
+        path = self.path(customer_id)
+        if slots > len(current):
+            with open(path, 'ab') as f:
+                np.full(slots - len(current), np.nan, dtype=VALUE_DTYPE).tofile(f)
+        
+        mapped = np.memmap(path, dtype=VALUE_DTYPE, mode='r+', offset=HEADER.itemsize, shape=(slots,))
+        mapped[epoch_days - first_day] = values
+        mapped.flush()
+        
+        # Marker last, so a write cut short leaves the file looking stale
+        with open(path, 'r+b') as f:
+            f.seek(CHANGED_AT_OFFSET)
+            np.array([changed_at], dtype='<i8').tofile(f)
+
+_store = None
+_store_lock = threading.Lock()
+
+def to_micros(timestamp):
+    """Microseconds since 1970-01-01 for a naive UTC datetime, 0 for None"""
+    return (timestamp - UNIX_EPOCH) // timedelta(microseconds=1) if timestamp else 0
+
+def get_usage_store():
+    """Process-wide usage store, or None when USAGE_STORE_PATH isn't set"""
+    global _store
+    root = current_app.config['USAGE_STORE_PATH']
+    if not root:
+        return None
+    with _store_lock:
+        if _store is None or _store.root != root:
+            _store = UsageStore(root)
+        return _store
+
+def write_after_commit(session, rows, updated_at):
+    """Copy written readings, stamped with the updated_at they were written with, into the store on commit"""
+    if rows and get_usage_store() is not None:
+        session.info.setdefault(PENDING_KEY, []).extend({
+            'customer_id': row['customer_id'], 'date': row['date'], 'usage_ccf': row['usage_ccf'],
+            'updated_at': updated_at
+        } for row in rows)
+
+@event.listens_for(Session, 'after_commit')
+def _write_committed(session):
+    pending = session.info.pop(PENDING_KEY, None)
+    if pending:
+        get_usage_store().write(pending)
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_pending(session):
+    session.info.pop(PENDING_KEY, None)
+
+def _is_current(readings, count, latest, updated_at):
+    epoch_days, _, changed_at = readings
+    return len(epoch_days) == count and to_micros(updated_at) <= changed_at and (
+        count == 0 or int(epoch_days[-1]) == latest.toordinal() - EPOCH_ORDINAL
+    )
+
+def load_store_series(customer_id, last_readings=None, days=None):
+    """
+    Usage series from the store when the customer's file matches the database
+    
+    One query fetches the customer's reading count, last date and newest
+    updated_at to validate the file.
+    
+    Returns:
+        UsageSeries: Windowed series, or None without a store or a current file
+    """
+    store = get_usage_store()
+    if store is None:
+        return None
+    stored = store.series(customer_id, last_readings=last_readings, days=days)
+    if stored is None:
+        return None
+    series, changed_at = stored
+    
+    count, latest, updated_at = db.session.execute(
+        select(func.count(), func.max(Usage.date), func.max(Usage.updated_at)).where(Usage.customer_id == customer_id)
+    ).one()
+    if series.total != count or (count and series.dates[-1].item() != latest) or to_micros(updated_at) > changed_at:
+        return None
+    return series
+
+def load_usage_columns(first_id, last_id, customer_ids=None):
+    """
+    Usage for a customer id range as flat columns ordered by customer and date
+    
+    With a store, customers whose files match the database (checked with
+    one grouped query) are read from their mapped arrays and
+    only the rest are queried; without one this is a single columnar scan.
+    
+    Args:
+        first_id (int): First customer id
+        last_id (int): Last customer id
+        customer_ids (list): Restrict to these customers within the range, None for all
+    
+    Returns:
+        tuple: (customer_id int64 array, datetime64[D] dates, float64 usage)
+    """
+    conditions = [Usage.customer_id.between(first_id, last_id)]
+    if customer_ids is not None:
+        conditions.append(Usage.customer_id.in_(customer_ids))
+    
+    pieces = {}
+    missing = None
+    store = get_usage_store()
+    if store is not None:
+        missing = []
+        for customer_id, count, latest, updated_at in db.session.execute(
+            select(Usage.customer_id, func.count(), func.max(Usage.date), func.max(Usage.updated_at))
+            .where(*conditions).group_by(Usage.customer_id)
+        ):
+            readings = store.readings(customer_id)
+            if readings is not None and _is_current(readings, count, latest, updated_at):
+                pieces[customer_id] = readings[:2]
+            else:
+                missing.append(customer_id)
+    
+    def query(*extra):
+        rows = db.session.execute(
+            select(Usage.customer_id, Usage.date, Usage.usage_ccf).where(*conditions, *extra)
+            .order_by(Usage.customer_id, Usage.date)
+        ).all()
+        if rows:
+            columns = list(zip(*rows))
+            ids = np.array(columns[0], dtype=np.int64)
+            epoch_days = to_datetime64(columns[1]).astype(np.int64)
+            usage = np.array(columns[2], dtype=float)
+            starts = np.flatnonzero(np.r_[True, ids[1:] != ids[:-1]])
+            for begin, end in zip(starts, np.r_[starts[1:], len(ids)]):
+                pieces[int(ids[begin])] = (epoch_days[begin:end], usage[begin:end])
+    
+    if missing is None:
+        query()
+    for start in range(0, len(missing or []), ID_CHUNK_SIZE):
+        query(Usage.customer_id.in_(missing[start:start + ID_CHUNK_SIZE]))
+    
+    if not pieces:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype='datetime64[D]'), np.empty(0)
+    order = sorted(pieces)
+    return (
+        np.repeat(np.array(order, dtype=np.int64), [len(pieces[c][0]) for c in order]),
+        np.concatenate([pieces[c][0] for c in order]).astype('datetime64[D]'),
+        np.concatenate([pieces[c][1] for c in order])
+    )
+
+def rebuild_usage_store(chunk_customers=2000, progress=None):
+    """
+    Rewrite every customer's store file from the usage table
+    
+    Args:
+        chunk_customers (int): Customers per columnar scan
+        progress (callable): Called with (customers_done, customers_total) after each chunk
+    
+    Returns:
+        int: Number of customers written
+    """
+    store = get_usage_store()
+    if store is None:
+        raise RuntimeError('USAGE_STORE_PATH is not set')
+    
+    ids = [row[0] for row in db.session.query(Customer.id).order_by(Customer.id)]
+    written = 0
+    
+    for start in range(0, len(ids), chunk_customers):
+        chunk = ids[start:start + chunk_customers]
+        rows = db.session.execute(
+            select(Usage.customer_id, Usage.date, Usage.usage_ccf, Usage.updated_at).where(
+                Usage.customer_id.between(chunk[0], chunk[-1])
+            ).order_by(Usage.customer_id, Usage.date)
+        ).all()
+        
+        stored = set()
+        if rows:
+            columns = list(zip(*rows))
+            customer_ids = np.array(columns[0], dtype=np.int64)
+            epoch_days = to_datetime64(columns[1]).astype(np.int64)
+            usage = np.array(columns[2], dtype=VALUE_DTYPE)
+            changed_at = np.array([to_micros(t) for t in columns[3]], dtype=np.int64)
+            starts = np.flatnonzero(np.r_[True, customer_ids[1:] != customer_ids[:-1]])
+            for begin, end in zip(starts, np.r_[starts[1:], len(customer_ids)]):
+                store.replace(int(customer_ids[begin]), epoch_days[begin:end], usage[begin:end],
+                              int(changed_at[begin:end].max()))
+                stored.add(int(customer_ids[begin]))
+        for customer_id in set(chunk) - stored:
+            store.discard(customer_id)
+        written += len(stored)
+        
+        if progress:
+            progress(min(start + chunk_customers, len(ids)), len(ids))
+    
+    return written
@@ -0,0 +1,61 @@
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from flask import current_app
+from config import Config
+from models import db
+
+_worker_app = None
+_inherited_engines = []  # Parent engines a forked worker must not use or close
+
+def _init_worker(database_uri):
+    """Give each worker process its own app and database engine"""
+    global _worker_app
+    from app import create_app
+    
+    # A forked worker holds copies of the parent's pooled connections; drop
+    # them without closing, as closing would end the parent's sessions too
+    for engine in _inherited_engines:
+        engine.dispose(close=False)
+    
+    class WorkerConfig(Config):
+        SQLALCHEMY_DATABASE_URI = database_uri
+    
+    _worker_app = create_app(WorkerConfig)
+
+def _call_in_app(func, args):
+    """Process pool entry point"""
+    with _worker_app.app_context():
+        return func(*args)
+
+class AppProcessPool:
+    """Process pool whose tasks run inside an app context with their own database connections"""
+    
+    def __init__(self, executor):
+        self.executor = executor
+    
+    def submit(self, func, *args):
+        """Run a module-level function in a worker; returns a Future"""
+        return self.executor.submit(_call_in_app, func, args)
+
+@contextmanager
+def app_process_pool(workers, mp_context=None):
+    """
+    Start worker processes bound to the current app's database
+    
+    Workers open their own connections. Forked workers discard the ones
+    they inherit, so this process's engine stays untouched for requests
+    and jobs running alongside the pool.
+    
+    Args:
+        workers (int): Worker processes
+        mp_context: multiprocessing context, e.g. spawn when called from a thread
+    """
+    global _inherited_engines
+    database_uri = current_app.config['SQLALCHEMY_DATABASE_URI']
+    _inherited_engines = list(db.engines.values())
+    # Only this thread's transaction ends, so it holds no locks while workers write
+    db.session.remove()
+    
+    with ProcessPoolExecutor(max_workers=workers, mp_context=mp_context, initializer=_init_worker,
+                             initargs=(database_uri,)) as executor:
+        yield AppProcessPool(executor)